@@ -1,6 +1,6 @@
 from __future__ import absolute_import
 from builtins import range
-from sqlalchemy import create_engine, event, Column, String, Integer, Table, types
+from sqlalchemy import create_engine, event, inspect, Column, String, Integer, Table, types
 import sqlalchemy.orm
 from sqlalchemy.orm import sessionmaker, scoped_session
 from sqlalchemy.ext.declarative import declarative_base
@@ -43,9 +43,53 @@ class UTCDateTime(types.TypeDecorator):
                             value.hour, value.minute, value.second,
                             value.microsecond, tzinfo=pytz.utc)
 
+
+class StorageProfile(object):
+    """
+    SQLite pragmas applied to each new connection
+
+    :param journal_mode: WAL lets readers work while engine writes its log
+    :param synchronous: NORMAL is safe with WAL and doesn't sync on each commit
+    :param mmap_size: bytes of database file mapped to memory
+    :param cache_size: pages, or KiB when negative
+    :param busy_timeout: milliseconds to wait for lock instead of failing
+    :param split_readers: use separate read-only connections for DBReadSession
+    """
+    def __init__(self, journal_mode=None, synchronous=None, mmap_size=None, cache_size=None, busy_timeout=None,
+                 split_readers=False):
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.mmap_size = mmap_size
+        self.cache_size = cache_size
+        self.busy_timeout = busy_timeout
+        self.split_readers = split_readers
+
+    def get_pragmas(self):
+        """
+        :rtype: list[(str, str | int)]
+        """
+        pragmas = [('journal_mode', self.journal_mode),
+                   ('synchronous', self.synchronous),
+                   ('mmap_size', self.mmap_size),
+                   ('cache_size', self.cache_size),
+                   ('busy_timeout', self.busy_timeout)]
+        return [(name, value) for name, value in pragmas if value is not None]
+
+
+# legacy keeps sqlite defaults with rollback journal, it is the default one,
+# because database is often kept on network file systems, where WAL doesn't work
+STORAGE_PROFILES = {
+    'legacy': StorageProfile(),
+    'wal': StorageProfile(journal_mode='WAL', synchronous='NORMAL', mmap_size=64 * 1024 * 1024, cache_size=-16000,
+                          busy_timeout=5000, split_readers=True),
+}
+DEFAULT_STORAGE_PROFILE = 'legacy'
+
 Base = declarative_base()
 _DBSession = None
+_DBReadSession = None
 engine = None
+read_engine = None
 
 
 def get_engine():
@@ -56,26 +100,63 @@ def DBSession():
     return _DBSession()
 
 
-def init_db_engine(connection_string, echo=False, **kwargs):
-    global engine, _DBSession
+def DBReadSession():
+    """
+    Session for requests which only read, they aren't blocked by engine writes when readers are split
+    """
+    return _DBReadSession()
+
+
+def init_db_engine(connection_string, echo=False, storage_profile=None, **kwargs):
+    """
+    :type connection_string: str
+    :type echo: bool
+    :param storage_profile: name of one of STORAGE_PROFILES or profile itself, sqlite defaults are used for None
+    :type storage_profile: str | StorageProfile | None
+    """
+    global engine, read_engine, _DBSession, _DBReadSession
+    if isinstance(storage_profile, str):
+        storage_profile = STORAGE_PROFILES[storage_profile]
     engine = create_engine(connection_string, echo=echo, **kwargs)
+    pragmas = storage_profile.get_pragmas() if storage_profile is not None and engine.dialect.name == 'sqlite' else []
+    _setup_engine(engine, pragmas)
 
+    session_factory = sessionmaker(class_=ContextSession, bind=engine)
+    _DBSession = scoped_session(session_factory)
+
+    # in-memory database exists only for its connection, so it can't be shared with readers
+    database = engine.url.database
+    if storage_profile is not None and storage_profile.split_readers and engine.dialect.name == 'sqlite' \
+            and database and database != ':memory:':
+        read_engine = create_engine(connection_string, echo=echo, **kwargs)
+        _setup_engine(read_engine, pragmas + [('query_only', 1)])
+        _DBReadSession = scoped_session(sessionmaker(class_=ContextSession, bind=read_engine))
+    else:
+        read_engine = None
+        _DBReadSession = _DBSession
+
+
+def _setup_engine(db_engine, pragmas):
     # workaround for migrations on sqlite:
     # http://docs.sqlalchemy.org/en/latest/dialects/sqlite.html#pysqlite-serializable
-    @event.listens_for(engine, 'connect')
+    @event.listens_for(db_engine, 'connect')
     def do_connect(dbapi_connection, connection_record):
         # disable pysqlite's emitting of the BEGIN statement entirely.
         # also stops it from emitting COMMIT before any DDL.
         dbapi_connection.isolation_level = None
+        # pragmas are applied out of transaction, journal mode can't be changed inside it
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute("PRAGMA {0}={1}".format(name, value))
+        finally:
+            cursor.close()
 
-    @event.listens_for(engine, "begin")
+    @event.listens_for(db_engine, "begin")
     def do_begin(conn):
         # emit our own BEGIN
         conn.execute("BEGIN")
 
-    session_factory = sessionmaker(class_=ContextSession, bind=engine)
-    _DBSession = scoped_session(session_factory)
-
 
 def create_db():
     Base.metadata.create_all(engine)
@@ -83,6 +164,8 @@ def create_db():
 
 def close_db():
     engine.dispose()
+    if read_engine is not None:
+        read_engine.dispose()
 
 
 def row2dict(row, table=None, fields=None):
@@ -126,6 +209,9 @@ class MonitorrentOperations(Operations):
     def has_table(self, name):
         return self.db.dialect.has_table(self.db, name)
 
+    def has_index(self, table_name, name):
+        return any(index['name'] == name for index in inspect(self.db.connection()).get_indexes(table_name))
+
     def upgrade_to_base_topic(self, v0, v1, polymorphic_identity, topic_mapping=None, column_renames=None):
         from .plugins import Topic
 
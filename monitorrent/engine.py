@@ -13,8 +13,8 @@ import pytz
 import html
 
 import structlog
-from sqlalchemy import Column, Integer, ForeignKey, Unicode, Enum, func
-from monitorrent.db import Base, DBSession, row2dict, UTCDateTime
+from sqlalchemy import Column, Integer, ForeignKey, Unicode, Enum, Index, func, case
+from monitorrent.db import Base, DBSession, DBReadSession, row2dict, UTCDateTime
 from monitorrent.utils.timers import timer
 from monitorrent.plugins.status import Status
 
@@ -47,20 +47,31 @@ def _clamp(value, min_value=0, max_value=100):
     return max(min_value, min(value, max_value))
 
 
+class EnqueueResult(object):
+    """
+    Results of queueing torrent for adding to client by outbox
+    """
+    DISABLED = 'disabled'
+    QUEUED = 'queued'
+    ALREADY_QUEUED = 'already_queued'
+
+
 class Engine(object):
-    def __init__(self, logger, settings_manager, trackers_manager, clients_manager, notifier_manager):
+    def __init__(self, logger, settings_manager, trackers_manager, clients_manager, notifier_manager, outbox=None):
         """
         :type logger: Logger
         :type settings_manager: settings_manager.SettingsManager
         :type trackers_manager: plugin_managers.TrackersManager
         :type clients_manager: plugin_managers.ClientsManager
         :type notifier_manager: plugin_managers.NotifierManager
+        :type outbox: outbox.ClientsOutbox | None
         """
         self.log = logger
         self.settings_manager = settings_manager
         self.trackers_manager = trackers_manager
         self.clients_manager = clients_manager
         self.notifier_manager = notifier_manager
+        self.outbox = outbox
 
     def info(self, message):
         self.log.info(message)
@@ -88,7 +99,7 @@ class Engine(object):
         existing_torrent = self.clients_manager.find_torrent(torrent.info_hash)
         if existing_torrent:
             self.info(u"Torrent <b>{0}</b> already added".format(filename))
-        elif self.clients_manager.add_torrent(torrent.raw_content, topic_settings):
+        elif self.clients_manager.add_torrent(torrent, topic_settings):
             old_existing_torrent = self.clients_manager.find_torrent(old_hash) if old_hash else None
             if old_existing_torrent:
                 self.info(u"Updated <b>{0}</b>".format(filename))
@@ -106,6 +117,68 @@ class Engine(object):
             raise Exception(u'Torrent {0} wasn\'t added'.format(filename))
         return existing_torrent['date_added']
 
+    def enqueue_torrent(self, filename, torrent, topic_id):
+        """
+        Queue torrent to be added to client by outbox
+
+        :type filename: str
+        :type torrent: Torrent
+        :type topic_id: int
+        :return: one of EnqueueResult values,
+            torrent has to be added by add_torrent if outbox is disabled
+        :rtype: str
+        """
+        if self.outbox is None:
+            return EnqueueResult.DISABLED
+        if self.outbox.enqueue(topic_id, filename, torrent):
+            self.info(u"Torrent <b>{0}</b> queued for adding to client".format(filename))
+            return EnqueueResult.QUEUED
+        self.info(u"Torrent <b>{0}</b> already queued for adding to client".format(filename))
+        return EnqueueResult.ALREADY_QUEUED
+
+    def add_torrents(self, torrents):
+        """
+        Add several torrents with bulk requests to client
+
+        :param torrents: filename, torrent, old_hash and topic_settings for each torrent
+        :type torrents: list[(str, Torrent, str | None, clients.TopicSettings | None)]
+        :return: date added for each torrent or None if torrent wasn't added
+        :rtype: list[datetime | None]
+        """
+        existing_torrents = self.clients_manager.find_torrents([torrent.info_hash for _, torrent, _, _ in torrents])
+        new_torrents = []
+        for filename, torrent, old_hash, topic_settings in torrents:
+            if existing_torrents[torrent.info_hash]:
+                self.info(u"Torrent <b>{0}</b> already added".format(filename))
+            else:
+                new_torrents.append((filename, torrent, old_hash, topic_settings))
+
+        added = self.clients_manager.add_torrents([(torrent, topic_settings)
+                                                   for _, torrent, _, topic_settings in new_torrents])
+        added_torrents = [item for item, result in zip(new_torrents, added) if result]
+
+        old_hashes = list({old_hash for _, _, old_hash, _ in added_torrents if old_hash})
+        old_existing_torrents = self.clients_manager.find_torrents(old_hashes)
+        removed = self.clients_manager.remove_torrents([old_hash for old_hash in old_hashes
+                                                        if old_existing_torrents[old_hash]])
+        for filename, torrent, old_hash, _ in added_torrents:
+            old_existing_torrent = old_existing_torrents[old_hash] if old_hash else None
+            if old_existing_torrent:
+                self.info(u"Updated <b>{0}</b>".format(filename))
+                if removed[old_hash]:
+                    self.info(u"Remove old torrent <b>{0}</b>"
+                              .format(html.escape(old_existing_torrent['name'])))
+                else:
+                    self.failed(u"Can't remove old torrent <b>{0}</b>"
+                                .format(html.escape(old_existing_torrent['name'])))
+            else:
+                self.info(u"Add new <b>{0}</b>".format(filename))
+
+        added_hashes = [torrent.info_hash for _, torrent, _, _ in added_torrents]
+        existing_torrents.update(self.clients_manager.find_torrents(added_hashes))
+        return [existing_torrents[torrent.info_hash]['date_added'] if existing_torrents[torrent.info_hash] else None
+                for _, torrent, _, _ in torrents]
+
     def execute(self, ids):
         tracker_settings = self.settings_manager.tracker_settings
         trackers = list(self.trackers_manager.trackers.items())
@@ -122,13 +195,18 @@ class Engine(object):
             return
 
         log.info("Tracker topics mapping constructed", mapping=tracker_topics)
-        with self.notifier_manager.execute() as notifier_manager_execute:
-            with self.start(execute_trackers, notifier_manager_execute) as engine_trackers:
-                for name, tracker, topics in tracker_topics:
-                    tracker.init(tracker_settings)
-                    with engine_trackers.start(name) as engine_tracker:
-                        log.info("Executing tracker", name=name, topics=topics)
-                        tracker.execute(topics, engine_tracker)
+        # all topics are checked against one list of client torrents loaded once per execute
+        self.clients_manager.take_snapshot()
+        try:
+            with self.notifier_manager.execute() as notifier_manager_execute:
+                with self.start(execute_trackers, notifier_manager_execute) as engine_trackers:
+                    for name, tracker, topics in tracker_topics:
+                        tracker.init(tracker_settings)
+                        with engine_trackers.start(name) as engine_tracker:
+                            log.info("Executing tracker", name=name, topics=topics)
+                            tracker.execute(topics, engine_tracker)
+        finally:
+            self.clients_manager.clear_snapshot()
 
 
 class EngineExecute(object):
@@ -316,11 +394,26 @@ class EngineDownloads(EngineExecute):
         self.count = count
         self.engine_topic = engine_topic
 
-    def add_torrent(self, index, filename, torrent, old_hash, topic_settings):
+    def update_progress(self, index):
         progress = index * 100 // self.count
         self.engine_topic.update_progress(progress)
+
+    def add_torrent(self, index, filename, torrent, old_hash, topic_settings):
+        self.update_progress(index)
         return self.engine.add_torrent(filename, torrent, old_hash, topic_settings)
 
+    def enqueue_torrent(self, index, filename, torrent, topic_id):
+        self.update_progress(index)
+        return self.engine.enqueue_torrent(filename, torrent, topic_id)
+
+    def add_torrents(self, torrents):
+        """
+        :param torrents: filename, torrent, old_hash and topic_settings for each torrent
+        :type torrents: list[(str, Torrent, str | None, clients.TopicSettings | None)]
+        :rtype: list[datetime | None]
+        """
+        return self.engine.add_torrents(torrents)
+
     def __enter__(self):
         return self
 
@@ -357,6 +450,9 @@ class ExecuteLog(Base):
     message = Column(Unicode, nullable=False)
     level = Column(Enum('info', 'warning', 'failed', 'downloaded'), nullable=False)
 
+    # index is created by core_upgrade for existing databases
+    __table_args__ = (Index('ix_execute_log_execute_id_level', 'execute_id', 'level'),)
+
 
 class DbLoggerWrapper(Logger):
     def __init__(self, log_manager, settings_manager=None):
@@ -393,7 +489,22 @@ class DbLoggerWrapper(Logger):
 
 # noinspection PyMethodMayBeStatic
 class ExecuteLogManager(object):
+    """
+    Log entries are written in batches of flush_size entries or after flush_interval seconds,
+    not written yet entries are returned from memory, so current execute log is still live
+    """
     _execute_id = None
+    flush_size = 100
+    flush_interval = 1
+
+    def __init__(self):
+        self._pending = []
+        # entries which are being written now, they are still returned from memory
+        self._writing = []
+        self._next_log_id = None
+        self._flush_timer = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
 
     def started(self, start_time):
         if self._execute_id is not None:
@@ -404,12 +515,18 @@ class ExecuteLogManager(object):
             execute = Execute(start_time=start_time, finish_time=start_time, status='failed')
             db.add(execute)
             db.commit()
+            # ids are assigned before writing, so buffered entries can be requested after the known one
+            next_log_id = (db.query(func.max(ExecuteLog.id)).scalar() or 0) + 1
+            with self._lock:
+                # entries of previous execute, which weren't written yet, keep their ids
+                self._next_log_id = max(next_log_id, self._next_log_id or 0)
             self._execute_id = execute.id
 
     def finished(self, finish_time, exception):
         if self._execute_id is None:
             raise Exception('Execute is not started')
 
+        self.flush()
         with DBSession() as db:
             # noinspection PyArgumentList
             execute = db.query(Execute).filter(Execute.id == self._execute_id).first()
@@ -427,31 +544,73 @@ class ExecuteLogManager(object):
         self._log_entry(message, level)
 
     def _log_entry(self, message, level):
-        with DBSession() as db:
-            execute_log = ExecuteLog(execute_id=self._execute_id, time=datetime.now(pytz.utc),
-                                     message=message, level=level)
-            db.add(execute_log)
+        with self._lock:
+            if self._next_log_id is None:
+                raise Exception('Execute is not started')
+            self._pending.append({'id': self._next_log_id, 'execute_id': self._execute_id,
+                                  'time': datetime.now(pytz.utc), 'message': message, 'level': level})
+            self._next_log_id += 1
+            is_full = len(self._pending) >= self.flush_size
+            if not is_full:
+                self._start_flush_timer()
+        if is_full:
+            self.flush()
+
+    def flush(self):
+        """
+        Write buffered log entries in one transaction
+        """
+        with self._flush_lock:
+            with self._lock:
+                if self._flush_timer is not None:
+                    self._flush_timer.cancel()
+                    self._flush_timer = None
+                self._writing = self._pending
+                self._pending = []
+            if len(self._writing) == 0:
+                return
+            try:
+                with DBSession() as db:
+                    db.bulk_insert_mappings(ExecuteLog, self._writing)
+            except Exception as e:
+                log.error("Can't write execute log entries", count=len(self._writing), exception=str(e))
+                with self._lock:
+                    # entries are written again by timer, database can be locked only for a while
+                    self._pending = self._writing + self._pending
+                    self._writing = []
+                    self._start_flush_timer()
+                return
+            with self._lock:
+                self._writing = []
+
+    def _start_flush_timer(self):
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
 
     def get_log_entries(self, skip, take):
-        with DBSession() as db:
-            downloaded_sub_query = db.query(ExecuteLog.execute_id, func.count(ExecuteLog.id).label('count')) \
-                .group_by(ExecuteLog.execute_id, ExecuteLog.level) \
-                .having(ExecuteLog.level == 'downloaded') \
-                .subquery()
-            failed_sub_query = db.query(ExecuteLog.execute_id, func.count(ExecuteLog.id).label('count')) \
-                .group_by(ExecuteLog.execute_id, ExecuteLog.level) \
-                .having(ExecuteLog.level == 'failed') \
-                .subquery()
-
-            result_query = db.query(Execute, downloaded_sub_query.c.count, failed_sub_query.c.count) \
-                .outerjoin(failed_sub_query, Execute.id == failed_sub_query.c.execute_id) \
-                .outerjoin(downloaded_sub_query, Execute.id == downloaded_sub_query.c.execute_id) \
+        with DBReadSession() as db:
+            executes = db.query(Execute) \
                 .order_by(Execute.finish_time.desc()) \
                 .offset(skip) \
-                .limit(take)
+                .limit(take) \
+                .all()
+
+            # counts only for requested page in one pass over (execute_id, level) index
+            execute_ids = [execute.id for execute in executes]
+            counts = {}
+            if len(execute_ids) > 0:
+                counts_query = db.query(ExecuteLog.execute_id,
+                                        func.sum(case([(ExecuteLog.level == 'downloaded', 1)], else_=0)),
+                                        func.sum(case([(ExecuteLog.level == 'failed', 1)], else_=0))) \
+                    .filter(ExecuteLog.execute_id.in_(execute_ids)) \
+                    .group_by(ExecuteLog.execute_id)
+                counts = {execute_id: (downloads, fails) for execute_id, downloads, fails in counts_query}
 
             result = []
-            for execute, downloads, fails in result_query.all():
+            for execute in executes:
+                downloads, fails = counts.get(execute.id, (0, 0))
                 execute_result = row2dict(execute)
                 execute_result['downloaded'] = downloads or 0
                 execute_result['failed'] = fails or 0
@@ -487,12 +646,17 @@ class ExecuteLogManager(object):
         return self._execute_id is not None
 
     def get_execute_log_details(self, execute_id, after=None):
-        with DBSession() as db:
+        # pending entries are taken before query, so entries written in between are returned by query
+        with self._lock:
+            pending = [dict(e) for e in self._writing + self._pending
+                       if e['execute_id'] == execute_id and (after is None or e['id'] > after)]
+        with DBReadSession() as db:
             filters = [ExecuteLog.execute_id == execute_id]
             if after is not None:
                 filters.append(ExecuteLog.id > after)
-            log_entries = db.query(ExecuteLog).filter(*filters).all()
-            return [row2dict(e) for e in log_entries]
+            log_entries = [row2dict(e) for e in db.query(ExecuteLog).filter(*filters).order_by(ExecuteLog.id).all()]
+        written_ids = {e['id'] for e in log_entries}
+        return log_entries + [e for e in pending if e['id'] not in written_ids]
 
     def get_current_execute_log_details(self, after=None):
         if self._execute_id is None:
@@ -515,6 +679,7 @@ class EngineRunner(threading.Thread):
         """
         interval_param = kwargs.pop('interval', None)
         last_execute_param = kwargs.pop('last_execute', None)
+        outbox_param = kwargs.pop('outbox', None)
 
         super(EngineRunner, self).__init__(**kwargs)
         self.logger = logger
@@ -522,6 +687,7 @@ class EngineRunner(threading.Thread):
         self.trackers_manager = trackers_manager
         self.clients_manager = clients_manager
         self.notifier_manager = notifier_manager
+        self.outbox = outbox_param
         self.is_executing = False
         self.is_stoped = False
         self._interval = float(interval_param) if interval_param else 7200
@@ -597,8 +763,10 @@ class EngineRunner(threading.Thread):
         try:
             log.info("Starting execute", time=str(datetime.now()))
             self.logger.started(datetime.now(pytz.utc))
+            outbox = self.outbox if self.outbox is not None and self.settings_manager.clients_outbox_enabled \
+                else None
             engine = Engine(self.logger, self.settings_manager, self.trackers_manager,
-                            self.clients_manager, self.notifier_manager)
+                            self.clients_manager, self.notifier_manager, outbox)
             engine.execute(ids)
         except:
             caught_exception = sys.exc_info()[0]
@@ -0,0 +1,211 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytz
+import structlog
+from sqlalchemy import Column, Integer, String, Unicode, LargeBinary, ForeignKey, func
+
+from monitorrent.db import Base, DBSession, UTCDateTime
+from monitorrent.engine import Engine, Logger
+from monitorrent.plugins import Topic
+from monitorrent.plugins.status import Status
+from monitorrent.plugins.clients import TopicSettings
+from monitorrent.utils.bittorrent_ex import Torrent
+
+log = structlog.get_logger()
+
+
+class ClientOutboxItem(Base):
+    __tablename__ = "client_outbox"
+
+    id = Column(Integer, primary_key=True)
+    topic_id = Column(Integer, ForeignKey('topics.id'), nullable=False, index=True)
+    info_hash = Column(String, nullable=False)
+    filename = Column(Unicode, nullable=False)
+    torrent = Column(LargeBinary, nullable=False)
+    created = Column(UTCDateTime, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt = Column(UTCDateTime, nullable=False)
+    last_error = Column(Unicode, nullable=True)
+
+
+class OutboxLogger(Logger):
+    """
+    Writes messages of adding torrents by outbox to application log, there is no execute log for them
+    """
+    def info(self, message):
+        log.info(message)
+
+    def failed(self, message, exc_type=None, exc_value=None, exc_tb=None):
+        log.warning(message, exception=str(exc_value) if exc_value is not None else None)
+
+
+class ClientsOutbox(threading.Thread):
+    """
+    Persistent queue of torrents to add to client, which is drained by this thread
+
+    Tracker checking only queues torrents, so it doesn't wait for slow or restarting client.
+    Torrents of one topic are added in order they were queued and failed torrent is retried with growing interval,
+    next torrents of its topic wait for it. Topic hash and last_update are saved only after client confirms adding,
+    so torrent is downloaded and queued again on the next execute if queue was lost.
+    Torrent which wasn't added after max_attempts is dropped from queue, so it doesn't block next torrents of topic,
+    its topic gets Error status and failure notification is sent.
+    """
+    retry_interval = 10
+    max_retry_interval = 3600
+    max_attempts = 10
+
+    def __init__(self, clients_manager, notifier_manager=None, **kwargs):
+        """
+        :type clients_manager: plugin_managers.ClientsManager
+        :type notifier_manager: plugin_managers.NotifierManager | None
+        """
+        super(ClientsOutbox, self).__init__(**kwargs)
+        self.daemon = True
+        self.clients_manager = clients_manager
+        self.notifier_manager = notifier_manager
+        self.engine = Engine(OutboxLogger(), None, None, clients_manager, notifier_manager)
+        self._condition = threading.Condition()
+        self._is_stopped = False
+        self._has_new_items = False
+
+    def enqueue(self, topic_id, filename, torrent):
+        """
+        :type topic_id: int
+        :type filename: str
+        :type torrent: Torrent
+        :return: False if the same torrent is already queued for topic
+        :rtype: bool
+        """
+        with DBSession() as db:
+            queued = db.query(ClientOutboxItem.id) \
+                .filter(ClientOutboxItem.topic_id == topic_id, ClientOutboxItem.info_hash == torrent.info_hash) \
+                .first()
+            if queued is not None:
+                return False
+            now = datetime.now(pytz.utc)
+            db.add(ClientOutboxItem(topic_id=topic_id, info_hash=torrent.info_hash, filename=filename,
+                                    torrent=torrent.raw_content, created=now, attempts=0, next_attempt=now))
+        self.wakeup()
+        return True
+
+    def get_items(self):
+        """
+        :return: queued torrents without their content
+        :rtype: list[dict]
+        """
+        with DBSession() as db:
+            items = db.query(ClientOutboxItem).order_by(ClientOutboxItem.id).all()
+            return [{'id': item.id, 'topic_id': item.topic_id, 'info_hash': item.info_hash,
+                     'filename': item.filename, 'created': item.created, 'attempts': item.attempts,
+                     'next_attempt': item.next_attempt, 'last_error': item.last_error}
+                    for item in items]
+
+    def wakeup(self):
+        with self._condition:
+            self._has_new_items = True
+            self._condition.notify()
+
+    def stop(self):
+        with self._condition:
+            self._is_stopped = True
+            self._condition.notify()
+
+    # noinspection PyBroadException
+    def run(self):
+        while True:
+            with self._condition:
+                if self._is_stopped:
+                    return
+                self._has_new_items = False
+            try:
+                timeout = self.process()
+            except Exception as e:
+                log.error("An error has occurred during adding queued torrents", exception=str(e))
+                timeout = self.retry_interval
+            with self._condition:
+                if not self._has_new_items and not self._is_stopped:
+                    self._condition.wait(timeout)
+
+    def process(self):
+        """
+        Add all queued torrents which are due
+
+        :return: seconds until the next retry or None if queue is empty
+        :rtype: float | None
+        """
+        while True:
+            with DBSession() as db:
+                first_ids = db.query(func.min(ClientOutboxItem.id)).group_by(ClientOutboxItem.topic_id)
+                heads = db.query(ClientOutboxItem.id, ClientOutboxItem.next_attempt) \
+                    .filter(ClientOutboxItem.id.in_(first_ids.subquery())) \
+                    .order_by(ClientOutboxItem.id) \
+                    .all()
+            if len(heads) == 0:
+                return None
+            now = datetime.now(pytz.utc)
+            due_ids = [item_id for item_id, next_attempt in heads if next_attempt <= now]
+            if len(due_ids) == 0:
+                return max(0, (min(next_attempt for _, next_attempt in heads) - now).total_seconds())
+            for item_id in due_ids:
+                self._process_item(item_id)
+
+    def _process_item(self, item_id):
+        with DBSession() as db:
+            item = db.query(ClientOutboxItem).filter(ClientOutboxItem.id == item_id).first()
+            topic = db.query(Topic).filter(Topic.id == item.topic_id).first()
+            if topic is None:
+                log.info("Queued torrent of removed topic is skipped", filename=item.filename)
+                db.delete(item)
+                return
+            filename = item.filename
+            content = item.torrent
+            display_name = topic.display_name
+            # old torrent is the one which was confirmed by client last time
+            old_hash = getattr(topic, 'hash', None)
+            topic_settings = TopicSettings.from_topic(topic)
+
+        try:
+            last_update = self.engine.add_torrent(filename, Torrent(content), old_hash, topic_settings)
+        except Exception as e:
+            with DBSession() as db:
+                item = db.query(ClientOutboxItem).filter(ClientOutboxItem.id == item_id).first()
+                item.attempts += 1
+                item.last_error = str(e)
+                attempts = item.attempts
+                if attempts >= self.max_attempts:
+                    topic = db.query(Topic).filter(Topic.id == item.topic_id).first()
+                    if topic is not None:
+                        topic.status = Status.Error
+                    db.delete(item)
+                else:
+                    retry_interval = min(self.retry_interval * 2 ** (attempts - 1), self.max_retry_interval)
+                    item.next_attempt = datetime.now(pytz.utc) + timedelta(seconds=retry_interval)
+                    log.warning("Queued torrent wasn't added to client", filename=filename, attempts=attempts,
+                                retry_interval=retry_interval, exception=str(e))
+            if attempts >= self.max_attempts:
+                log.error("Queued torrent wasn't added to client and is dropped", filename=filename,
+                          attempts=attempts, exception=str(e))
+                self._notify_failed(u"Torrent {0} of {1} wasn't added to client after {2} attempts: {3}"
+                                    .format(filename, display_name, attempts, e))
+            return
+
+        with DBSession() as db:
+            item = db.query(ClientOutboxItem).filter(ClientOutboxItem.id == item_id).first()
+            topic = db.query(Topic).filter(Topic.id == item.topic_id).first()
+            if topic is not None:
+                if hasattr(topic, 'hash'):
+                    topic.hash = item.info_hash
+                topic.last_update = last_update
+                topic.status = Status.Ok
+            db.delete(item)
+
+    # noinspection PyBroadException
+    def _notify_failed(self, message):
+        if self.notifier_manager is None:
+            return
+        try:
+            with self.notifier_manager.execute() as notifier_manager_execute:
+                notifier_manager_execute.notify_failed(message)
+        except Exception as e:
+            log.warning("Failed notify", exception=str(e))
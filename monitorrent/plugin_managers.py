@@ -1,11 +1,17 @@
 import os
+import threading
+from collections import deque
+from datetime import datetime
+from time import monotonic
 
+import pytz
 import structlog
 
-from monitorrent.db import DBSession, row2dict
+from monitorrent.db import DBSession, DBReadSession, row2dict
 from monitorrent.plugins import Topic
 from monitorrent.plugins.status import Status
 from monitorrent.plugins.notifiers import Notifier, NotifierType
+from monitorrent.plugins.clients import TopicClient
 from monitorrent.plugins.trackers import TrackerPluginBase, WithCredentialsMixin
 from monitorrent.upgrade_manager import add_upgrade
 
@@ -129,6 +135,7 @@ class TrackersManager(object):
             topic = db.query(Topic).filter(Topic.id == id).first()
             if topic is None:
                 raise KeyError('Topic {} not found'.format(id))
+            db.query(TopicClient).filter(TopicClient.topic_id == id).delete(synchronize_session=False)
             db.delete(topic)
         return True
 
@@ -160,7 +167,7 @@ class TrackersManager(object):
 
     def get_watching_topics(self):
         watching_topics = []
-        with DBSession() as db:
+        with DBReadSession() as db:
             dbtopics = db.query(Topic).all()
             db.expunge_all()
             for dbtopic in dbtopics:
@@ -202,19 +209,262 @@ class TrackersManager(object):
         return watching_topics
 
 
+class BalancingPolicy(object):
+    """
+    Policies to choose client for new topic in multi-client mode
+    """
+    ROUND_ROBIN = 'round_robin'
+    LEAST_TORRENTS = 'least_torrents'
+    MOST_FREE_SPACE = 'most_free_space'
+
+    ALL = [ROUND_ROBIN, LEAST_TORRENTS, MOST_FREE_SPACE]
+
+
+class ClientMetrics(object):
+    """
+    Latency and errors of client calls over rolling window
+    """
+    def __init__(self, window=300, max_calls=1000):
+        """
+        :param window: seconds, older calls are forgotten
+        :param max_calls: max remembered calls per client
+        """
+        self.window = window
+        self.max_calls = max_calls
+        # (time, method, duration, is_error) by client name
+        self._calls = {}
+        self._last_errors = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, method, duration, error=None):
+        """
+        :type name: str
+        :type method: str
+        :param duration: seconds
+        :type duration: float
+        :param error: error message for failed call
+        :type error: str | None
+        """
+        with self._lock:
+            calls = self._calls.setdefault(name, deque(maxlen=self.max_calls))
+            calls.append((monotonic(), method, duration, error is not None))
+            if error is not None:
+                self._last_errors[name] = {'method': method, 'error': error, 'date': datetime.now(pytz.utc)}
+
+    def get_error_rate(self, name):
+        """
+        :return: calls count and part of failed calls in window
+        :rtype: (int, float)
+        """
+        with self._lock:
+            calls = self._get_calls(name)
+        errors = sum(1 for _, _, _, is_error in calls if is_error)
+        return len(calls), float(errors) / len(calls) if len(calls) > 0 else 0.0
+
+    def get_stats(self, name):
+        """
+        :return: calls count, errors, error rate and latencies in seconds in window, overall and by method
+        :rtype: dict
+        """
+        with self._lock:
+            calls = self._get_calls(name)
+            last_error = self._last_errors.get(name, None)
+        stats = self._summarize(calls)
+        stats['methods'] = {method: self._summarize([c for c in calls if c[1] == method])
+                            for method in {c[1] for c in calls}}
+        stats['last_error'] = last_error
+        return stats
+
+    def _get_calls(self, name):
+        calls = self._calls.get(name, None)
+        if calls is None:
+            return []
+        expired = monotonic() - self.window
+        while len(calls) > 0 and calls[0][0] < expired:
+            calls.popleft()
+        return list(calls)
+
+    @staticmethod
+    def _summarize(calls):
+        count = len(calls)
+        if count == 0:
+            return {'calls': 0, 'errors': 0, 'error_rate': 0.0,
+                    'avg_latency': None, 'p95_latency': None, 'max_latency': None}
+        durations = sorted(duration for _, _, duration, _ in calls)
+        errors = sum(1 for _, _, _, is_error in calls if is_error)
+        return {
+            'calls': count,
+            'errors': errors,
+            'error_rate': float(errors) / count,
+            'avg_latency': sum(durations) / count,
+            'p95_latency': durations[min(count - 1, int(count * 0.95))],
+            'max_latency': durations[-1],
+        }
+
+
 class ClientsManager(object):
-    def __init__(self, clients=None, default_client_name=None):
+    def __init__(self, clients=None, default_client_name=None, balancing=None, failover=None):
         if clients is None:
             clients = get_plugins('client')
         self.clients = clients
         self.default_client = self.__get_default_client(default_client_name,
                                                         list(self.clients.values())[0] if len(self.clients) > 0 else None)
+        self.metrics = ClientMetrics()
+        self.balancing = None
+        self.failover = None
+        # engine and outbox threads use the same manager, each of them has its own snapshot
+        self._snapshots = {}
+        self._lock = threading.RLock()
+        # client plugins keep connection state, so calls to one client from different threads are serialized,
+        # while slow client doesn't block calls to other clients
+        self._call_locks = {}
+        # client of torrent by upper case hash, so torrent is found and removed without asking all clients
+        self._locations = {}
+        self._round_robin_index = 0
+        if balancing is not None:
+            self.set_balancing(balancing)
+        if failover is not None:
+            self.set_failover(failover)
+
+    @property
+    def _snapshot(self):
+        return self._snapshots.get(threading.get_ident(), None)
+
+    @_snapshot.setter
+    def _snapshot(self, value):
+        if value is None:
+            self._snapshots.pop(threading.get_ident(), None)
+        else:
+            self._snapshots[threading.get_ident()] = value
 
     def set_default(self, name):
         default_client = self.__get_default_client(name)
         if default_client is None:
             raise KeyError()
-        self.default_client = default_client
+        with self._lock:
+            self.default_client = default_client
+            self._snapshots = {}
+
+    def get_balancing(self):
+        return self.balancing
+
+    def set_balancing(self, balancing):
+        """
+        Enable multi-client mode, where torrents of each topic are added to one of several clients.
+
+        Client for topic is chosen once, on adding its first torrent, and is remembered,
+        so updated torrents replace old ones on the same client.
+        Topics of pinned trackers and download dirs go to their clients,
+        other topics go to the client chosen by policy.
+
+        :param balancing: None to add all torrents to default client, or dict with
+            'policy' - one of BalancingPolicy values,
+            'clients' - names of clients to add torrents to,
+            'trackers' - optional client name by tracker name,
+            'download_dirs' - optional client name by download dir prefix
+        :type balancing: dict | None
+        """
+        if balancing is not None:
+            if balancing.get('policy', None) not in BalancingPolicy.ALL:
+                raise ValueError('Unknown balancing policy {0}'.format(balancing.get('policy', None)))
+            balancing = {
+                'policy': balancing['policy'],
+                'clients': list(balancing.get('clients', None) or []),
+                'trackers': dict(balancing.get('trackers', None) or {}),
+                'download_dirs': dict(balancing.get('download_dirs', None) or {}),
+            }
+            if len(balancing['clients']) == 0:
+                raise ValueError('No clients to balance')
+            pinned = list(balancing['trackers'].values()) + list(balancing['download_dirs'].values())
+            for name in balancing['clients'] + pinned:
+                if name not in self.clients:
+                    raise KeyError('Client {0} not found'.format(name))
+            for name in pinned:
+                if name not in balancing['clients']:
+                    raise ValueError('Pinned client {0} is not balanced'.format(name))
+        with self._lock:
+            self.balancing = balancing
+            self._snapshots = {}
+            self._locations = {}
+
+    def get_failover(self):
+        return self.failover
+
+    def set_failover(self, failover):
+        """
+        Add torrents to secondary client, while client chosen for them fails too often.
+
+        :param failover: None to disable failover, or dict with
+            'client' - name of secondary client,
+            'error_rate' - optional part of failed calls in metrics window to fail over, 0.5 by default,
+            'min_calls' - optional calls count in window, fewer calls are not enough to decide, 5 by default
+        :type failover: dict | None
+        """
+        if failover is not None:
+            failover = {
+                'client': failover.get('client', None),
+                'error_rate': failover.get('error_rate', 0.5),
+                'min_calls': failover.get('min_calls', 5),
+            }
+            if failover['client'] not in self.clients:
+                raise KeyError('Client {0} not found'.format(failover['client']))
+            if self.clients[failover['client']] is self.default_client:
+                raise ValueError('Default client can\'t be its own failover client')
+            error_rate = failover['error_rate']
+            if isinstance(error_rate, bool) or not isinstance(error_rate, (int, float)) or not 0 < error_rate <= 1:
+                raise ValueError('Error rate has to be in (0, 1] range')
+            min_calls = failover['min_calls']
+            if isinstance(min_calls, bool) or not isinstance(min_calls, int) or min_calls < 1:
+                raise ValueError('Min calls has to be positive integer')
+        with self._lock:
+            self.failover = failover
+            self._snapshots = {}
+
+    def get_metrics(self, name=None):
+        """
+        :param name: client name or None for all clients
+        :return: metrics of one client or metrics by client name
+        :rtype: dict
+        """
+        if name is not None:
+            self.get_client(name)
+            return self.metrics.get_stats(name)
+        return {client_name: self.metrics.get_stats(client_name) for client_name in self.clients}
+
+    def take_snapshot(self):
+        """
+        Load list of all torrents from clients with one request per client,
+        find_torrent answers from it and add_torrent/remove_torrent update it until clear_snapshot is called.
+        Clients without get_torrents method are still asked on each find_torrent call.
+
+        :rtype: bool
+        """
+        self._snapshot = None
+        clients = self._get_search_clients()
+        if len(clients) == 0 or not all(hasattr(client, 'get_torrents') for client in clients):
+            return False
+        snapshot = {}
+        locations = {}
+        for client in clients:
+            try:
+                torrents = self._call(client, 'get_torrents')
+            except Exception as e:
+                log.warning("Can't load torrents from client", exception=str(e))
+                return False
+            if torrents is False or torrents is None:
+                return False
+            for torrent_hash, torrent in torrents.items():
+                snapshot[torrent_hash.upper()] = torrent
+                locations[torrent_hash.upper()] = client
+        with self._lock:
+            self._snapshot = snapshot
+            if self._has_locations():
+                # snapshot has all torrents of clients, so removed torrents don't stay in locations
+                self._locations = locations
+        return True
+
+    def clear_snapshot(self):
+        self._snapshot = None
 
     def get_default(self):
         return self.default_client
@@ -225,34 +475,354 @@ class ClientsManager(object):
 
     def set_settings(self, name, settings):
         client = self.get_client(name)
-        client.set_settings(settings)
+        with self._get_call_lock(name):
+            client.set_settings(settings)
 
     def check_connection(self, name):
         client = self.get_client(name)
-        return client.check_connection()
+        return self._call(client, 'check_connection')
 
     def get_client(self, name):
         return self.clients[name]
 
     def find_torrent(self, torrent_hash):
-        if self.default_client is None:
+        clients = self._get_search_clients()
+        if len(clients) == 0:
             return False
-        result = self.default_client.find_torrent(torrent_hash)
-        return result or False
+        if self._snapshot is not None:
+            return self._snapshot.get(torrent_hash.upper(), False)
+        location = self._locations.get(torrent_hash.upper(), None)
+        if location in clients:
+            clients.remove(location)
+            clients.insert(0, location)
+        error = None
+        for client in clients:
+            try:
+                result = self._call(client, 'find_torrent', torrent_hash)
+            except Exception as e:
+                if self.failover is None:
+                    raise
+                # failing client shouldn't prevent adding torrent to secondary one
+                log.warning("Can't find torrent in client", client=self._get_name(client), exception=str(e))
+                error = e
+                continue
+            if result:
+                with self._lock:
+                    self._locations[torrent_hash.upper()] = client
+                return result
+        if error is not None and len(clients) == 1:
+            raise error
+        return False
+
+    def find_torrents(self, torrent_hashes):
+        """
+        Find several torrents with one request per client if client supports find_torrents
+
+        :type torrent_hashes: list[str]
+        :return: found torrent or False for each of requested hashes
+        :rtype: dict[str, dict | bool]
+        """
+        clients = self._get_search_clients()
+        if len(clients) == 0 or len(torrent_hashes) == 0 or self._snapshot is not None:
+            return {torrent_hash: self.find_torrent(torrent_hash) for torrent_hash in torrent_hashes}
+        result = {torrent_hash: False for torrent_hash in torrent_hashes}
+        for client in clients:
+            pending = [torrent_hash for torrent_hash in torrent_hashes if not result[torrent_hash]]
+            if len(pending) == 0:
+                break
+            try:
+                if hasattr(client, 'find_torrents'):
+                    found = {torrent_hash.upper(): torrent
+                             for torrent_hash, torrent in self._call(client, 'find_torrents', pending).items()}
+                    found = {torrent_hash: found.get(torrent_hash.upper(), None) for torrent_hash in pending}
+                else:
+                    found = {torrent_hash: self._call(client, 'find_torrent', torrent_hash)
+                             for torrent_hash in pending}
+            except Exception as e:
+                if self.failover is None or len(clients) == 1:
+                    raise
+                log.warning("Can't find torrents in client", client=self._get_name(client), exception=str(e))
+                continue
+            for torrent_hash, torrent in found.items():
+                if torrent:
+                    result[torrent_hash] = torrent
+                    with self._lock:
+                        self._locations[torrent_hash.upper()] = client
+        return result
 
     def add_torrent(self, torrent, topic_settings):
         """
-        :type torrent: str
+        :param torrent: already decoded torrent, clients use its cached info_hash and raw_content
+        :type torrent: monitorrent.utils.bittorrent_ex.Torrent
         :type topic_settings: clients.TopicSettings | None
         """
-        if self.default_client is None:
+        client = self._fail_over(self._place(torrent, topic_settings, {}))
+        if client is None:
             return False
-        return self.default_client.add_torrent(torrent, topic_settings)
+        result = self._call(client, 'add_torrent', torrent, topic_settings)
+        if result:
+            self._added(client, torrent, topic_settings)
+        return result
+
+    def add_torrents(self, torrents):
+        """
+        Add several torrents with one request per client if client supports add_torrents
+
+        :type torrents: list[(monitorrent.utils.bittorrent_ex.Torrent, clients.TopicSettings | None)]
+        :return: result of adding for each torrent
+        :rtype: list[bool]
+        """
+        if len(self._get_clients()) == 0:
+            return [False] * len(torrents)
+        loads = {}
+        placed = [self._place(torrent, topic_settings, loads) for torrent, topic_settings in torrents]
+        placed = [self._fail_over(client) for client in placed]
+        results = [False] * len(torrents)
+        for client in self._unique(placed):
+            indexes = [i for i, placed_client in enumerate(placed) if placed_client is client]
+            client_torrents = [torrents[i] for i in indexes]
+            if hasattr(client, 'add_torrents'):
+                client_results = self._call(client, 'add_torrents', client_torrents)
+            else:
+                client_results = [self._call(client, 'add_torrent', torrent, topic_settings)
+                                  for torrent, topic_settings in client_torrents]
+            for i, result in zip(indexes, client_results):
+                results[i] = result
+                if result:
+                    self._added(client, *torrents[i])
+        return results
 
     def remove_torrent(self, torrent_hash):
-        if self.default_client is None:
+        client = self._get_location(torrent_hash)
+        if client is None:
             return False
-        return self.default_client.remove_torrent(torrent_hash)
+        result = self._call(client, 'remove_torrent', torrent_hash)
+        if result:
+            self._removed(torrent_hash)
+        return result
+
+    def remove_torrents(self, torrent_hashes):
+        """
+        Remove several torrents with one request per client if client supports remove_torrents
+
+        :type torrent_hashes: list[str]
+        :rtype: dict[str, bool]
+        """
+        result = {torrent_hash: False for torrent_hash in torrent_hashes}
+        if len(self._get_clients()) == 0 or len(torrent_hashes) == 0:
+            return result
+        if self._has_locations():
+            self.find_torrents([torrent_hash for torrent_hash in torrent_hashes
+                                if torrent_hash.upper() not in self._locations])
+        located = [(torrent_hash, self._get_location(torrent_hash, False)) for torrent_hash in torrent_hashes]
+        for client in self._unique(client for _, client in located):
+            if client is None:
+                continue
+            client_hashes = [torrent_hash for torrent_hash, located_client in located if located_client is client]
+            if hasattr(client, 'remove_torrents'):
+                removed = self._call(client, 'remove_torrents', client_hashes)
+                client_result = {torrent_hash: bool(removed) for torrent_hash in client_hashes}
+            else:
+                client_result = {torrent_hash: self._call(client, 'remove_torrent', torrent_hash)
+                                 for torrent_hash in client_hashes}
+            for torrent_hash, removed in client_result.items():
+                result[torrent_hash] = removed
+                if removed:
+                    self._removed(torrent_hash)
+        return result
+
+    def _get_clients(self):
+        """
+        Clients which torrents are added to: default one or balanced clients in multi-client mode
+
+        :rtype: list
+        """
+        if self.balancing is not None:
+            return [self.clients[name] for name in self.balancing['clients']]
+        return [self.default_client] if self.default_client is not None else []
+
+    def _get_search_clients(self):
+        """
+        Clients which can have added torrents: failover client can have them in addition to usual ones
+
+        :rtype: list
+        """
+        clients = self._get_clients()
+        if self.failover is not None and self.clients[self.failover['client']] not in clients:
+            clients.append(self.clients[self.failover['client']])
+        return clients
+
+    def _has_locations(self):
+        """
+        Torrents can be on several clients, so locations of torrents are remembered
+        """
+        return self.balancing is not None or self.failover is not None
+
+    def _get_location(self, torrent_hash, find=True):
+        """
+        :return: client, which has torrent, default client is always used in single client mode
+        """
+        if not self._has_locations():
+            return self.default_client
+        location = self._locations.get(torrent_hash.upper(), None)
+        if location is None and find and self.find_torrent(torrent_hash):
+            location = self._locations.get(torrent_hash.upper(), None)
+        return location
+
+    def _place(self, torrent, topic_settings, loads):
+        """
+        Choose client for new torrent
+
+        :param loads: torrents count or free space by client, shared by torrents of one add_torrents call
+        :type loads: dict
+        """
+        if self.balancing is None:
+            return self.default_client
+        clients = self._get_clients()
+
+        client = self._get_topic_client(topic_settings) or self._get_pinned_client(topic_settings)
+        if client is not None:
+            return client
+
+        policy = self.balancing['policy']
+        if policy == BalancingPolicy.ROUND_ROBIN:
+            with self._lock:
+                client = clients[self._round_robin_index % len(clients)]
+                self._round_robin_index += 1
+        elif policy == BalancingPolicy.LEAST_TORRENTS:
+            if len(loads) == 0:
+                loads.update({c: self._get_torrents_count(c) for c in clients})
+            client = min(clients, key=lambda c: loads[c])
+            loads[client] += 1
+        else:
+            if len(loads) == 0:
+                loads.update({c: self._get_free_space(c) for c in clients})
+            client = max(clients, key=lambda c: loads[c])
+            loads[client] -= torrent.size
+        return client
+
+    def _fail_over(self, client):
+        """
+        :return: failover client instead of chosen one, while chosen client fails too often
+        """
+        failover = self.failover
+        if failover is None or client is None:
+            return client
+        secondary = self.clients[failover['client']]
+        if client is secondary or self._is_healthy(client, failover) or not self._is_healthy(secondary, failover):
+            return client
+        log.warning("Client fails too often, torrent is added to failover client",
+                    client=self._get_name(client), failover_client=failover['client'])
+        return secondary
+
+    def _is_healthy(self, client, failover):
+        calls, error_rate = self.metrics.get_error_rate(self._get_name(client))
+        return calls < failover['min_calls'] or error_rate < failover['error_rate']
+
+    def _call(self, client, method, *args):
+        """
+        Call client plugin and record latency and result of call to metrics,
+        adding is failed when client returns False even without exception
+        """
+        name = self._get_name(client)
+        with self._get_call_lock(name):
+            start = monotonic()
+            try:
+                result = getattr(client, method)(*args)
+            except Exception as e:
+                self.metrics.record(name, method, monotonic() - start, str(e))
+                raise
+            duration = monotonic() - start
+        error = None
+        if method == 'add_torrent' and not result or method == 'add_torrents' and not all(result):
+            error = u"Torrent wasn't added"
+        self.metrics.record(name, method, duration, error)
+        return result
+
+    def _get_call_lock(self, name):
+        with self._lock:
+            return self._call_locks.setdefault(name, threading.RLock())
+
+    def _get_name(self, client):
+        for name, named_client in self.clients.items():
+            if named_client is client:
+                return name
+        return getattr(client, 'name', None)
+
+    def _get_topic_client(self, topic_settings):
+        if topic_settings is None or topic_settings.topic_id is None:
+            return None
+        with DBSession() as db:
+            topic_client = db.query(TopicClient).filter(TopicClient.topic_id == topic_settings.topic_id).first()
+            name = topic_client.client if topic_client is not None else None
+        if name not in self.balancing['clients']:
+            return None
+        return self.clients[name]
+
+    def _get_pinned_client(self, topic_settings):
+        if topic_settings is None:
+            return None
+        name = self.balancing['trackers'].get(topic_settings.tracker, None)
+        if name is None and topic_settings.download_dir is not None:
+            # the longest matched prefix wins
+            prefixes = [prefix for prefix in self.balancing['download_dirs']
+                        if topic_settings.download_dir.startswith(prefix)]
+            if len(prefixes) > 0:
+                name = self.balancing['download_dirs'][max(prefixes, key=len)]
+        return self.clients[name] if name is not None else None
+
+    def _get_torrents_count(self, client):
+        if self._snapshot is not None:
+            return sum(1 for torrent_hash in self._snapshot if self._locations.get(torrent_hash, None) is client)
+        if not hasattr(client, 'get_torrents'):
+            return float('inf')
+        try:
+            torrents = self._call(client, 'get_torrents')
+        except Exception as e:
+            log.warning("Can't load torrents from client", client=client.name, exception=str(e))
+            return float('inf')
+        return len(torrents) if torrents else 0
+
+    def _get_free_space(self, client):
+        if not hasattr(client, 'get_free_space'):
+            return 0
+        try:
+            return self._call(client, 'get_free_space') or 0
+        except Exception as e:
+            log.warning("Can't get free space of client", client=client.name, exception=str(e))
+            return 0
+
+    def _added(self, client, torrent, topic_settings):
+        with self._lock:
+            if self._has_locations():
+                self._locations[torrent.info_hash.upper()] = client
+            if self._snapshot is not None:
+                # client is not asked again, so added date is the time of adding
+                self._snapshot[torrent.info_hash.upper()] = {
+                    'name': torrent.content['info']['name'],
+                    'date_added': datetime.now(pytz.utc)
+                }
+        if self.balancing is not None and topic_settings is not None and topic_settings.topic_id is not None:
+            with DBSession() as db:
+                topic_client = db.query(TopicClient).filter(TopicClient.topic_id == topic_settings.topic_id).first()
+                if topic_client is None:
+                    topic_client = TopicClient(topic_id=topic_settings.topic_id)
+                    db.add(topic_client)
+                topic_client.client = self._get_name(client)
+
+    def _removed(self, torrent_hash):
+        with self._lock:
+            self._locations.pop(torrent_hash.upper(), None)
+            if self._snapshot is not None:
+                self._snapshot.pop(torrent_hash.upper(), None)
+
+    @staticmethod
+    def _unique(clients):
+        result = []
+        for client in clients:
+            if client not in result:
+                result.append(client)
+        return result
 
     def __get_default_client(self, name=None, default=None):
         if name is not None:
@@ -382,7 +952,23 @@ class DbClientsManager(ClientsManager):
         """
         self.settings_manager = settings_manager
         super(DbClientsManager, self).__init__(clients, settings_manager.get_default_client())
+        try:
+            super(DbClientsManager, self).set_balancing(settings_manager.clients_balancing)
+        except (KeyError, ValueError) as e:
+            log.warning("Clients balancing settings are ignored", exception=str(e))
+        try:
+            super(DbClientsManager, self).set_failover(settings_manager.clients_failover)
+        except (KeyError, ValueError) as e:
+            log.warning("Clients failover settings are ignored", exception=str(e))
 
     def set_default(self, name):
         self.settings_manager.set_default_client(name)
         super(DbClientsManager, self).set_default(name)
+
+    def set_balancing(self, balancing):
+        super(DbClientsManager, self).set_balancing(balancing)
+        self.settings_manager.clients_balancing = self.balancing
+
+    def set_failover(self, failover):
+        super(DbClientsManager, self).set_failover(failover)
+        self.settings_manager.clients_failover = self.failover
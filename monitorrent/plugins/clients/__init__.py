@@ -1,19 +1,77 @@
+from contextlib import contextmanager
+from threading import RLock
+
+from sqlalchemy import Column, Integer, String, ForeignKey
+
+from monitorrent.db import Base
 from monitorrent.plugins.trackers import Topic
 
 
 class TopicSettings(object):
     download_dir = None
+    topic_id = None
+    tracker = None
 
-    def __init__(self, download_dir):
+    def __init__(self, download_dir, topic_id=None, tracker=None):
         """
         :type download_dir: str | None
+        :param topic_id: id of topic, which torrent belongs to, clients manager remembers its client
+        :type topic_id: int | None
+        :type tracker: str | None
         """
         super(TopicSettings, self).__init__()
         self.download_dir = download_dir
+        self.topic_id = topic_id
+        self.tracker = tracker
 
     @staticmethod
     def from_topic(topic):
         """
         :type topic: Topic
         """
-        return TopicSettings(topic.download_dir)
+        return TopicSettings(topic.download_dir, topic.id, topic.type)
+
+
+class TopicClient(Base):
+    """
+    Client which torrents of topic are added to in multi-client mode
+    """
+    __tablename__ = "topic_clients"
+
+    topic_id = Column(Integer, ForeignKey('topics.id'), primary_key=True)
+    client = Column(String, nullable=False)
+
+
+class ClientConnection(object):
+    """
+    Connection to torrent client, which is created on first use and reused by next calls
+
+    Credentials are read only when connection is created. Connection is dropped when call with it fails,
+    so the next call connects again, and on invalidate, which has to be called after credentials change.
+    """
+    def __init__(self, connect):
+        """
+        :param connect: creates connected client, returns False when there are no credentials
+        :type connect: () -> object
+        """
+        self._connect = connect
+        self._client = None
+        self._lock = RLock()
+
+    @contextmanager
+    def client(self):
+        """
+        Connected client or False when there are no credentials, calls with it are serialized
+        """
+        with self._lock:
+            if self._client is None:
+                self._client = self._connect()
+            try:
+                yield self._client
+            except Exception:
+                self._client = None
+                raise
+
+    def invalidate(self):
+        with self._lock:
+            self._client = None
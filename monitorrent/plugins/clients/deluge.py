@@ -1,5 +1,4 @@
 import six
-import base64
 
 import structlog
 from deluge_client import DelugeRPCClient
@@ -7,6 +6,7 @@ import pytz
 from sqlalchemy import Column, Integer, String
 from monitorrent.db import Base, DBSession
 from monitorrent.plugin_managers import register_plugin
+from monitorrent.plugins.clients import ClientConnection
 from datetime import datetime
 
 log = structlog.get_logger()
@@ -54,6 +54,9 @@ class DelugeClientPlugin(object):
     DEFAULT_PORT = 58846
     SUPPORTED_FIELDS = ['download_dir']
 
+    def __init__(self):
+        self._connection = ClientConnection(self._get_client)
+
     def get_settings(self):
         with DBSession() as db:
             cred = db.query(DelugeCredentials).first()
@@ -71,6 +74,7 @@ class DelugeClientPlugin(object):
             cred.port = settings.get('port', None)
             cred.username = settings.get('username', None)
             cred.password = settings.get('password', None)
+        self._connection.invalidate()
 
     def _get_client(self):
         with DBSession() as db:
@@ -81,63 +85,105 @@ class DelugeClientPlugin(object):
 
             if not cred.port:
                 cred.port = self.DEFAULT_PORT
-            return DelugeRPCClient(cred.host, cred.port, cred.username, cred.password)
+            client = DelugeRPCClient(cred.host, cred.port, cred.username, cred.password)
+        # client reconnects by itself when connection is lost
+        client.connect()
+        return client
 
     def check_connection(self):
-        client = self._get_client()
-        if not client:
-            return False
-        client.connect()
-        return client.connected
+        with self._connection.client() as client:
+            if not client:
+                return False
+            # cached client doesn't know that daemon has gone, and it is dropped if request fails
+            client.call('daemon.info')
+            return client.connected
 
     def get_download_dir(self):
-        client = self._get_client()
-        if not client:
-            return None
-        client.connect()
-        return client.call('core.get_config_value', 'move_completed_path').decode('utf-8')
+        with self._connection.client() as client:
+            if not client:
+                return None
+            return client.call('core.get_config_value', 'move_completed_path').decode('utf-8')
+
+    def get_free_space(self):
+        """
+        :return: free space in bytes on disk of default download dir
+        :rtype: int | None
+        """
+        with self._connection.client() as client:
+            if not client:
+                return None
+            return client.call('core.get_free_space')
 
     def find_torrent(self, torrent_hash):
-        client = self._get_client()
-        if not client:
-            return False
-        client.connect()
-        torrent = client.call("core.get_torrent_status",
-                              torrent_hash.lower(), ['time_added', 'name'])
-        if len(torrent) == 0:
-            return False
-        # time_added return time in local timezone, so lets convert it to UTC
-        return {
+        with self._connection.client() as client:
+            if not client:
+                return False
+            torrent = client.call("core.get_torrent_status",
+                                  torrent_hash.lower(), ['time_added', 'name'])
+            if len(torrent) == 0:
+                return False
+            # time_added return time in local timezone, so lets convert it to UTC
+            return {
+                "name": torrent[b'name'].decode('utf-8'),
+                "date_added": datetime.utcfromtimestamp(torrent[b'time_added']).replace(tzinfo=pytz.utc)
+            }
+
+    def get_torrents(self):
+        """
+        :return: all torrents of client by their hash
+        :rtype: dict[str, dict] | bool
+        """
+        with self._connection.client() as client:
+            if not client:
+                return False
+            torrents = client.call("core.get_torrents_status", {}, ['time_added', 'name'])
+            return self._torrents_by_hash(torrents)
+
+    def find_torrents(self, torrent_hashes):
+        """
+        :type torrent_hashes: list[str]
+        :return: found torrents by their hash
+        :rtype: dict[str, dict]
+        """
+        with self._connection.client() as client:
+            if not client:
+                return {}
+            torrents = client.call("core.get_torrents_status",
+                                   {'id': [torrent_hash.lower() for torrent_hash in torrent_hashes]},
+                                   ['time_added', 'name'])
+            return self._torrents_by_hash(torrents)
+
+    @staticmethod
+    def _torrents_by_hash(torrents):
+        return {torrent_hash.decode('utf-8'): {
             "name": torrent[b'name'].decode('utf-8'),
             "date_added": datetime.utcfromtimestamp(torrent[b'time_added']).replace(tzinfo=pytz.utc)
-        }
+        } for torrent_hash, torrent in torrents.items()}
 
     def add_torrent(self, torrent, torrent_settings):
         # TODO add path to download
         # path_to_download = None
         """
-
+        :type torrent: monitorrent.utils.bittorrent_ex.Torrent
         :type torrent_settings: clients.TopicSettings
         """
-        client = self._get_client()
-        if not client:
-            return False
-        client.connect()
-        options = None
-        if torrent_settings is not None:
-            options = {}
-            if torrent_settings.download_dir is not None:
-                options['download_location'] = torrent_settings.download_dir
-        return client.call("core.add_torrent_file",
-                           None, base64.b64encode(torrent), options)
+        with self._connection.client() as client:
+            if not client:
+                return False
+            options = None
+            if torrent_settings is not None:
+                options = {}
+                if torrent_settings.download_dir is not None:
+                    options['download_location'] = torrent_settings.download_dir
+            return client.call("core.add_torrent_file",
+                               None, torrent.base64_content, options)
 
     def remove_torrent(self, torrent_hash):
-        client = self._get_client()
-        if not client:
-            return False
-        client.connect()
-        return client.call("core.remove_torrent",
-                           torrent_hash.lower(), False)
+        with self._connection.client() as client:
+            if not client:
+                return False
+            return client.call("core.remove_torrent",
+                               torrent_hash.lower(), False)
 
 
 register_plugin('client', 'deluge', DelugeClientPlugin())
@@ -1,11 +1,14 @@
 import os
+import shutil
+import time
 from datetime import datetime
 from builtins import object
+from threading import Lock
 from pytz import reference, utc
 from sqlalchemy import Column, Integer, String
 from monitorrent.db import Base, DBSession
 from monitorrent.plugin_managers import register_plugin
-from monitorrent.utils.bittorrent_ex import Torrent
+from monitorrent.utils.bittorrent_ex import Torrent, TorrentMeta
 import base64
 
 
@@ -16,6 +19,162 @@ class DownloaderSettings(Base):
     path = Column(String, nullable=False)
 
 
+class DownloaderTorrentFile(Base):
+    __tablename__ = "downloader_torrent_files"
+
+    id = Column(Integer, primary_key=True)
+    path = Column(String, nullable=False, index=True)
+    name = Column(String, nullable=False)
+    # None for files which are not valid torrents
+    info_hash = Column(String, nullable=True)
+    mtime = Column(Integer, nullable=False)
+    size = Column(Integer, nullable=False)
+
+
+class TorrentFilesIndex(object):
+    """
+    Index of info_hash to file name for torrent files in directory
+
+    Index is stored in db, so files are parsed only when they are new or their mtime or size have changed.
+    Directory is rescanned only when its own mtime changes, which happens on adding, removing or renaming files.
+    """
+    # directory mtime can have coarse resolution, changes made right after scan can keep it the same
+    dir_mtime_granularity = 2
+    _delete_chunk_size = 500
+
+    def __init__(self):
+        self.path = None
+        self._files = {}
+        self._hashes = {}
+        self._dir_mtime = None
+        self._lock = Lock()
+
+    def find(self, path, info_hash):
+        """
+        :rtype: str | None
+        """
+        with self._lock:
+            self._ensure_fresh(path)
+            name = self._hashes.get(info_hash, None)
+            if name is not None and not self._is_valid(name):
+                self._refresh()
+                name = self._hashes.get(info_hash, None)
+            return name
+
+    def update(self, path, name):
+        """
+        Update single file entry after file was added or removed
+        """
+        with self._lock:
+            if self.path != path:
+                self._load(path)
+            self._refresh([name])
+
+    def _ensure_fresh(self, path):
+        if self.path != path:
+            self._load(path)
+        try:
+            dir_mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            dir_mtime = None
+        if dir_mtime is None or dir_mtime != self._dir_mtime:
+            self._refresh()
+            if dir_mtime is not None and time.time() - dir_mtime / 1e9 > self.dir_mtime_granularity:
+                self._dir_mtime = dir_mtime
+
+    def _load(self, path):
+        self.path = path
+        self._dir_mtime = None
+        with DBSession() as db:
+            files = db.query(DownloaderTorrentFile).filter(DownloaderTorrentFile.path == path).all()
+            self._files = {f.name: (f.mtime, f.size, f.info_hash) for f in files}
+        self._update_hashes()
+
+    def _is_valid(self, name):
+        stat = self._stat(name)
+        return stat is not None and stat == self._files[name][:2]
+
+    def _stat(self, name):
+        try:
+            stat = os.stat(os.path.join(self.path, name))
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _scan(self):
+        stats = {}
+        try:
+            entries = os.scandir(self.path)
+        except OSError:
+            return stats
+        with entries:
+            for entry in entries:
+                if not entry.name.endswith(".torrent"):
+                    continue
+                try:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        stats[entry.name] = (stat.st_mtime_ns, stat.st_size)
+                except OSError:
+                    continue
+        return stats
+
+    def _refresh(self, names=None):
+        """
+        :param names: check only these files instead of scanning whole directory
+        :type names: list[str] | None
+        """
+        if names is None:
+            stats = self._scan()
+            removed = [name for name in self._files if name not in stats]
+        else:
+            stats = {}
+            removed = []
+            for name in names:
+                stat = self._stat(name)
+                if stat is None:
+                    if name in self._files:
+                        removed.append(name)
+                else:
+                    stats[name] = stat
+
+        changed = {}
+        for name, stat in stats.items():
+            indexed = self._files.get(name, None)
+            if indexed is not None and indexed[:2] == stat:
+                continue
+            try:
+                info_hash = TorrentMeta.from_file(os.path.join(self.path, name)).info_hash
+            except Exception:
+                info_hash = None
+            changed[name] = stat + (info_hash,)
+
+        if not changed and not removed:
+            return
+
+        for name in removed:
+            del self._files[name]
+        self._files.update(changed)
+        self._update_hashes()
+        self._save(removed + list(changed.keys()), changed)
+
+    def _update_hashes(self):
+        # the first file by name wins when several files have the same info_hash
+        self._hashes = {info_hash: name for name, (_, _, info_hash) in sorted(self._files.items(), reverse=True)
+                        if info_hash is not None}
+
+    def _save(self, deleted_names, changed):
+        with DBSession() as db:
+            for i in range(0, len(deleted_names), self._delete_chunk_size):
+                chunk = deleted_names[i:i + self._delete_chunk_size]
+                db.query(DownloaderTorrentFile) \
+                    .filter(DownloaderTorrentFile.path == self.path, DownloaderTorrentFile.name.in_(chunk)) \
+                    .delete(synchronize_session=False)
+            db.bulk_insert_mappings(DownloaderTorrentFile, [
+                {'path': self.path, 'name': name, 'mtime': mtime, 'size': size, 'info_hash': info_hash}
+                for name, (mtime, size, info_hash) in changed.items()])
+
+
 class DownloaderPlugin(object):
     name = "downloader"
     form = [{
@@ -29,6 +188,9 @@ class DownloaderPlugin(object):
     }]
     SUPPORTED_FIELDS = []
 
+    def __init__(self):
+        self.index = TorrentFilesIndex()
+
     def get_settings(self):
         with DBSession() as db:
             cred = db.query(DownloaderSettings).first()
@@ -58,39 +220,42 @@ class DownloaderPlugin(object):
             except OSError:
                 return False
 
+    def get_free_space(self):
+        """
+        :return: free space in bytes on disk of download path
+        :rtype: int | None
+        """
+        path = self.check_connection()
+        if not path:
+            return None
+        return shutil.disk_usage(path).free
+
     def find_torrent(self, torrent_hash):
         path = self.check_connection()
         if not path:
             return False
-        files = os.listdir(path)
-        for torrent_file in files:
-            file_path = os.path.join(path, torrent_file)
-            if torrent_file.endswith(".torrent") and os.path.isfile(file_path):
-                try:
-                    try:
-                        torrent = Torrent.from_file(file_path)
-                    except:
-                        continue
-                    if torrent.info_hash == torrent_hash:
-                        date_added = datetime.fromtimestamp(os.path.getctime(file_path))\
-                            .replace(tzinfo=reference.LocalTimezone()).astimezone(utc)
-                        return {"name": torrent_file, "date_added": date_added}
-                except OSError:
-                    continue
-        return False
+        torrent_file = self.index.find(path, torrent_hash)
+        if torrent_file is None:
+            return False
+        try:
+            date_added = datetime.fromtimestamp(os.path.getctime(os.path.join(path, torrent_file)))\
+                .replace(tzinfo=reference.LocalTimezone()).astimezone(utc)
+        except OSError:
+            return False
+        return {"name": torrent_file, "date_added": date_added}
 
-    def add_torrent(self, torrent_content, torrent_settings):
+    def add_torrent(self, torrent, torrent_settings):
+        """
+        :type torrent: Torrent
+        """
         path = self.check_connection()
         if not path:
             return False
         try:
-            try:
-                torrent = Torrent(torrent_content)
-            except Exception as e:
-                return False
             filename = torrent.info_hash + ".torrent"
             with open(os.path.join(path, filename), "wb") as f:
                 f.write(torrent.raw_content)
+            self.index.update(path, filename)
             return True
         except OSError:
             return False
@@ -104,6 +269,7 @@ class DownloaderPlugin(object):
             if not torrent:
                 return False
             os.remove(os.path.join(path, torrent["name"]))
+            self.index.update(path, torrent["name"])
             return True
         except OSError:
             return False
@@ -59,7 +59,14 @@ class QBittorrentClientPlugin(object):
     DEFAULT_PORT = 8080
     SUPPORTED_FIELDS = ['download_dir']
     ADDRESS_FORMAT = "{0}:{1}"
+    # max time to wait for added torrents to appear in client
+    add_timeout = 10
+    # first delay between sync/maindata requests, it doubles up to max_sync_interval
+    sync_interval = 0.05
+    max_sync_interval = 1
     _client = None
+    # last response id of sync/maindata, next request returns only changes after it
+    _sync_rid = 0
 
     def get_client(self):
         if not self._client:
@@ -99,6 +106,8 @@ class QBittorrentClientPlugin(object):
             cred.port = settings.get('port', None)
             cred.username = settings.get('username', None)
             cred.password = settings.get('password', None)
+        self._client = None
+        self._sync_rid = 0
 
     def check_connection(self):
         client = self.get_client()
@@ -120,6 +129,36 @@ class QBittorrentClientPlugin(object):
             }
         return False
 
+    def get_torrents(self):
+        """
+        :return: all torrents of client by their hash
+        :rtype: dict[str, dict] | bool
+        """
+        client = self.get_client()
+        if not client:
+            return False
+
+        return self._torrents_by_hash(client.torrents_info())
+
+    def find_torrents(self, torrent_hashes):
+        """
+        :type torrent_hashes: list[str]
+        :return: found torrents by their hash
+        :rtype: dict[str, dict]
+        """
+        client = self.get_client()
+        if not client:
+            return {}
+
+        return self._torrents_by_hash(client.torrents_info(hashes=[h.lower() for h in torrent_hashes]))
+
+    @staticmethod
+    def _torrents_by_hash(torrents):
+        return {torrent.hash: {
+            "name": torrent.name,
+            "date_added": datetime.fromtimestamp(torrent.added_on, utc)
+        } for torrent in torrents}
+
     def get_download_dir(self):
         client = self.get_client()
         if not client:
@@ -128,31 +167,82 @@ class QBittorrentClientPlugin(object):
         result = client.app_default_save_path()
         return six.text_type(result)
 
-    def add_torrent(self, torrent_content, torrent_settings):
+    def get_free_space(self):
         """
+        :return: free space in bytes on disk of default download dir
+        :rtype: int | None
+        """
+        client = self.get_client()
+        if not client:
+            return None
+        # full update, incremental one contains server state fields only when they were changed
+        return client.sync_maindata()['server_state']['free_space_on_disk']
+
+    def add_torrent(self, torrent, torrent_settings):
+        """
+        :type torrent: Torrent
         :type torrent_settings: clients.TopicSettings | None
         """
         client = self.get_client()
         if not client:
             return False
+        return self.add_torrents([(torrent, torrent_settings)])[0]
 
-        savepath = None
-        auto_tmm = None
-        if torrent_settings is not None and torrent_settings.download_dir is not None:
-            savepath = torrent_settings.download_dir
-            auto_tmm = False
+    def add_torrents(self, torrents):
+        """
+        Add torrents with one request per download dir and wait until all of them are added
 
-        res = client.torrents_add(save_path=savepath, use_auto_torrent_management=auto_tmm, torrent_contents=[('file.torrent', torrent_content)])
-        if 'Ok' in res:
-            torrent = Torrent(torrent_content)
-            torrent_hash = torrent.info_hash
-            for i in range(0, 10):
-                found = self.find_torrent(torrent_hash)
-                if found:
-                    return True
-                time.sleep(1)
+        :type torrents: list[(Torrent, clients.TopicSettings | None)]
+        :rtype: list[bool]
+        """
+        client = self.get_client()
+        if not client:
+            return [False] * len(torrents)
+
+        groups = {}
+        for torrent, torrent_settings in torrents:
+            savepath = None
+            if torrent_settings is not None and torrent_settings.download_dir is not None:
+                savepath = torrent_settings.download_dir
+            groups.setdefault(savepath, []).append(torrent)
+
+        pending = set()
+        for savepath, group in groups.items():
+            auto_tmm = False if savepath is not None else None
+            res = client.torrents_add(save_path=savepath, use_auto_torrent_management=auto_tmm,
+                                      torrent_contents=[(torrent.info_hash + '.torrent', torrent.raw_content)
+                                                        for torrent in group])
+            if 'Ok' in res:
+                pending.update(torrent.info_hash.lower() for torrent in group)
+
+        added = self._wait_added(client, pending)
+        return [torrent.info_hash.lower() in added for torrent, _ in torrents]
+
+    def _wait_added(self, client, torrent_hashes):
+        """
+        Wait until torrents appear in incremental sync/maindata updates or add_timeout expires
 
-        return res
+        :type torrent_hashes: set[str]
+        :return: hashes of added torrents
+        :rtype: set[str]
+        """
+        pending = set(torrent_hashes)
+        deadline = time.monotonic() + self.add_timeout
+        interval = self.sync_interval
+        while pending:
+            maindata = client.sync_maindata(rid=self._sync_rid)
+            self._sync_rid = maindata.get('rid', 0)
+            pending.difference_update(torrent_hash.lower() for torrent_hash in (maindata.get('torrents') or {}))
+            remaining = deadline - time.monotonic()
+            if not pending or remaining <= 0:
+                break
+            time.sleep(min(interval, remaining))
+            interval = min(interval * 2, self.max_sync_interval)
+
+        if pending:
+            # torrent which was already in client is not in incremental updates
+            pending.difference_update(torrent.hash.lower() for torrent in client.torrents_info(hashes=list(pending)))
+        return set(torrent_hashes) - pending
 
     def remove_torrent(self, torrent_hash):
         client = self.get_client()
@@ -162,6 +252,14 @@ class QBittorrentClientPlugin(object):
         client.torrents_delete(hashes=[torrent_hash.lower()])
         return True
 
+    def remove_torrents(self, torrent_hashes):
+        client = self.get_client()
+        if not client:
+            return False
+
+        client.torrents_delete(hashes=[torrent_hash.lower() for torrent_hash in torrent_hashes])
+        return True
+
     @staticmethod
     def _decorate_post(client):
         def _post_decorator(func):
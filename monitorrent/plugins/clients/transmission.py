@@ -4,7 +4,7 @@ from pytz import reference, utc
 from sqlalchemy import Column, Integer, String
 from monitorrent.db import Base, DBSession
 from monitorrent.plugin_managers import register_plugin
-import base64
+from monitorrent.plugins.clients import ClientConnection
 
 
 class TransmissionCredentials(Base):
@@ -49,6 +49,9 @@ class TransmissionClientPlugin(object):
     DEFAULT_PORT = 9091
     SUPPORTED_FIELDS = ['download_dir']
 
+    def __init__(self):
+        self._connection = ClientConnection(self._get_client)
+
     def get_settings(self):
         with DBSession() as db:
             cred = db.query(TransmissionCredentials).first()
@@ -66,56 +69,112 @@ class TransmissionClientPlugin(object):
             cred.port = settings.get('port', self.DEFAULT_PORT)
             cred.username = settings.get('username', None)
             cred.password = settings.get('password', None)
+        self._connection.invalidate()
 
-    def check_connection(self):
+    def _get_client(self):
         with DBSession() as db:
             cred = db.query(TransmissionCredentials).first()
             if not cred:
                 return False
-            client = transmissionrpc.Client(address=cred.host, port=cred.port,
-                                            user=cred.username, password=cred.password)
+            return transmissionrpc.Client(address=cred.host, port=cred.port,
+                                          user=cred.username, password=cred.password)
+
+    def check_connection(self):
+        with self._connection.client() as client:
+            if not client:
+                return False
+            # cached client doesn't know that daemon has gone, and it is dropped if request fails
+            client.get_session()
             return client
 
     def find_torrent(self, torrent_hash):
-        client = self.check_connection()
-        if not client:
-            return False
-        try:
-            torrent = client.get_torrent(torrent_hash.lower(), ['id', 'hashString', 'addedDate', 'name'])
-            return {
-                "name": torrent.name,
-                "date_added": torrent.date_added.replace(tzinfo=reference.LocalTimezone()).astimezone(utc)
-            }
-        except KeyError:
-            return False
+        with self._connection.client() as client:
+            if not client:
+                return False
+            try:
+                torrent = client.get_torrent(torrent_hash.lower(), ['id', 'hashString', 'addedDate', 'name'])
+                return {
+                    "name": torrent.name,
+                    "date_added": torrent.date_added.replace(tzinfo=reference.LocalTimezone()).astimezone(utc)
+                }
+            except KeyError:
+                return False
+
+    def get_torrents(self):
+        """
+        :return: all torrents of client by their hash
+        :rtype: dict[str, dict] | bool
+        """
+        with self._connection.client() as client:
+            if not client:
+                return False
+            torrents = client.get_torrents(arguments=['id', 'hashString', 'addedDate', 'name'])
+            return self._torrents_by_hash(torrents)
+
+    def find_torrents(self, torrent_hashes):
+        """
+        :type torrent_hashes: list[str]
+        :return: found torrents by their hash
+        :rtype: dict[str, dict]
+        """
+        with self._connection.client() as client:
+            if not client:
+                return {}
+            torrents = client.get_torrents([torrent_hash.lower() for torrent_hash in torrent_hashes],
+                                           arguments=['id', 'hashString', 'addedDate', 'name'])
+            return self._torrents_by_hash(torrents)
+
+    @staticmethod
+    def _torrents_by_hash(torrents):
+        return {torrent.hashString: {
+            "name": torrent.name,
+            "date_added": torrent.date_added.replace(tzinfo=reference.LocalTimezone()).astimezone(utc)
+        } for torrent in torrents}
 
     def get_download_dir(self):
-        client = self.check_connection()
-        if not client:
-            return None
-        session = client.get_session()
-        return six.text_type(session.download_dir)
+        with self._connection.client() as client:
+            if not client:
+                return None
+            session = client.get_session()
+            return six.text_type(session.download_dir)
+
+    def get_free_space(self):
+        """
+        :return: free space in bytes on disk of default download dir
+        :rtype: int | None
+        """
+        with self._connection.client() as client:
+            if not client:
+                return None
+            return client.free_space(client.get_session().download_dir)
 
     def add_torrent(self, torrent, torrent_settings):
         """
-        :type torrent: str
+        :type torrent: monitorrent.utils.bittorrent_ex.Torrent
         :type torrent_settings: clients.TopicSettings | None
         """
-        client = self.check_connection()
-        if not client:
-            return False
-        torrent_settings_dict = {}
-        if torrent_settings is not None:
-            if torrent_settings.download_dir is not None:
-                torrent_settings_dict['download_dir'] = torrent_settings.download_dir
-        client.add_torrent(base64.b64encode(torrent).decode('utf-8'), **torrent_settings_dict)
-        return True
+        with self._connection.client() as client:
+            if not client:
+                return False
+            torrent_settings_dict = {}
+            if torrent_settings is not None:
+                if torrent_settings.download_dir is not None:
+                    torrent_settings_dict['download_dir'] = torrent_settings.download_dir
+            client.add_torrent(torrent.base64_content.decode('ascii'), **torrent_settings_dict)
+            return True
 
     def remove_torrent(self, torrent_hash):
-        client = self.check_connection()
-        if not client:
-            return False
-        client.remove_torrent(torrent_hash.lower(), delete_data=False)
-        return True
+        with self._connection.client() as client:
+            if not client:
+                return False
+            client.remove_torrent(torrent_hash.lower(), delete_data=False)
+            return True
+
+    def remove_torrents(self, torrent_hashes):
+        with self._connection.client() as client:
+            if not client:
+                return False
+            client.remove_torrent([torrent_hash.lower() for torrent_hash in torrent_hashes], delete_data=False)
+            return True
 
 register_plugin('client', 'transmission', TransmissionClientPlugin())
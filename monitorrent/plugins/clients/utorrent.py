@@ -4,9 +4,9 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import json
+from threading import RLock
 
 import requests
-from io import BytesIO
 from sqlalchemy import Column, Integer, String
 
 from monitorrent.db import Base, DBSession
@@ -57,7 +57,21 @@ class UTorrentClientPlugin(object):
     SUPPORTED_FIELDS = ['download_dir']
     REQUEST_FORMAT = "{0}:{1}/gui/"
 
+    _params = None
+    # cache id of torrent list, list request with it returns only changes after previous request
+    _cid = None
+    _torrents = None
+
+    def __init__(self):
+        # token and torrent list are shared by engine and outbox threads
+        self._lock = RLock()
+
     def _get_params(self):
+        if not self._params:
+            self._params = self._login()
+        return self._params
+
+    def _login(self):
         with DBSession() as db:
             cred = db.query(UTorrentCredentials).first()
 
@@ -73,12 +87,69 @@ class UTorrentClientPlugin(object):
                 target = self.REQUEST_FORMAT.format(cred.host, cred.port)
                 response = session.get(target + "token.html",
                                        auth=(cred.username, cred.password))
-                soup = get_soup(response.text)
+                soup = get_soup(response.text, parse_only=['div'])
                 token = soup.div.text
                 return {'session': session, 'target': target, 'token': token}
             except Exception as e:
                 return False
 
+    def _reset(self):
+        with self._lock:
+            self._params = None
+            self._cid = None
+            self._torrents = None
+
+    def _request(self, method, payload, **kwargs):
+        """
+        Request web api with cached token, which is requested again with new session once it was expired
+
+        :rtype: requests.Response | None
+        """
+        with self._lock:
+            for attempt in range(2):
+                parameters = self._get_params()
+                if not parameters:
+                    return None
+                params = dict(payload, token=parameters['token'])
+                response = getattr(parameters['session'], method)(parameters['target'], params=params, **kwargs)
+                if attempt > 0 or response.status_code not in (400, 401):
+                    return response
+                self._reset()
+                # cache id belongs to expired session
+                payload = {key: value for key, value in payload.items() if key != 'cid'}
+
+    def _update_torrents(self):
+        """
+        Update local torrent list by changes since previous request
+
+        :return: torrents rows of web api by upper case hash
+        :rtype: dict[str, list] | None
+        """
+        with self._lock:
+            for attempt in range(2):
+                payload = {"list": '1'}
+                if self._cid is not None:
+                    payload['cid'] = self._cid
+                response = self._request('get', payload)
+                if response is None:
+                    return None
+                result = json.loads(response.text)
+                if 'torrents' in result:
+                    self._torrents = {torrent[0].upper(): torrent for torrent in result['torrents']}
+                    break
+                if self._torrents is not None:
+                    for torrent in result.get('torrentp', []):
+                        self._torrents[torrent[0].upper()] = torrent
+                    for torrent_hash in result.get('torrentm', []):
+                        self._torrents.pop(torrent_hash.upper(), None)
+                    break
+                # there is no full list to apply changes to, so full list is requested without cache id
+                self._cid = None
+            else:
+                return None
+            self._cid = result.get('torrentc', None)
+            return self._torrents
+
     def get_settings(self):
         with DBSession() as db:
             cred = db.query(UTorrentCredentials).first()
@@ -96,23 +167,23 @@ class UTorrentClientPlugin(object):
             cred.port = settings.get('port', None)
             cred.username = settings.get('username', None)
             cred.password = settings.get('password', None)
+        self._reset()
 
     def get_download_dir(self):
         return ''
 
     def check_connection(self):
-        return self._get_params()
+        with self._lock:
+            # cached token doesn't show that web ui is still available, so token is requested again
+            self._reset()
+            return self._get_params()
 
     def find_torrent(self, torrent_hash):
-        parameters = self._get_params()
-        if not parameters:
+        torrents = self._update_torrents()
+        if not torrents:
             return False
 
-        payload = {"list": '1', "token": parameters["token"]}
-        torrents = parameters['session'].get(parameters['target'],
-                                             params=payload)
-        array = json.loads(torrents.text)['torrents']
-        torrent = next(torrent for torrent in array if torrent[0] == torrent_hash)
+        torrent = torrents.get(torrent_hash.upper(), None)
         if torrent:
             return {
                 "name": torrent[2],
@@ -121,27 +192,53 @@ class UTorrentClientPlugin(object):
             }
         return False
 
+    def get_torrents(self):
+        """
+        :return: all torrents of client by their hash
+        :rtype: dict[str, dict] | bool
+        """
+        torrents = self._update_torrents()
+        if torrents is None:
+            return False
+
+        # date added not supported by web api
+        return {torrent[0]: {"name": torrent[2], "date_added": None} for torrent in torrents.values()}
+
+    def find_torrents(self, torrent_hashes):
+        """
+        :type torrent_hashes: list[str]
+        :return: found torrents by their hash
+        :rtype: dict[str, dict]
+        """
+        torrents = self._update_torrents()
+        if not torrents:
+            return {}
+        found = (torrents.get(torrent_hash.upper(), None) for torrent_hash in torrent_hashes)
+        return {torrent[0]: {"name": torrent[2], "date_added": None} for torrent in found if torrent}
+
     def add_torrent(self, torrent, torrent_settings):
-        parameters = self._get_params()
-        if not parameters:
+        """
+        :type torrent: monitorrent.utils.bittorrent_ex.Torrent
+        """
+        if not self._get_params():
             return False
 
-        payload = {"action": "add-file", "token": parameters["token"]}
-        files = {"torrent_file": BytesIO(torrent)}
+        payload = {"action": "add-file"}
         if torrent_settings is not None:
             if torrent_settings.download_dir is not None:
                 payload['path'] = torrent_settings.download_dir
-        r = parameters['session'].post(parameters['target'], params=payload, files=files)
+        # content is sent as bytes, so it can be sent again after token refresh
+        files = {"torrent_file": ("torrent_file", torrent.raw_content)}
+        r = self._request('post', payload, files=files)
+        if r is None:
+            return False
         return r.status_code == 200
 
     # TODO switch to remove torrent with data
     def remove_torrent(self, torrent_hash):
-        parameters = self._get_params()
-        if not parameters:
+        payload = {"action": "remove", "hash": torrent_hash}
+        if self._request('get', payload) is None:
             return False
-
-        payload = {"action": "remove", "hash": torrent_hash, "token": parameters["token"]}
-        parameters['session'].get(parameters['target'], params=payload)
         return True
 
 register_plugin('client', 'utorrent', UTorrentClientPlugin())
@@ -25,7 +25,7 @@ from monitorrent.plugins.status import Status
 from monitorrent.plugins.clients import TopicSettings
 from monitorrent.utils.bittorrent_ex import Torrent, is_torrent_content
 from monitorrent.utils.downloader import download
-from monitorrent.engine import Engine
+from monitorrent.engine import Engine, EnqueueResult
 from future.utils import with_metaclass
 
 log = structlog.get_logger()
@@ -283,12 +283,23 @@ class ExecuteWithHashChangeMixin(TrackerPluginMixinBase):
                     if torrent.info_hash != old_hash:
                         with engine_topic.start(1) as engine_downloads:
                             try:
-                                last_update = engine_downloads.add_torrent(0, filename, torrent, old_hash,
-                                                                           TopicSettings.from_topic(topic))
-                                engine.downloaded(u"Torrent <b>{0}</b> was changed".format(topic_name), torrent_content)
-                                topic.hash = torrent.info_hash
-                                topic.last_update = last_update
-                                self.save_topic(topic, last_update, Status.Ok)
+                                enqueued = engine_downloads.enqueue_torrent(0, filename, torrent, topic.id)
+                                if enqueued == EnqueueResult.QUEUED:
+                                    # hash and last_update are saved by outbox after client confirms adding
+                                    engine.downloaded(u"Torrent <b>{0}</b> was changed".format(topic_name),
+                                                      torrent_content)
+                                    self.save_topic(topic, None, Status.Ok)
+                                elif enqueued == EnqueueResult.ALREADY_QUEUED:
+                                    # change was already reported, when torrent was queued
+                                    self.save_topic(topic, None, Status.Ok)
+                                else:
+                                    last_update = engine_downloads.add_torrent(0, filename, torrent, old_hash,
+                                                                               TopicSettings.from_topic(topic))
+                                    engine.downloaded(u"Torrent <b>{0}</b> was changed".format(topic_name),
+                                                      torrent_content)
+                                    topic.hash = torrent.info_hash
+                                    topic.last_update = last_update
+                                    self.save_topic(topic, last_update, Status.Ok)
                             except Exception as e:
                                 log.error("Error while add downloading torrent to client", topic_name=topic_name,
                                           exception=str(e))
@@ -64,7 +64,7 @@ class AnidubTracker(object):
             return None
 
         r = requests.get(url, allow_redirects=False, **self.tracker_settings.get_requests_kwargs())
-        soup = get_soup(r.text)
+        soup = get_soup(r.text, parse_only=['span#news-title', 'div#tabs'])
         title = soup.find('span', id='news-title')
         if title is None:
             return None
@@ -107,7 +107,7 @@ class AnidubTracker(object):
     def get_download_url(self, url, vformat):
         cookies = self.get_cookies()
         page = requests.get(url, cookies=cookies, **self.tracker_settings.get_requests_kwargs())
-        page_soup = get_soup(page.text)
+        page_soup = get_soup(page.text, parse_only=['div#tabs', 'div.torrent'])
         flist = self._find_format_list(page_soup)
         for f in flist:
             if f.text.strip() == vformat:
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import re
 import sys
+import time
 import traceback
 
 import requests
@@ -71,7 +72,7 @@ def upgrade_0_to_1(operations_factory):
                 if tracker_settings is None:
                     tracker_settings = settings_manager.tracker_settings
                 response = requests.get(raw_topic['url'], **tracker_settings.get_requests_kwargs())
-                soup = get_soup(response.text)
+                soup = get_soup(response.text, parse_only=['table#publicTorrentTable'])
                 format_list = AnilibriaTvTracker._find_format_list(soup)
                 format_list.sort()
                 topic_values.append({'id': raw_topic['id'], 'format_list': ",".join(format_list),
@@ -91,61 +92,97 @@ def upgrade_0_to_1(operations_factory):
                                                      values={'status': upd['status']}))
 
 
+class AnilibriaTvRelease(object):
+    """
+
+        :type title: unicode | None
+        :type format_list: list[unicode]
+        :type download_urls: list[unicode]
+
+    """
+    def __init__(self, title, format_list, download_urls):
+        self.title = title
+        self.format_list = format_list
+        self.download_urls = download_urls
+
+
 class AnilibriaTvTracker(object):
     tracker_settings = None
+    # release pages are reused between parse_url and get_download_url calls of the same add or execute flow
+    release_cache_ttl = 60
     _tracker_regex = re.compile(r'^https://(www\.)?anilibria.tv/release/.*\.html$')
     _title_regex = re.compile(r'^.* / .*$')
     _format_regex = re.compile(r'^.*\[(.*)\]$')
 
+    def __init__(self):
+        self._releases = {}
+
     def can_parse_url(self, url):
         return self._tracker_regex.match(url) is not None
 
     def parse_url(self, url):
-        if not self.can_parse_url(url):
-            return None
-
-        match = self._tracker_regex.match(url)
-        if match is None:
+        release = self.get_release(url)
+        if release is None:
             return None
 
-        r = requests.get(url, allow_redirects=True, **self.tracker_settings.get_requests_kwargs())
-        soup = get_soup(r.text)
-
-        title = soup.title.string
+        title = release.title
 
-        if self._title_regex.match(title) is None:
+        if title is None or self._title_regex.match(title) is None:
             return None
 
-        format_list = self._find_format_list(soup)
-        if format_list is not None:
-            format_list.sort()
+        format_list = sorted(release.format_list)
 
         return {'original_name': title, 'format_list': format_list}
 
     def get_download_url(self, url, vformat):
-        if not self.can_parse_url(url):
-            return None
-
-        match = self._tracker_regex.match(url)
-        if match is None:
+        release = self.get_release(url)
+        if release is None:
             return None
 
-        r = requests.get(url, allow_redirects=True, **self.tracker_settings.get_requests_kwargs())
-        soup = get_soup(r.text)
-
-        flist = self._find_format_list(soup)
+        flist = release.format_list
 
         try:
             torrent_idx = -1
 
-            if flist is not None and vformat is not None:
+            if vformat is not None:
                 torrent_idx = flist.index(vformat) if vformat in flist else -1
 
-            a = soup.find_all("a", class_="torrent-download-link")[torrent_idx]
+            href = release.download_urls[torrent_idx]
         except IndexError:
             return None
 
-        return None if a is None else "https://www.anilibria.tv" + a["href"]
+        return "https://www.anilibria.tv" + href
+
+    def get_release(self, url):
+        """
+        Fetch and parse release page, parsed release is cached for release_cache_ttl seconds
+
+        :rtype: AnilibriaTvRelease | None
+        """
+        if not self.can_parse_url(url):
+            return None
+
+        cached = self._releases.get(url, None)
+        if cached is not None:
+            expires, release = cached
+            if expires >= time.time():
+                return release
+
+        r = requests.get(url, allow_redirects=True, **self.tracker_settings.get_requests_kwargs())
+        soup = get_soup(r.text, parse_only=['title', 'table#publicTorrentTable', 'a.torrent-download-link'])
+
+        title = soup.title.string if soup.title is not None else None
+        format_list = self._find_format_list(soup)
+        download_urls = [a["href"] for a in soup.find_all("a", class_="torrent-download-link")]
+
+        release = AnilibriaTvRelease(title, format_list, download_urls)
+        # error or challenge page has no formats, it isn't cached so retry requests the page again
+        if r.ok and len(format_list) > 0:
+            self._releases[url] = (time.time() + self.release_cache_ttl, release)
+        return release
+
+    def clear_cache(self):
+        self._releases.clear()
 
     @staticmethod
     def _find_format_list(soup):
@@ -208,6 +245,11 @@ class AnilibriaTvPlugin(ExecuteWithHashChangeMixin, TrackerPluginBase):
         }
         return settings
 
+    def execute(self, topics, engine):
+        # release pages should be fetched at least once per execute
+        self.tracker.clear_cache()
+        super(AnilibriaTvPlugin, self).execute(topics, engine)
+
     def _set_format_list(self, format_list):
         self.topic_form[0]['content'][1]['options'] = format_list
 
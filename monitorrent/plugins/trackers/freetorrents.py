@@ -68,7 +68,7 @@ class FreeTorrentsOrgTracker(object):
 
         r = requests.get(url, allow_redirects=True, **self.tracker_settings.get_requests_kwargs())
 
-        soup = get_soup(r.content)
+        soup = get_soup(r.content, parse_only=['h1'])
         if soup.h1 is None:
             # rutracker doesn't return 404 for not existing topic
             # it return regular page with text 'Тема не найдена'
@@ -114,7 +114,7 @@ class FreeTorrentsOrgTracker(object):
     def get_download_url(self, url):
         cookies = self.get_cookies()
         page = requests.get(url, cookies=cookies, **self.tracker_settings.get_requests_kwargs())
-        page_soup = get_soup(page.content)
+        page_soup = get_soup(page.content, parse_only=['a.genmed'])
         download = page_soup.find("a", {"class": "genmed"})
         return download.attrs['href']
 
@@ -50,7 +50,7 @@ class HdclubTracker(object):
 
         r = requests.get(url, allow_redirects=False, **self.tracker_settings.get_requests_kwargs())
 
-        soup = get_soup(r.text)
+        soup = get_soup(r.text, parse_only=['h1'])
         if soup.h1 is None:
             # Hdclub doesn't return 404 for not existing topic
             # it return regular page with text 'Тема не найдена'
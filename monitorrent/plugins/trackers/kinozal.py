@@ -147,7 +147,7 @@ class KinozalTracker(object):
 
         r = requests.get(url, allow_redirects=False, **self.tracker_settings.get_requests_kwargs())
 
-        soup = get_soup(r.text)
+        soup = get_soup(r.text, parse_only=['h1'])
         if soup.h1 is None:
             # Kinozal doesn't return 404 for not existing topic
             # it return regular page with text 'Тема не найдена'
@@ -200,7 +200,7 @@ class KinozalTracker(object):
         response = requests.get(url, **self.tracker_settings.get_requests_kwargs())
         response.raise_for_status()
 
-        soup = get_soup(response.text)
+        soup = get_soup(response.text, parse_only=['div.mn1_menu'])
         content = soup.find("div", {"class": "mn1_menu"})
         text_element = content.find(lambda tag: (tag.name == 'li') and (u'Обновлен' in tag.contents))
         date_text = None
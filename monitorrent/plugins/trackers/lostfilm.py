@@ -6,8 +6,13 @@ from urllib.parse import urlparse
 
 import requests
 import cloudscraper
+import feedparser
+import time
+import threading
 import traceback
 import six
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from enum import Enum
 from requests import Response
 from sqlalchemy import Column, Integer, String, MetaData, Table, ForeignKey
@@ -35,6 +40,9 @@ class LostFilmTVSeries(Topic):
     episode = Column(Integer, nullable=True)
     quality = Column(String, nullable=False, server_default='SD')
 
+    # not stored, series checked by id are checked regardless of new episodes feed
+    requested_by_id = False
+
     __mapper_args__ = {
         'polymorphic_identity': PLUGIN_NAME
     }
@@ -212,7 +220,7 @@ def upgrade_3_to_4(engine, operations_factory):
                     old_url = 'https://www.lostfilm.tv/browse.php?cat={0}'.format(cat)
                     url_response = scraper.get(old_url, **tracker_settings.get_requests_kwargs())
 
-                    soup = get_soup(url_response.text)
+                    soup = get_soup(url_response.text, parse_only=['meta'])
                     meta_content = soup.find('meta').attrs['content']
                     redirect_url = meta_content.split(';')[1].strip()[4:]
 
@@ -322,6 +330,23 @@ class LostFilmSeason(object):
 
         self.episodes_dict[episode.number] = episode
 
+    def add_episodes(self, episodes):
+        """
+        Add multiple episodes at once, sorting the episode list only once
+
+        :type episodes: list[LostFilmEpisode]
+        """
+        episodes_dict = {}
+        for episode in episodes:
+            if episode.number in self.episodes_dict or episode.number in episodes_dict:
+                raise Exception("Episode {0} already exists in the season {1}".format(episode.number, self.number))
+            episodes_dict[episode.number] = episode
+
+        self.episodes.extend(episodes)
+        self.episodes.sort(key=lambda s: s.number, reverse=True)
+
+        self.episodes_dict.update(episodes_dict)
+
     def is_special_season(self):
         return SpecialSeasons.is_special(self.number)
 
@@ -464,6 +489,22 @@ class LostFileDownloadInfo(object):
         self.download_url = download_url
 
 
+class LostFilmFeedEntry(object):
+    """
+
+        :type url_name: unicode
+        :type cat: int | None
+        :type season: int
+        :type episode: int
+
+    """
+    def __init__(self, url_name, cat, season, episode):
+        self.url_name = url_name
+        self.cat = cat
+        self.season = season
+        self.episode = episode
+
+
 class LostFilmTVTracker(object):
     tracker_settings: TrackerSettings = None
     _season_title_info = re.compile(u'^(?P<season>\d+)(\.(?P<season_fraction>\d+))?\s+сезон' +
@@ -471,7 +512,13 @@ class LostFilmTVTracker(object):
     _follow_show_re = re.compile(r'^FollowSerial\((?P<cat>\d+)(\s*,\s*(true|false))?\)$', re.UNICODE)
     _play_episode_re = re.compile(r"^PlayEpisode\('(?P<cat>\d{1,3})\s*(?P<season>\d{3})\s*(?P<episode>\d{3})'\)$",
                                   re.UNICODE)
+    _feed_link_re = re.compile(r'/series/(?P<name>[^/]+)/season_(?P<season>\d+)/episode_(?P<episode>\d+)',
+                               re.UNICODE)
+    _feed_cat_re = re.compile(r'/Images/(?P<cat>\d+)/', re.UNICODE)
     playwright_timeout = 30000
+    max_parallel_requests = 4
+    # resolved download page urls are signed by lostfilm and expire after a while
+    download_page_url_ttl = 30 * 60
 
     def __init__(self, headers_cookies_updater=lambda h, c: None, session=None, headers=None, cookies=None, domain=None):
         self.session = session
@@ -479,6 +526,8 @@ class LostFilmTVTracker(object):
         self.cookies = cookies or {}
         self.domain = domain or "www.lostfilm.tv"
         self.headers_cookies_updater = headers_cookies_updater
+        self._download_page_urls = {}
+        self._download_page_urls_lock = threading.Lock()
 
     def setup(self, session=None, headers=None, cookies=None, domain=None):
         self.session = session
@@ -523,8 +572,11 @@ class LostFilmTVTracker(object):
         url = self.replace_domain(url)
         return LostFilmShow.get_seasons_url(url, self.domain) is not None
 
-    def parse_url(self, url, parse_series=False):
+    def parse_url(self, url, parse_series=False, last_episode=None):
         """
+        :param last_episode: (season, episode) of the last known episode, when specified
+            only episodes newer than it are parsed
+        :type last_episode: tuple[int, int] | None
         :rtype: requests.Response | LostFilmShow
         """
         url = self.replace_domain(url)
@@ -540,7 +592,8 @@ class LostFilmTVTracker(object):
                 or '<meta http-equiv="refresh" content="0; url=/">' in response.text:
             return response
         # lxml have some issue with parsing lostfilm on Windows, so replace it on html5lib for Windows
-        soup = get_soup(response.text, 'html5lib' if sys.platform == 'win32' else None)
+        soup = get_soup(response.text, 'html5lib' if sys.platform == 'win32' else None,
+                        parse_only=['div.title-block', 'div.series-block'])
         title_block = soup.find('div', class_='title-block')
         follow_show = title_block.find('div', onclick=self._follow_show_re).attrs['onclick']
         follow_show_match = self._follow_show_re.match(follow_show)
@@ -551,40 +604,63 @@ class LostFilmTVTracker(object):
                               cat=int(follow_show_match.group('cat')),
                               domain=self.domain)
         if parse_series:
-            for season in self._parse_series(soup):
+            for season in self._parse_series(soup, last_episode):
                 result.add_season(season)
         return result
 
-    def _parse_series(self, soup):
+    def _parse_series(self, soup, last_episode=None):
         """
-        :rtype : dict
+        Seasons page lists seasons and episodes from the newest to the oldest,
+        so when last_episode is specified parsing stops as soon as it is reached
+
+        :type last_episode: tuple[int, int] | None
+        :rtype : collections.Iterable[LostFilmSeason]
         """
         series_block = soup.find('div', class_='series-block')
-        serie_blocks = series_block.find_all('div', class_='serie-block')
-        result = dict()
-        for season_node in serie_blocks:
+        season_node = series_block.find('div', class_='serie-block')
+        while season_node is not None:
+            next_season_node = season_node.find_next_sibling('div', class_='serie-block')
             season_title = season_node.find('h2').text
-            series_table = season_node.find('table', class_='movie-parts-list')
-            series = series_table.find_all('tr', class_=None)
+            season_number = self._parse_season_info(season_title)
 
-            # when next season is planned it already exist on seasons page
-            # but without any episodes yet and without download button
-            if not any(series):
+            # special seasons are never downloaded, so skip them in incremental mode
+            if last_episode is not None and SpecialSeasons.is_special(season_number):
+                season_node = next_season_node
                 continue
+            # all remaining seasons are older than last known episode
+            if last_episode is not None and isinstance(season_number, int) and season_number < last_episode[0]:
+                return
 
-            season_number = self._parse_season_info(season_title)
-
-            season = LostFilmSeason(season_number)
-            for serie in series:
+            series_table = season_node.find('table', class_='movie-parts-list')
+            episodes = []
+            reached_last_episode = False
+            serie = series_table.find('tr', class_=None)
+            while serie is not None:
                 zeta = serie.find('td', class_='zeta')
                 play_episode = zeta.find('div').attrs['onclick']
 
                 play_episode_match = self._play_episode_re.match(play_episode)
                 episode_number = int(play_episode_match.group('episode'))
 
-                episode = LostFilmEpisode(season_number, episode_number)
-                season.add_episode(episode)
-            yield season
+                if last_episode is not None and isinstance(season_number, int) and \
+                        (season_number, episode_number) <= last_episode:
+                    reached_last_episode = True
+                    break
+
+                episodes.append(LostFilmEpisode(season_number, episode_number))
+                serie = serie.find_next_sibling('tr', class_=None)
+
+            # when next season is planned it already exist on seasons page
+            # but without any episodes yet and without download button
+            if len(episodes) > 0:
+                season = LostFilmSeason(season_number)
+                season.add_episodes(episodes)
+                yield season
+
+            if reached_last_episode:
+                return
+
+            season_node = next_season_node
 
     def _parse_season_info(self, info):
         if info == u'Дополнительные материалы':
@@ -603,28 +679,64 @@ class LostFilmTVTracker(object):
         if LostFilmShow.get_seasons_url(url, self.domain) is None:
             return None
 
+        update_headers_and_cookies_mixin(self, url)
+
+        return self._get_download_info(cat, season, episode)
+
+    def get_download_infos(self, url, cat, episodes):
+        """
+        Resolve download info for multiple episodes of one show concurrently,
+        at most max_parallel_requests at a time
+
+        :type episodes: list[tuple[int, int]]
+        :rtype: list[list[LostFileDownloadInfo]] | None
+        """
+        url = self.replace_domain(url)
+        if LostFilmShow.get_seasons_url(url, self.domain) is None:
+            return None
+
+        if len(episodes) == 0:
+            return []
+
+        update_headers_and_cookies_mixin(self, url)
+
+        if len(episodes) == 1:
+            return [self._get_download_info(cat, *episodes[0])]
+
+        with ThreadPoolExecutor(max_workers=min(self.max_parallel_requests, len(episodes))) as executor:
+            return list(executor.map(lambda e: self._get_download_info(cat, *e), episodes))
+
+    def _get_download_info(self, cat, season, episode):
         def parse_download(table):
             quality = table.find('div', class_="inner-box--label").text.strip()
             download_url = table.find('a').attrs['href']
 
             return LostFileDownloadInfo(LostFilmQuality.parse(quality), download_url)
 
-        update_headers_and_cookies_mixin(self, url)
+        cache_key = (self.domain, cat, season, episode)
+        session = requests.session()
+
+        download_page_url = self._get_cached_download_page_url(cache_key)
+        if download_page_url is not None:
+            table = self._get_download_table(session, download_page_url)
+            if len(table) > 0:
+                return list(map(parse_download, table))
+            # cached url isn't valid anymore, resolve it again
+            self._download_page_urls.pop(cache_key, None)
 
         download_url_pattern = 'https://{domain}/v_search.php?a={cat}{season:03d}{episode:03d}'
         download_redirect_url = download_url_pattern.format(cat=cat, season=season, episode=episode, domain=self.domain)
-        session = requests.session()
         download_redirect = requests.get(download_redirect_url, headers=self.headers, cookies=self.get_cookies(),
                                          **self.tracker_settings.get_requests_kwargs())
 
-        soup = get_soup(download_redirect.text)
+        soup = get_soup(download_redirect.text, parse_only=['meta'])
         meta_content = soup.find('meta').attrs['content']
         download_page_url = meta_content.split(';')[1].strip()[4:]
 
         download_page = session.get(download_page_url, headers=self.headers, cookies=self.get_cookies(),
                                     **self.tracker_settings.get_requests_kwargs())
 
-        soup = get_soup(download_page.text)
+        soup = get_soup(download_page.text, parse_only=['div.inner-box--item', 'a'])
         table = soup.find_all('div', class_='inner-box--item')
         if len(table) == 0:
             def a_href(tag):
@@ -633,12 +745,65 @@ class LostFilmTVTracker(object):
             url_parts = urlparse(download_page_url)
             new_url_pattern = '{scheme}://{netloc}{path}'
             download_page_url = new_url_pattern.format(scheme=url_parts.scheme, netloc=url_parts.netloc, path=next_path)
-            download_page = session.get(download_page_url, headers=self.headers, cookies=self.get_cookies(),
-                                    **self.tracker_settings.get_requests_kwargs())
-            soup = get_soup(download_page.text)
-            table = soup.find_all('div', class_='inner-box--item')
+            table = self._get_download_table(session, download_page_url)
+        if len(table) > 0:
+            self._cache_download_page_url(cache_key, download_page_url)
         return list(map(parse_download, table))
 
+    def _get_download_table(self, session, download_page_url):
+        download_page = session.get(download_page_url, headers=self.headers, cookies=self.get_cookies(),
+                                    **self.tracker_settings.get_requests_kwargs())
+        soup = get_soup(download_page.text, parse_only=['div.inner-box--item', 'a'])
+        return soup.find_all('div', class_='inner-box--item')
+
+    def _cache_download_page_url(self, cache_key, download_page_url):
+        now = time.time()
+        with self._download_page_urls_lock:
+            # entry expires on its own lookup only, so expired entries of other episodes are purged here
+            expired = [key for key, (_, expires) in self._download_page_urls.items() if expires < now]
+            for key in expired:
+                del self._download_page_urls[key]
+            self._download_page_urls[cache_key] = (download_page_url, now + self.download_page_url_ttl)
+
+    def clear_download_page_urls(self):
+        with self._download_page_urls_lock:
+            self._download_page_urls.clear()
+
+    def _get_cached_download_page_url(self, cache_key):
+        cached = self._download_page_urls.get(cache_key, None)
+        if cached is None:
+            return None
+        download_page_url, expires = cached
+        if expires < time.time():
+            self._download_page_urls.pop(cache_key, None)
+            return None
+        return download_page_url
+
+    def get_new_episodes(self):
+        """
+        Parse site-wide feed of new episodes
+
+        :rtype: list[LostFilmFeedEntry]
+        """
+        url = 'https://{domain}/rss.xml'.format(domain=self.domain)
+        response = requests.get(url, headers=self.headers, cookies=self.get_cookies(),
+                                **self.tracker_settings.get_requests_kwargs())
+        if response.status_code != 200:
+            raise LostFilmTVException(u"Can't download new episodes feed. Status: {}".format(response.status_code))
+
+        feed = feedparser.parse(response.content)
+        result = []
+        for entry in feed.entries:
+            link_match = self._feed_link_re.search(entry.get('link', ''))
+            if not link_match:
+                continue
+            cat_match = self._feed_cat_re.search(entry.get('description', ''))
+            result.append(LostFilmFeedEntry(url_name=link_match.group('name'),
+                                            cat=int(cat_match.group('cat')) if cat_match else None,
+                                            season=int(link_match.group('season')),
+                                            episode=int(link_match.group('episode'))))
+        return result
+
     def replace_domain(self, url):
         url_parts = urlparse(url)
         url_parts = url_parts._replace(netloc=self.domain)
@@ -744,9 +909,15 @@ class LostFilmPlugin(WithCredentialsMixin, TrackerPluginBase):
         }]
     }]
 
+    # check only series mentioned in new episodes feed,
+    # but check all series at least once in full_sweep_interval
+    new_episodes_feed_enabled = True
+    full_sweep_interval = timedelta(hours=12)
+
     def __init__(self, headers=None, cookies=None, domain=None):
         self.tracker = LostFilmTVTracker(headers_cookies_updater=self._update_headers_and_cookies,
                                          headers=headers, cookies=cookies, domain=domain)
+        self._last_full_sweep = None
 
     def configure(self, config):
         self.tracker.playwright_timeout = config.playwright_timeout
@@ -788,6 +959,13 @@ class LostFilmPlugin(WithCredentialsMixin, TrackerPluginBase):
             self.tracker.domain = cred.domain or 'www.lostfilm.tv'
             topic.url = self.tracker.replace_domain(topic.url)
 
+    def get_topics(self, ids):
+        topics = super(LostFilmPlugin, self).get_topics(ids)
+        if ids is not None and len(ids) > 0:
+            for topic in topics:
+                topic.requested_by_id = True
+        return topics
+
     def get_thumbnail_url(self, topic: LostFilmTVSeries):
         return "https://static.lostfilm.top/Images/{0}/Posters/icon.jpg".format(topic.cat)
 
@@ -846,9 +1024,17 @@ class LostFilmPlugin(WithCredentialsMixin, TrackerPluginBase):
         :type engine: engine.EngineTracker
         :rtype: None
         """
+        try:
+            self._execute(topics, engine)
+        finally:
+            self.tracker.clear_download_page_urls()
+
+    def _execute(self, topics, engine):
         if not self._execute_login(engine):
             return
 
+        topics = self._filter_topics_by_feed(topics, engine)
+
         with engine.start(len(topics)) as engine_topics:
             for i in range(0, len(topics)):
                 topic = topics[i]
@@ -871,43 +1057,136 @@ class LostFilmPlugin(WithCredentialsMixin, TrackerPluginBase):
                         continue
 
                     with engine_topic.start(len(episodes)) as engine_downloads:
-                        for e in range(0, len(episodes)):
-                            info, download_info = episodes[e]
-
-                            if download_info is None:
-                                engine_downloads.failed(u'Failed get quality "{0}" for series: {1}'
-                                                        .format(topic.quality, html.escape(display_name)))
-                                # Should fail to get quality be treated as NotFound?
-                                self.save_topic(topic, None, Status.Error)
-                                break
-
+                        # episodes are downloaded first and added to client in one batch,
+                        # episodes downloaded before an error are still added and saved
+                        steps = []
+                        try:
+                            for e in range(0, len(episodes)):
+                                info, download_info = episodes[e]
+                                engine_downloads.update_progress(e)
+
+                                if download_info is None:
+                                    engine_downloads.failed(u'Failed get quality "{0}" for series: {1}'
+                                                            .format(topic.quality, html.escape(display_name)))
+                                    # Should fail to get quality be treated as NotFound?
+                                    steps.append(None)
+                                    break
+
+                                try:
+                                    response, filename = download(download_info.download_url,
+                                                                  **self.tracker_settings.get_requests_kwargs())
+                                    if response.status_code != 200:
+                                        raise Exception(u"Can't download url. Status: {}"
+                                                        .format(response.status_code))
+                                except Exception as e:
+                                    engine_downloads.failed(u"Failed to download from <b>{0}</b>.\nReason: {1}"
+                                                            .format(download_info.download_url,
+                                                                    html.escape(str(e))))
+                                    steps.append(None)
+                                    continue
+                                if not filename:
+                                    filename = display_name
+                                torrent_content = response.content
+                                if not is_torrent_content(torrent_content):
+                                    headers = ['{0}: {1}'.format(k, v) for k, v in six.iteritems(response.headers)]
+                                    engine.failed(u'Downloaded content is not a torrent file.<br>\r\n'
+                                                  u'Headers:<br>\r\n{0}'.format(u'<br>\r\n'.join(headers)))
+                                    continue
+                                steps.append((info, filename, Torrent(torrent_content)))
+                        except Exception:
+                            # error of adding episodes shouldn't hide the original one
                             try:
-                                response, filename = download(download_info.download_url,
-                                                              **self.tracker_settings.get_requests_kwargs())
-                                if response.status_code != 200:
-                                    raise Exception(u"Can't download url. Status: {}".format(response.status_code))
+                                self._add_episodes(topic, steps, engine_downloads)
                             except Exception as e:
-                                engine_downloads.failed(u"Failed to download from <b>{0}</b>.\nReason: {1}"
-                                                        .format(download_info.download_url, html.escape(str(e))))
-                                self.save_topic(topic, None, Status.Error)
-                                continue
-                            if not filename:
-                                filename = display_name
-                            torrent_content = response.content
-                            if not is_torrent_content(torrent_content):
-                                headers = ['{0}: {1}'.format(k, v) for k, v in six.iteritems(response.headers)]
-                                engine.failed(u'Downloaded content is not a torrent file.<br>\r\n'
-                                              u'Headers:<br>\r\n{0}'.format(u'<br>\r\n'.join(headers)))
-                                continue
-                            torrent = Torrent(torrent_content)
-                            topic.season = info.season
-                            topic.episode = info.number
-                            last_update = engine_downloads.add_torrent(e, filename, torrent, None,
-                                                                       TopicSettings.from_topic(topic))
-                            engine_downloads.downloaded(u'Download new series: {0} ({1}, {2})'
-                                                        .format(display_name, info.season, info.number),
-                                                        torrent_content)
-                            self.save_topic(topic, last_update, Status.Ok)
+                                engine_downloads.failed(u"Failed to add downloaded episodes of <b>{0}</b>.\n"
+                                                        u"Reason: {1}".format(html.escape(display_name),
+                                                                              html.escape(str(e))))
+                            raise
+                        self._add_episodes(topic, steps, engine_downloads)
+
+    def _add_episodes(self, topic, steps, engine_downloads):
+        """
+        Add downloaded episodes to client in one batch and save topic after each of them in order,
+        so topic is saved up to the first episode, which wasn't added
+
+        :type topic: LostFilmTVSeries
+        :param steps: season info, filename and torrent of each episode or None for failed one
+        :type engine_downloads: engine.EngineDownloads
+        """
+        downloads = [step for step in steps if step is not None]
+        if len(downloads) == 0:
+            last_updates = None
+        else:
+            topic_settings = TopicSettings.from_topic(topic)
+            try:
+                last_updates = iter(engine_downloads.add_torrents([(filename, torrent, None, topic_settings)
+                                                                   for _, filename, torrent in downloads]))
+            except Exception as e:
+                # part of batch could be added already, it is found by adding episodes one by one
+                engine_downloads.info(u"Can't add episodes in one batch, add them one by one.\nReason: {0}"
+                                      .format(html.escape(str(e))))
+                last_updates = None
+
+        for index, step in enumerate(steps):
+            if step is None:
+                self.save_topic(topic, None, Status.Error)
+                continue
+            info, filename, torrent = step
+            if last_updates is not None:
+                last_update = next(last_updates)
+            else:
+                last_update = engine_downloads.add_torrent(index, filename, torrent, None,
+                                                           TopicSettings.from_topic(topic))
+            if last_update is None:
+                raise Exception(u'Torrent {0} wasn\'t added'.format(filename))
+            topic.season = info.season
+            topic.episode = info.number
+            engine_downloads.downloaded(u'Download new series: {0} ({1}, {2})'
+                                        .format(topic.display_name, info.season, info.number),
+                                        torrent.raw_content)
+            self.save_topic(topic, last_update, Status.Ok)
+
+    def _filter_topics_by_feed(self, topics, engine):
+        """
+        :type topics: list[LostFilmTVSeries]
+        :type engine: engine.EngineTracker
+        :rtype: list[LostFilmTVSeries]
+        """
+        # manual check of series is not a full sweep and doesn't skip them
+        if any(topic.requested_by_id for topic in topics):
+            return topics
+
+        now = datetime.now()
+        if not self.new_episodes_feed_enabled or self._last_full_sweep is None or \
+                now - self._last_full_sweep >= self.full_sweep_interval:
+            self._last_full_sweep = now
+            return topics
+
+        try:
+            feed_entries = self.tracker.get_new_episodes()
+        except Exception as e:
+            engine.info(u"Can't get new episodes feed, check all series.\nReason: {0}".format(html.escape(str(e))))
+            return topics
+
+        latest_by_cat = {}
+        latest_by_name = {}
+        for entry in feed_entries:
+            episode = (entry.season, entry.episode)
+            if entry.cat is not None:
+                latest_by_cat[entry.cat] = max(latest_by_cat.get(entry.cat, episode), episode)
+            latest_by_name[entry.url_name] = max(latest_by_name.get(entry.url_name, episode), episode)
+
+        def has_new_episodes(topic):
+            if topic.status != Status.Ok or topic.season is None or topic.episode is None:
+                return True
+            url_name = LostFilmShow.get_seasons_url_info(topic.url, self.tracker.domain)[0]
+            latest_episode = latest_by_cat.get(topic.cat, None) or latest_by_name.get(url_name, None)
+            return latest_episode is not None and latest_episode > (topic.season, topic.episode)
+
+        result = [topic for topic in topics if has_new_episodes(topic)]
+        if len(result) < len(topics):
+            engine.info(u"Skip {0} series without new episodes in feed".format(len(topics) - len(result)))
+        return result
 
     def get_topic_info(self, topic):
         if topic.season and topic.episode:
@@ -917,10 +1196,11 @@ class LostFilmPlugin(WithCredentialsMixin, TrackerPluginBase):
         return None
 
     def _prepare_request(self, topic):
-        show = self.tracker.parse_url(topic.url, True)
+        latest_episode = (topic.season, topic.episode)
+        last_episode = latest_episode if None not in latest_episode else None
+        show = self.tracker.parse_url(topic.url, True, last_episode)
         if isinstance(show, Response):
             return show
-        latest_episode = (topic.season, topic.episode)
         if latest_episode == (None, None):
             episodes = [show.last_season.last_episode]
         else:
@@ -930,9 +1210,12 @@ class LostFilmPlugin(WithCredentialsMixin, TrackerPluginBase):
 
         resut = []
 
-        for episode in episodes:
-            download_infos = self.tracker.get_download_info(topic.url, topic.cat, episode.season, episode.number)
+        episodes_download_infos = self.tracker.get_download_infos(topic.url, topic.cat,
+                                                                  [(e.season, e.number) for e in episodes])
+        if episodes_download_infos is None:
+            episodes_download_infos = [None] * len(episodes)
 
+        for episode, download_infos in zip(episodes, episodes_download_infos):
             topic_quality = LostFilmQuality.parse(topic.quality)
             download_info = None
             if download_infos is not None:
@@ -75,7 +75,7 @@ class NnmClubTracker(object):
         r = requests.get(url, allow_redirects=False, **self.tracker_settings.get_requests_kwargs())
         if r.status_code != 200:
             return None
-        soup = get_soup(r.text)
+        soup = get_soup(r.text, parse_only=['title'])
         title = soup.title.string.strip()
         for title_header in self.title_headers:
             if title.lower().endswith(title_header):
@@ -115,7 +115,7 @@ class NnmClubTracker(object):
     def get_download_url(self, url):
         cookies = self.get_cookies()
         page = requests.get(url, cookies=cookies, **self.tracker_settings.get_requests_kwargs())
-        page_soup = get_soup(page.text, 'html5lib' if sys.platform == 'win32' else None)
+        page_soup = get_soup(page.text, 'html5lib' if sys.platform == 'win32' else None, parse_only=['a'])
         anchors = page_soup.find_all("a")
         da = list(filter(lambda tag: tag.has_attr('href') and tag.attrs['href'].startswith("download.php?id="),
                          anchors))
@@ -121,7 +121,7 @@ class RutorOrgTracker(object):
         if r.status_code != 200 or (r.url != url and not self.can_parse_url(r.url)):
             return None
         r.encoding = 'utf-8'
-        soup = get_soup(r.text)
+        soup = get_soup(r.text, parse_only=['title'])
         title = soup.title.string.strip()
         for title_header in self.title_headers:
             if title.lower().startswith(title_header):
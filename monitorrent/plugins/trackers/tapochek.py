@@ -72,7 +72,7 @@ class TapochekNetTracker(object):
             url += "/"
         r = requests.get(url, allow_redirects=False, **self.tracker_settings.get_requests_kwargs())
 
-        soup = get_soup(r.content)
+        soup = get_soup(r.content, parse_only=['h1', 'title'])
         if soup.h1 is None:
             # tapochek doesn't return 404 for not existing topic
             # it return regular page with text 'Тема не найдена'
@@ -126,7 +126,7 @@ class TapochekNetTracker(object):
     def get_download_url(self, url):
         cookies = self.get_cookies()
         page = requests.get(url, cookies=cookies, **self.tracker_settings.get_requests_kwargs())
-        page_soup = get_soup(page.content)
+        page_soup = get_soup(page.content, parse_only=['a'])
         download = page_soup.find("a", href=re.compile("download"))
         return "http://tapochek.net/"+download.attrs['href']
 
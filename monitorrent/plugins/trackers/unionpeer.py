@@ -86,7 +86,7 @@ class UnionpeerOrgTracker(object):
             return None
 
         r = requests.get(url, allow_redirects=True, **self.tracker_settings.get_requests_kwargs())
-        soup = get_soup(r.content)
+        soup = get_soup(r.content, parse_only=['h2'])
         if soup.h2 is None:
             # rutracker doesn't return 404 for not existing topic
             # it return regular page with text 'Тема не найдена'
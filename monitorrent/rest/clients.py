@@ -126,3 +126,78 @@ class ClientDefault(object):
             log.error("Client could not be found", client=client, exception=str(e))
             raise falcon.HTTPNotFound(title='Client plugin \'{0}\' not found'.format(client), description=str(e))
         resp.status = falcon.HTTP_NO_CONTENT
+
+
+# noinspection PyUnusedLocal
+class ClientsBalancing(object):
+    def __init__(self, clients_manager):
+        """
+        :type clients_manager: ClientsManager
+        """
+        self.clients_manager = clients_manager
+
+    def on_get(self, req, resp):
+        resp.json = self.clients_manager.get_balancing()
+
+    def on_put(self, req, resp):
+        # null disables balancing, any other settings have to be an object
+        if req.json is not None and not isinstance(req.json, dict):
+            raise falcon.HTTPBadRequest(title='Wrong balancing settings', description='Settings have to be an object')
+        try:
+            self.clients_manager.set_balancing(req.json)
+        except KeyError as e:
+            log.error("Client could not be found", exception=str(e))
+            raise falcon.HTTPNotFound(title='Client plugin not found', description=str(e))
+        except ValueError as e:
+            raise falcon.HTTPBadRequest(title='Wrong balancing settings', description=str(e))
+        resp.status = falcon.HTTP_NO_CONTENT
+
+
+class ClientsFailover(object):
+    def __init__(self, clients_manager):
+        """
+        :type clients_manager: ClientsManager
+        """
+        self.clients_manager = clients_manager
+
+    def on_get(self, req, resp):
+        resp.json = self.clients_manager.get_failover()
+
+    def on_put(self, req, resp):
+        # null disables failover, any other settings have to be an object
+        if req.json is not None and not isinstance(req.json, dict):
+            raise falcon.HTTPBadRequest(title='Wrong failover settings', description='Settings have to be an object')
+        try:
+            self.clients_manager.set_failover(req.json)
+        except KeyError as e:
+            log.error("Client could not be found", exception=str(e))
+            raise falcon.HTTPNotFound(title='Client plugin not found', description=str(e))
+        except ValueError as e:
+            raise falcon.HTTPBadRequest(title='Wrong failover settings', description=str(e))
+        resp.status = falcon.HTTP_NO_CONTENT
+
+
+class ClientsMetrics(object):
+    def __init__(self, clients_manager):
+        """
+        :type clients_manager: ClientsManager
+        """
+        self.clients_manager = clients_manager
+
+    def on_get(self, req, resp):
+        resp.json = self.clients_manager.get_metrics()
+
+
+class ClientMetricsResource(object):
+    def __init__(self, clients_manager):
+        """
+        :type clients_manager: ClientsManager
+        """
+        self.clients_manager = clients_manager
+
+    def on_get(self, req, resp, client):
+        try:
+            resp.json = self.clients_manager.get_metrics(client)
+        except KeyError as e:
+            log.error("Client could not be found", client=client, exception=str(e))
+            raise falcon.HTTPNotFound(title='Client plugin \'{0}\' not found'.format(client), description=str(e))
@@ -0,0 +1,28 @@
+from builtins import object
+import falcon
+from monitorrent.settings_manager import SettingsManager
+
+
+# noinspection PyUnusedLocal
+class SettingsClientsOutbox(object):
+    def __init__(self, settings_manager, outbox):
+        """
+        :type settings_manager: SettingsManager
+        :type outbox: monitorrent.outbox.ClientsOutbox
+        """
+        self.settings_manager = settings_manager
+        self.outbox = outbox
+
+    def on_get(self, req, resp):
+        resp.json = {'is_enabled': self.settings_manager.clients_outbox_enabled, 'items': self.outbox.get_items()}
+
+    def on_put(self, req, resp):
+        if req.json is None:
+            raise falcon.HTTPBadRequest('BodyRequired', 'Expecting not empty JSON body')
+
+        is_enabled = req.json.get('is_enabled')
+        if is_enabled is None or not isinstance(is_enabled, bool):
+            raise falcon.HTTPBadRequest('WrongValue', '"is_enabled" is required and have to be bool')
+
+        self.settings_manager.clients_outbox_enabled = is_enabled
+        resp.status = falcon.HTTP_NO_CONTENT
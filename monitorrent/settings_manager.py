@@ -1,9 +1,12 @@
 from builtins import str
 from builtins import object
+import json
+import threading
 from enum import Enum
+from time import monotonic
 
 from sqlalchemy import Column, Integer, String
-from monitorrent.db import DBSession, Base
+from monitorrent.db import DBSession, Base, get_engine
 from monitorrent.plugins.trackers import TrackerSettings, CloudflareChallengeSolverSettings
 
 
@@ -29,6 +32,67 @@ class NotificationLevel(Enum):
 
 
 
+class SettingsCache(object):
+    """
+    Process-wide copy of settings and proxies, each table is loaded with one query
+
+    Values written by SettingsManager are updated in cache, ttl lets other processes' changes be seen.
+    Cache is loaded again for new database engine.
+    """
+    def __init__(self, ttl=None):
+        """
+        :param ttl: seconds to keep loaded values, None to keep them until engine is changed
+        :type ttl: float | None
+        """
+        self.ttl = ttl
+        self._engine = None
+        self._loaded = None
+        self._settings = {}
+        self._proxies = {}
+        self._lock = threading.Lock()
+
+    def get_setting(self, name, default=None):
+        with self._lock:
+            self._load()
+            return self._settings.get(name, default)
+
+    def set_setting(self, name, value):
+        with self._lock:
+            if value is None:
+                self._settings.pop(name, None)
+            else:
+                self._settings[name] = str(value)
+
+    def get_proxies(self):
+        with self._lock:
+            self._load()
+            return dict(self._proxies)
+
+    def set_proxy(self, key, url):
+        with self._lock:
+            if url is not None and url != "":
+                self._proxies[key] = url
+            else:
+                self._proxies.pop(key, None)
+
+    def invalidate(self):
+        with self._lock:
+            self._engine = None
+
+    def _load(self):
+        engine = get_engine()
+        if self._engine is engine and (self.ttl is None or monotonic() - self._loaded < self.ttl):
+            return
+        with DBSession() as db:
+            self._settings = {setting.name: setting.value for setting in db.query(Settings)}
+            self._proxies = {setting.key: setting.url for setting in db.query(ProxySettings)}
+        self._engine = engine
+        self._loaded = monotonic()
+
+
+settings_cache = SettingsCache()
+
+
 class SettingsManager(object):
     __password_settings_name = "monitorrent.password"
     __enable_authentication_settings_name = "monitorrent.is_authentication_enabled"
@@ -36,6 +100,9 @@ class SettingsManager(object):
     __developer_mode_settings_name = "monitorrent.developer_mode"
     __requests_timeout = "monitorrent.requests_timeout"
     __remove_logs_interval_settings_name = "monitorrent.remove_logs_interval"
+    __clients_balancing_settings_name = "monitorrent.clients_balancing"
+    __clients_outbox_enabled_settings_name = "monitorrent.clients_outbox_enabled"
+    __clients_failover_settings_name = "monitorrent.clients_failover"
     __proxy_enabled_name = "monitorrent.proxy_enabled"
     __proxy_id_format = "monitorrent.proxy_{0}"
     __new_version_checker_enabled = "monitorrent.new_version_checker_enabled"
@@ -72,6 +139,24 @@ class SettingsManager(object):
     def set_default_client(self, value):
         self._set_settings(self.__default_client_settings_name, value)
 
+    @property
+    def clients_balancing(self):
+        value = self._get_settings(self.__clients_balancing_settings_name)
+        return json.loads(value) if value is not None else None
+
+    @clients_balancing.setter
+    def clients_balancing(self, value):
+        self._set_settings(self.__clients_balancing_settings_name, json.dumps(value) if value is not None else None)
+
+    @property
+    def clients_failover(self):
+        value = self._get_settings(self.__clients_failover_settings_name)
+        return json.loads(value) if value is not None else None
+
+    @clients_failover.setter
+    def clients_failover(self, value):
+        self._set_settings(self.__clients_failover_settings_name, json.dumps(value) if value is not None else None)
+
     def get_is_developer_mode(self):
         return self._get_settings(self.__developer_mode_settings_name) == 'True'
 
@@ -102,11 +187,7 @@ class SettingsManager(object):
         self._set_settings(self.__proxy_enabled_name, str(value))
 
     def get_proxy(self, key):
-        with DBSession() as db:
-            setting = db.query(ProxySettings).filter(ProxySettings.key == key).first()
-            if setting is None:
-                return None
-            return setting.url
+        return settings_cache.get_proxies().get(key, None)
 
     def set_proxy(self, key, url):
         with DBSession() as db:
@@ -116,15 +197,12 @@ class SettingsManager(object):
                     setting = ProxySettings(key=key)
                 setting.url = url
                 db.add(setting)
-            else:
-                if setting is None:
-                    return
+            elif setting is not None:
                 db.delete(setting)
+        settings_cache.set_proxy(key, url)
 
     def get_proxies(self):
-        with DBSession() as db:
-            settings = db.query(ProxySettings).all()
-            return {s.key: s.url for s in settings}
+        return settings_cache.get_proxies()
 
     def get_is_new_version_checker_enabled(self):
         return self._get_settings(self.__new_version_checker_enabled, 'True') == 'True'
@@ -215,13 +293,17 @@ class SettingsManager(object):
     def remove_logs_interval(self, value):
         self._set_settings(self.__remove_logs_interval_settings_name, str(value))
 
+    @property
+    def clients_outbox_enabled(self):
+        return self._get_settings(self.__clients_outbox_enabled_settings_name, 'False') == 'True'
+
+    @clients_outbox_enabled.setter
+    def clients_outbox_enabled(self, value):
+        self._set_settings(self.__clients_outbox_enabled_settings_name, str(value))
+
     @staticmethod
     def _get_settings(name, default=None):
-        with DBSession() as db:
-            setting = db.query(Settings).filter(Settings.name == name).first()
-            if not setting:
-                return default
-            return setting.value
+        return settings_cache.get_setting(name, default)
 
     @staticmethod
     def _set_settings(name, value):
@@ -237,3 +319,4 @@ class SettingsManager(object):
                 db.delete(setting)
             else:
                 setting.value = str(value)
+        settings_cache.set_setting(name, value)
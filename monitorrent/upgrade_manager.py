@@ -14,6 +14,9 @@ def core_upgrade(operation_factory):
     with operation_factory() as op:
         if op.has_table('plugin_versions'):
             op.drop_table('plugin_versions')
+        # execute history counts downloaded and failed entries of each execute
+        if op.has_table('execute_log') and not op.has_index('execute_log', 'ix_execute_log_execute_id_level'):
+            op.create_index('ix_execute_log_execute_id_level', 'execute_log', ['execute_id', 'level'])
 
 
 def upgrade():
@@ -5,8 +5,11 @@ from __future__ import unicode_literals, division, absolute_import
 from builtins import *  # noqa pylint: disable=unused-import, redefined-builtin
 
 import binascii
-import functools
+import hashlib
 import re
+import sys
+from array import array
+from collections.abc import MutableMapping
 import logging
 
 log = logging.getLogger('torrent')
@@ -90,58 +93,187 @@ def is_torrent_file(metafilepath):
     return bool(magic_marker)
 
 
-def tokenize(text, match=re.compile(b'([idel])|(\d+):|(-?\d+)').match):
+_INTEGER_RE = re.compile(br'(-?\d+)e')
+
+_DICT = ord('d')
+_LIST = ord('l')
+_INTEGER = ord('i')
+_END = ord('e')
+_ZERO = ord('0')
+_NINE = ord('9')
+_SHORT_STRING = 1024
+
+
+def bdecode(text, strict=False, spans=None):
+    """
+    Decode bencoded data without recursion and without copying strings more than once
+
+    Duplicate dictionary keys are always a syntax error, unsorted keys are a syntax error in strict mode only,
+    because a lot of torrents in the wild are created with unsorted keys.
+
+    :type text: bytes | bytearray | memoryview
+    :type strict: bool
+    :param spans: if specified, it is filled with (start, end) offsets of values of the top level dictionary
+    :type spans: dict | None
+    """
+    data = text if isinstance(text, bytes) else bytes(text)
+    view = memoryview(data)
+    length = len(data)
+    find = data.find
+    match_integer = _INTEGER_RE.match
+
+    # parents of the current container with their pending keys
+    stack = []
+    root = container = []
+    is_dict = False
+    # pending key of the current dictionary and raw bytes of the previous key for ordering check
+    key = None
+    prev_raw_key = None
     i = 0
-    while i < len(text):
-        m = match(text, i)
-        s = m.group(m.lastindex)
-        i = m.end()
-        if m.lastindex == 2:
-            yield b's'
-            yield text[i:i + int(s)]
-            i += int(s)
-        else:
-            yield s
-
-
-def decode_item(next, token):
-    if token == b'i':
-        # integer: "i" value "e"
-        data = int(next())
-        if next() != b'e':
-            raise ValueError
-    elif token == b's':
-        # string: "s" value (virtual tokens)
-        data = next()
-        # Strings in torrent file are defined as utf-8 encoded
-        try:
-            data = data.decode('utf-8')
-        except UnicodeDecodeError:
-            # The pieces field is a byte string, and should be left as such.
-            pass
-    elif token == b'l' or token == b'd':
-        # container: "l" (or "d") values "e"
-        data = []
-        tok = next()
-        while tok != b'e':
-            data.append(decode_item(next, tok))
-            tok = next()
-        if token == b'd':
-            data = dict(list(zip(data[0::2], data[1::2])))
-    else:
-        raise ValueError
-    return data
-
-
-def bdecode(text):
     try:
-        src = tokenize(text)
-        data = decode_item(functools.partial(next, src), next(src))  # pylint:disable=E1101
-        for _ in src:  # look for more tokens
-            raise SyntaxError("trailing junk")
-    except (AttributeError, ValueError, StopIteration, TypeError) as e:
+        while True:
+            token = data[i]
+            value_start = i
+            if _ZERO <= token <= _NINE:
+                colon = find(b':', i)
+                raw_length = data[i:colon]
+                if colon < 0 or not raw_length.isdigit():
+                    raise ValueError("invalid string length at %d" % i)
+                start = colon + 1
+                i = start + int(raw_length)
+                if i > length:
+                    raise ValueError("string at %d is out of data" % start)
+                if is_dict and key is None:
+                    raw_key = data[start:i]
+                    try:
+                        key = raw_key.decode('utf-8')
+                    except UnicodeDecodeError:
+                        key = raw_key
+                    if key in container:
+                        raise ValueError("duplicate key %r" % raw_key)
+                    if strict and prev_raw_key is not None and raw_key < prev_raw_key:
+                        raise ValueError("unsorted key %r" % raw_key)
+                    prev_raw_key = raw_key
+                    continue
+                # short strings are cheaper to slice, long ones (e.g. pieces) are decoded from the view directly
+                raw_value = data[start:i] if i - start < _SHORT_STRING else view[start:i]
+                # Strings in torrent file are defined as utf-8 encoded
+                try:
+                    value = str(raw_value, 'utf-8')
+                except UnicodeDecodeError:
+                    # The pieces field is a byte string, and should be left as such.
+                    value = bytes(raw_value)
+            elif token == _INTEGER:
+                m = match_integer(data, i + 1)
+                if m is None:
+                    raise ValueError("invalid integer at %d" % i)
+                i = m.end()
+                value = int(m.group(1))
+            elif token == _LIST or token == _DICT:
+                if is_dict and key is None:
+                    raise ValueError("dictionary key should be a string at %d" % i)
+                stack.append((container, is_dict, key, prev_raw_key, value_start))
+                is_dict = token == _DICT
+                container = {} if is_dict else []
+                key = None
+                prev_raw_key = None
+                i += 1
+                continue
+            elif token == _END:
+                if container is root:
+                    raise ValueError("unexpected end at %d" % i)
+                if key is not None:
+                    raise ValueError("missing value for key %r" % key)
+                value = container
+                container, is_dict, key, prev_raw_key, value_start = stack.pop()
+                i += 1
+            else:
+                raise ValueError("unexpected %r at %d" % (chr(token), i))
+
+            if is_dict:
+                if key is None:
+                    raise ValueError("dictionary key should be a string at %d" % i)
+                container[key] = value
+                if spans is not None and len(stack) == 1:
+                    spans[key] = (value_start, i)
+                key = None
+            else:
+                container.append(value)
+                if container is root:
+                    break
+    except (IndexError, ValueError) as e:
         raise SyntaxError("syntax error: %s" % e)
-    return data
+    if i != length:
+        raise SyntaxError("trailing junk")
+    return root[0]
+
+
+def bskip(data, i=0):
+    """
+    Find the end of bencoded value which starts at i without decoding it
+
+    :type data: bytes
+    :rtype: int
+    """
+    find = data.find
+    length = len(data)
+    depth = 0
+    try:
+        while True:
+            token = data[i]
+            if _ZERO <= token <= _NINE:
+                colon = find(b':', i)
+                if colon < 0:
+                    raise ValueError("invalid string length at %d" % i)
+                i = colon + 1 + int(data[i:colon])
+                if i > length:
+                    raise ValueError("string at %d is out of data" % (colon + 1))
+            elif token == _INTEGER:
+                end = find(b'e', i)
+                if end < 0:
+                    raise ValueError("invalid integer at %d" % i)
+                i = end + 1
+            elif token == _LIST or token == _DICT:
+                depth += 1
+                i += 1
+            elif token == _END and depth > 0:
+                depth -= 1
+                i += 1
+            else:
+                raise ValueError("unexpected %r at %d" % (chr(token), i))
+            if depth == 0:
+                return i
+    except (IndexError, ValueError) as e:
+        raise SyntaxError("syntax error: %s" % e)
+
+
+def bdecode_spans(data, i=0):
+    """
+    Scan bencoded dictionary which starts at i and return (start, end) offsets of its values by keys
+    without decoding values
+
+    :type data: bytes
+    :rtype: (dict, int)
+    :return: spans of dictionary values and the end of dictionary
+    """
+    if data[i:i + 1] != b'd':
+        raise SyntaxError("syntax error: dictionary expected at %d" % i)
+    spans = {}
+    i += 1
+    while data[i:i + 1] != b'e':
+        key_end = bskip(data, i)
+        if not data[i:i + 1].isdigit():
+            raise SyntaxError("syntax error: dictionary key should be a string at %d" % i)
+        raw_key = data[data.find(b':', i) + 1:key_end]
+        try:
+            key = raw_key.decode('utf-8')
+        except UnicodeDecodeError:
+            key = raw_key
+        if key in spans:
+            raise SyntaxError("syntax error: duplicate key %r" % raw_key)
+        i = bskip(data, key_end)
+        spans[key] = (key_end, i)
+    return spans, i + 1
 
 
 # encoding implementation by d0b
@@ -158,37 +290,199 @@ def encode_integer(data):
 
 
 def encode_list(data):
-    encoded = b'l'
-    for item in data:
-        encoded += bencode(item)
-    encoded += b'e'
-    return encoded
+    return bencode(data)
 
 
 def encode_dictionary(data):
-    encoded = b'd'
-    items = list(data.items())
-    items.sort()
-    for (key, value) in items:
-        encoded += bencode(key)
-        encoded += bencode(value)
-    encoded += b'e'
-    return encoded
+    return bencode(data)
 
 
 def bencode(data):
-    if isinstance(data, bytes):
-        return encode_bytes(data)
-    if isinstance(data, str):
-        return encode_string(data)
-    if isinstance(data, int):
-        return encode_integer(data)
-    if isinstance(data, list):
-        return encode_list(data)
-    if isinstance(data, dict):
-        return encode_dictionary(data)
+    buf = bytearray()
+    bencode_to(data, buf)
+    return bytes(buf)
+
+
+class _RawValue(object):
+    """Already bencoded value, it is written as is"""
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+
+def _dict_items(data):
+    # keys are sorted as raw strings
+    items = [(key.encode('utf-8') if isinstance(key, str) else key, value) for key, value in data.items()]
+    items.sort(key=lambda item: item[0])
+    for key, value in items:
+        yield key
+        yield value
+
+
+def _lazy_dict_items(data):
+    # not accessed values are copied from the original content without decoding
+    # noinspection PyProtectedMember
+    values, spans, raw = data._values, data.spans, data._data
+    for key in sorted(data, key=lambda k: k.encode('utf-8') if isinstance(k, str) else k):
+        yield key
+        if key in values or spans[key] is None:
+            yield data[key]
+        else:
+            start, end = spans[key]
+            yield _RawValue(memoryview(raw)[start:end])
+
+
+def bencode_to(data, sink):
+    """
+    Encode data into sink in one pass without building intermediate strings
+
+    :param sink: bytearray or file-like object with write method
+    :type sink: bytearray | io.RawIOBase
+    """
+    write = sink.extend if isinstance(sink, bytearray) else sink.write
+    stack = [iter((data,))]
+    while stack:
+        for item in stack[-1]:
+            if isinstance(item, str):
+                item = item.encode('utf-8')
+                write(b'%d:' % len(item))
+                write(item)
+            elif isinstance(item, (bytes, bytearray)):
+                write(b'%d:' % len(item))
+                write(item)
+            elif isinstance(item, memoryview):
+                write(b'%d:' % item.nbytes)
+                write(item)
+            elif isinstance(item, int):
+                write(b'i%de' % item)
+            elif isinstance(item, list):
+                write(b'l')
+                stack.append(iter(item))
+                break
+            elif isinstance(item, dict):
+                write(b'd')
+                stack.append(_dict_items(item))
+                break
+            elif isinstance(item, _LazyDict):
+                write(b'd')
+                stack.append(_lazy_dict_items(item))
+                break
+            elif isinstance(item, _RawValue):
+                write(item.data)
+            else:
+                raise TypeError("Can't bencode {0}".format(type(item)))
+        else:
+            stack.pop()
+            if stack:
+                write(b'e')
+
+
+def _decode_field(value, encoding, torrent_name, field):
+    # These should already be decoded if they were utf-8, if not we can try some other stuff
+    if isinstance(value, str):
+        return value
+    try:
+        return value.decode(encoding)
+    except UnicodeError:
+        # Broken beyond anything reasonable
+        fallback = value.decode('utf-8', 'replace').replace(u'\ufffd', '_')
+        log.warning('%s=%r field in torrent %r is wrongly encoded, falling back to `%s`' %
+                    (field, value, torrent_name, fallback))
+        return fallback
+
+
+class FileTable(object):
+    """
+    Columnar table of torrent files
+
+    File lengths are stored in array('q') and directories of files in array('l') of indexes into directories list,
+    where each directory is stored once as tuple of interned path components.
+    Paths are relative to torrent name, file of single file torrent has empty directory.
+    """
+    def __init__(self, lengths, directory_ids, names, directories):
+        """
+        :type lengths: array
+        :type directory_ids: array
+        :type names: list[str]
+        :type directories: list[tuple[str]]
+        """
+        self.lengths = lengths
+        self.directory_ids = directory_ids
+        self.names = names
+        self.directories = directories
+        self._total_size = None
+
+    @staticmethod
+    def lengths_from_info(info):
+        """
+        :rtype: array
+        """
+        if 'length' in info:
+            return array('q', [info['length']])
+        return array('q', [item['length'] for item in info['files']])
 
-    raise TypeError
+    @classmethod
+    def from_info(cls, info, encoding='cp1252'):
+        torrent_name = info['name']
+        lengths = cls.lengths_from_info(info)
+        if 'length' in info:
+            return cls(lengths, array('l', [0]), [_decode_field(torrent_name, encoding, torrent_name, 'name')], [()])
+
+        paths = [item['path'] for item in info['files']]
+        directory_indexes = {}
+        directory_ids = array('l', [directory_indexes.setdefault(tuple(path[:-1]), len(directory_indexes))
+                                    for path in paths])
+        names = [path[-1] if isinstance(path[-1], str) else _decode_field(path[-1], encoding, torrent_name, 'path')
+                 for path in paths]
+        directories = [tuple(sys.intern(_decode_field(component, encoding, torrent_name, 'path'))
+                             for component in directory)
+                       for directory in directory_indexes]
+        return cls(lengths, directory_ids, names, directories)
+
+    def __len__(self):
+        return len(self.lengths)
+
+    @property
+    def total_size(self):
+        if self._total_size is None:
+            self._total_size = sum(self.lengths)
+        return self._total_size
+
+    def path(self, index):
+        """
+        :rtype: tuple[str]
+        """
+        return self.directories[self.directory_ids[index]] + (self.names[index],)
+
+    def iter_files(self):
+        """
+        :return: (directory, name, length) for each file, directory components are joined with '/'
+        """
+        directories = ['/'.join(directory) for directory in self.directories]
+        for directory_id, name, length in zip(self.directory_ids, self.names, self.lengths):
+            yield directories[directory_id], name, length
+
+    def group_by_directory(self, depth=1):
+        """
+        Files count and total size for each directory on specified depth, files on upper levels are grouped under ''
+
+        :rtype: dict[str, (int, int)]
+        """
+        counts = [0] * len(self.directories)
+        sizes = [0] * len(self.directories)
+        for directory_id, length in zip(self.directory_ids, self.lengths):
+            counts[directory_id] += 1
+            sizes[directory_id] += length
+
+        groups = {}
+        for directory, count, size in zip(self.directories, counts, sizes):
+            if count == 0:
+                continue
+            group = '/'.join(directory[:depth])
+            group_count, group_size = groups.get(group, (0, 0))
+            groups[group] = (group_count + count, group_size + size)
+        return groups
 
 
 class Torrent(object):
@@ -207,9 +501,15 @@ class Torrent(object):
         """Accepts torrent file as string"""
         # Make sure there is no trailing whitespace. see #1592
         content = content.strip()
+        spans = {}
         # decoded torrent structure
-        self.content = bdecode(content)
+        self.content = bdecode(content, spans=spans)
+        self.raw_content = content
         self.modified = False
+        # offsets of the original info dictionary, info hash have to be calculated over original bytes
+        self._info_span = spans.get('info', None)
+        self._info_hash = None
+        self._file_table = None
 
     def __repr__(self):
         return "%s(%s, %s)" % (self.__class__.__name__,
@@ -218,51 +518,28 @@ class Torrent(object):
                                ", ".join("%s=%r" % (key, self.content.get(key))
                                          for key in ("announce", "comment",)))
 
+    @property
+    def file_table(self):
+        """
+        Columnar table of torrent files, it is built once
+
+        :rtype: FileTable
+        """
+        if self._file_table is None:
+            self._file_table = FileTable.from_info(self.content['info'], self.content.get('encoding', 'cp1252'))
+        return self._file_table
+
     def get_filelist(self):
         """Return array containing fileinfo dictionaries (name, length, path)"""
-        files = []
-        if 'length' in self.content['info']:
-            # single file torrent
-            t = {'name': self.content['info']['name'],
-                 'size': self.content['info']['length'],
-                 'path': ''}
-            files.append(t)
-        else:
-            # multifile torrent
-            for item in self.content['info']['files']:
-                t = {'path': '/'.join(item['path'][:-1]),
-                     'name': item['path'][-1],
-                     'size': item['length']}
-                files.append(t)
-
-        # Decode strings
-        for item in files:
-            for field in ('name', 'path'):
-                # These should already be decoded if they were utf-8, if not we can try some other stuff
-                if not isinstance(item[field], str):
-                    try:
-                        item[field] = item[field].decode(self.content.get('encoding', 'cp1252'))
-                    except UnicodeError:
-                        # Broken beyond anything reasonable
-                        fallback = item[field].decode('utf-8', 'replace').replace(u'\ufffd', '_')
-                        log.warning('%s=%r field in torrent %r is wrongly encoded, falling back to `%s`' %
-                                    (field, item[field], self.content['info']['name'], fallback))
-                        item[field] = fallback
-
-        return files
+        return [{'path': directory, 'name': name, 'size': length}
+                for directory, name, length in self.file_table.iter_files()]
 
     @property
     def size(self):
         """Return total size of the torrent"""
-        size = 0
-        # single file torrent
-        if 'length' in self.content['info']:
-            size = int(self.content['info']['length'])
-        else:
-            # multifile torrent
-            for item in self.content['info']['files']:
-                size += int(item['length'])
-        return size
+        if self._file_table is not None:
+            return self._file_table.total_size
+        return sum(FileTable.lengths_from_info(self.content['info']))
 
     @property
     def private(self):
@@ -287,11 +564,14 @@ class Torrent(object):
     @property
     def info_hash(self):
         """Return Torrent info hash"""
-        import hashlib
-        hash = hashlib.sha1()
-        info_data = encode_dictionary(self.content['info'])
-        hash.update(info_data)
-        return str(hash.hexdigest().upper())
+        if self._info_hash is None:
+            if self._info_span is not None:
+                start, end = self._info_span
+                info_data = memoryview(self.raw_content)[start:end]
+            else:
+                info_data = encode_dictionary(self.content['info'])
+            self._info_hash = str(hashlib.sha1(info_data).hexdigest().upper())
+        return self._info_hash
 
     @property
     def comment(self):
@@ -325,3 +605,66 @@ class Torrent(object):
 
     def encode(self):
         return bencode(self.content)
+
+
+class _LazyDict(MutableMapping):
+    """Bencoded dictionary which decodes its values on first access"""
+
+    def __init__(self, data, start=0):
+        self._data = data
+        self.spans, self.end = bdecode_spans(data, start)
+        self._values = {}
+
+    def __getitem__(self, key):
+        if key in self._values:
+            return self._values[key]
+        start, end = self.spans[key]
+        if self._data[start] == _DICT:
+            value = _LazyDict(self._data, start)
+        else:
+            value = bdecode(self._data[start:end])
+        self._values[key] = value
+        return value
+
+    def __setitem__(self, key, value):
+        if key not in self.spans:
+            self.spans[key] = None
+        self._values[key] = value
+
+    def __delitem__(self, key):
+        del self.spans[key]
+        self._values.pop(key, None)
+
+    def __iter__(self):
+        return iter(self.spans)
+
+    def __len__(self):
+        return len(self.spans)
+
+    def to_dict(self):
+        return {key: value.to_dict() if isinstance(value, _LazyDict) else value for key, value in self.items()}
+
+
+class TorrentMeta(Torrent):
+    """
+    Torrent which only scans metafile structure and decodes parts of it on access,
+    it is enough for info_hash and name without decoding file list and pieces
+    """
+
+    def __init__(self, content):
+        content = content.strip()
+        self.content = _LazyDict(content)
+        if self.content.end != len(content):
+            raise SyntaxError("trailing junk")
+        self.raw_content = content
+        self.modified = False
+        self._info_span = self.content.spans.get('info', None)
+        self._info_hash = None
+        self._file_table = None
+
+    @property
+    def name(self):
+        return self.content['info']['name']
+
+    def encode(self):
+        return bencode(self.content)
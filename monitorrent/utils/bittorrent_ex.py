@@ -1,8 +1,9 @@
 """
-Add raw_content to original flexget bittorrent class
+Helpers over original flexget bittorrent class
 """
+import base64
 import six
-from monitorrent.utils.bittorrent import Torrent as FlexgetTorrent, TORRENT_RE
+from monitorrent.utils.bittorrent import Torrent as FlexgetTorrent, TorrentMeta, TORRENT_RE
 
 
 def is_torrent_content(data):
@@ -21,7 +22,15 @@ def is_torrent_content(data):
 
 
 class Torrent(FlexgetTorrent):
-    def __init__(self, content):
-        content = content.strip()
-        super(Torrent, self).__init__(content)
-        self.raw_content = content
+    _base64_content = None
+
+    @property
+    def base64_content(self):
+        """
+        Raw content encoded in base64 as required by json-rpc clients, it is calculated once
+
+        :rtype: bytes
+        """
+        if self._base64_content is None:
+            self._base64_content = base64.b64encode(self.raw_content)
+        return self._base64_content
@@ -1,12 +1,62 @@
-from bs4 import BeautifulSoup
+import re
+from bs4 import BeautifulSoup, SoupStrainer
 import sys
 
+_selector_regex = re.compile(r'^(?P<name>[\w-]+)?(?:#(?P<id>[\w-]+))?(?:\.(?P<class>[\w-]+))?$')
 
-def get_soup(url, parser=None):
+
+def get_soup(url, parser=None, parse_only=None):
+    """
+    :param parse_only: build only matched elements with their children,
+        can be SoupStrainer or list of simple selectors: 'tag', '#id', '.class', 'tag#id' or 'tag.class'
+    :type parse_only: SoupStrainer | list[str] | None
+    """
+    if parse_only is not None and not isinstance(parse_only, SoupStrainer):
+        parse_only = selectors_strainer(parse_only)
+    if parse_only is not None and parser == 'html5lib':
+        # html5lib always builds the whole tree and ignores parse_only
+        parser = 'html.parser'
     if parser:
-        return BeautifulSoup(url, parser)
+        return BeautifulSoup(url, parser, parse_only=parse_only)
     else:
         if 'lxml' in sys.modules:              # pragma: no cover
-            return BeautifulSoup(url, 'lxml')
+            return BeautifulSoup(url, 'lxml', parse_only=parse_only)
         else:
-            return BeautifulSoup(url, 'html.parser')
+            return BeautifulSoup(url, 'html.parser', parse_only=parse_only)
+
+
+def selectors_strainer(selectors):
+    """
+    Build SoupStrainer which matches elements by any of simple selectors
+
+    :type selectors: list[str]
+    :rtype: SoupStrainer
+    """
+    matchers = []
+    for selector in selectors:
+        match = _selector_regex.match(selector)
+        if match is None or not any(match.groups()):
+            raise ValueError("Unsupported selector: {0}".format(selector))
+        matchers.append((match.group('name'), match.group('id'), match.group('class')))
+
+    def match_tag(name, attrs):
+        for matcher_name, matcher_id, matcher_class in matchers:
+            if matcher_name is not None and matcher_name != name:
+                continue
+            if matcher_id is not None and attrs.get('id', None) != matcher_id:
+                continue
+            if matcher_class is not None and matcher_class not in _get_classes(attrs):
+                continue
+            return True
+        return False
+
+    return SoupStrainer(match_tag)
+
+
+def _get_classes(attrs):
+    classes = attrs.get('class', None)
+    if classes is None:
+        return []
+    if isinstance(classes, list):
+        return classes
+    return classes.split()
@@ -14,24 +14,27 @@ import structlog
 from structlog.stdlib import LoggerFactory
 from cheroot import wsgi
 from monitorrent.engine import DBEngineRunner, DbLoggerWrapper, ExecuteLogManager
-from monitorrent.db import init_db_engine, create_db
+from monitorrent.outbox import ClientsOutbox
+from monitorrent.db import init_db_engine, create_db, STORAGE_PROFILES, DEFAULT_STORAGE_PROFILE
 from monitorrent.plugin_managers import load_plugins, get_plugins, TrackersManager, DbClientsManager, NotifierManager
 from monitorrent.rest.challenge_logs import ChallengeLogs
 from monitorrent.rest.notifiers import NotifierCollection, Notifier, NotifierCheck, NotifierEnabled
 from monitorrent.rest.settings_cloudflare_challenge_solver import SettingsCloudflareChallengeSolver
 from monitorrent.upgrade_manager import upgrade
-from monitorrent.settings_manager import SettingsManager
+from monitorrent.settings_manager import SettingsManager, settings_cache
 from monitorrent.new_version_checker import NewVersionChecker
 from monitorrent.rest import create_api, AuthMiddleware
 from monitorrent.rest.static_file import StaticFiles
 from monitorrent.rest.login import Login, Logout
 from monitorrent.rest.topics import TopicCollection, TopicParse, Topic, TopicResetStatus, TopicPauseState
 from monitorrent.rest.trackers import TrackerCollection, Tracker, TrackerCheck
-from monitorrent.rest.clients import ClientCollection, Client, ClientCheck, DefaultClient, ClientDefault
+from monitorrent.rest.clients import ClientCollection, Client, ClientCheck, DefaultClient, ClientDefault, \
+    ClientsBalancing, ClientsFailover, ClientsMetrics, ClientMetricsResource
 from monitorrent.rest.settings_authentication import SettingsAuthentication
 from monitorrent.rest.settings_password import SettingsPassword
 from monitorrent.rest.settings_execute import SettingsExecute
 from monitorrent.rest.settings_developer import SettingsDeveloper
+from monitorrent.rest.settings_clients_outbox import SettingsClientsOutbox
 from monitorrent.rest.settings_logs import SettingsLogs
 from monitorrent.rest.settings_proxy import SettingsProxyEnabled, SettingsProxy
 from monitorrent.rest.settings_new_version_checker import SettingsNewVersionChecker
@@ -92,9 +95,13 @@ def create_app(secret_key, token, tracker_manager, clients_manager, notifier_man
     app.add_route('/api/trackers/{tracker}', Tracker(tracker_manager))
     app.add_route('/api/trackers/{tracker}/check', TrackerCheck(tracker_manager))
     app.add_route('/api/default_client', DefaultClient(clients_manager))
+    app.add_route('/api/clients_balancing', ClientsBalancing(clients_manager))
+    app.add_route('/api/clients_failover', ClientsFailover(clients_manager))
+    app.add_route('/api/clients_metrics', ClientsMetrics(clients_manager))
     app.add_route('/api/clients', ClientCollection(clients_manager))
     app.add_route('/api/clients/{client}', Client(clients_manager))
     app.add_route('/api/clients/{client}/check', ClientCheck(clients_manager))
+    app.add_route('/api/clients/{client}/metrics', ClientMetricsResource(clients_manager))
     app.add_route('/api/clients/{client}/default', ClientDefault(clients_manager))
     app.add_route('/api/notifiers', NotifierCollection(notifier_manager))
     app.add_route('/api/notifiers/{notifier}', Notifier(notifier_manager))
@@ -104,6 +111,7 @@ def create_app(secret_key, token, tracker_manager, clients_manager, notifier_man
     app.add_route('/api/settings/password', SettingsPassword(settings_manager))
     app.add_route('/api/settings/developer', SettingsDeveloper(settings_manager))
     app.add_route('/api/settings/logs', SettingsLogs(settings_manager))
+    app.add_route('/api/settings/clients-outbox', SettingsClientsOutbox(settings_manager, engine_runner.outbox))
     app.add_route('/api/settings/proxy/enabled', SettingsProxyEnabled(settings_manager))
     app.add_route('/api/settings/proxy', SettingsProxy(settings_manager))
     app.add_route('/api/settings/execute', SettingsExecute(engine_runner))
@@ -133,6 +141,8 @@ def main():
         ip = '0.0.0.0'
         port = 6687
         db_path = 'monitorrent.db'
+        db_profile = DEFAULT_STORAGE_PROFILE
+        settings_cache_ttl = None
         config = 'config.py'
         playwright_timeout = 120000
 
@@ -151,6 +161,8 @@ def main():
                     self.ip = parsed_config.get('ip', self.ip)
                     self.port = parsed_config.get('port', self.port)
                     self.db_path = parsed_config.get('db_path', self.db_path)
+                    self.db_profile = parsed_config.get('db_profile', self.db_profile)
+                    self.settings_cache_ttl = parsed_config.get('settings_cache_ttl', self.settings_cache_ttl)
                     self.playwright_timeout = parsed_config.get('playwright_timeout', self.db_path)
                 except:
                     ex, val, tb = sys.exc_info()
@@ -162,6 +174,11 @@ def main():
             self.ip = parsed_args.ip or os.environ.get('MONITORRENT_IP', None) or self.ip
             self.port = parsed_args.port or try_int(os.environ.get('MONITORRENT_PORT', None)) or self.port
             self.db_path = parsed_args.db_path or os.environ.get('MONITORRENT_DB_PATH', None) or self.db_path
+            self.db_profile = parsed_args.db_profile or os.environ.get('MONITORRENT_DB_PROFILE', None) \
+                or self.db_profile
+            self.settings_cache_ttl = parsed_args.settings_cache_ttl \
+                or try_int(os.environ.get('MONITORRENT_SETTINGS_CACHE_TTL', None)) \
+                or self.settings_cache_ttl
             self.playwright_timeout = parsed_args.playwright_timeout \
                                       or try_int(os.environ.get('MONITORRENT_PLAYWRIGHT_TIMEOUT', None)) \
                                       or self.playwright_timeout
@@ -175,6 +192,12 @@ def main():
                         help='Port for server. Default is {0}'.format(Config.port))
     parser.add_argument('--db-path', type=str, dest='db_path',
                         help='Path to SQL lite database. Default is to {0}'.format(Config.db_path))
+    parser.add_argument('--db-profile', type=str, dest='db_profile', choices=sorted(STORAGE_PROFILES.keys()),
+                        help='SQLite storage profile, legacy is required for network file systems. '
+                             'Default is {0}'.format(Config.db_profile))
+    parser.add_argument('--settings-cache-ttl', type=int, dest='settings_cache_ttl',
+                        help='Seconds to cache settings, set it when several processes share database. '
+                             'By default settings are cached until changed')
     parser.add_argument('--config', type=str, dest='config',
                         default=os.environ.get('MONITORRENT_CONFIG', None),
                         help='Path to config file (default {0})'.format(Config.config))
@@ -191,20 +214,25 @@ def main():
     log.info("Configuration finished", config=config.__dict__)
     db_connection_string = "sqlite:///" + config.db_path
 
-    init_db_engine(db_connection_string, False)
+    init_db_engine(db_connection_string, False, config.db_profile)
     load_plugins()
     upgrade()
     create_db()
 
+    settings_cache.ttl = config.settings_cache_ttl
     settings_manager = SettingsManager()
     tracker_manager = TrackersManager(settings_manager, get_plugins('tracker'), config)
     clients_manager = DbClientsManager(settings_manager, get_plugins('client'))
     notifier_manager = NotifierManager(settings_manager, get_plugins('notifier'))
 
+    # outbox adds torrents queued by previous run even if it was disabled later
+    outbox = ClientsOutbox(clients_manager, notifier_manager)
+    outbox.start()
+
     log_manager = ExecuteLogManager()
     engine_runner_logger = DbLoggerWrapper(log_manager, settings_manager)
     engine_runner = DBEngineRunner(engine_runner_logger, settings_manager, tracker_manager,
-                                   clients_manager, notifier_manager)
+                                   clients_manager, notifier_manager, outbox=outbox)
 
     include_prerelease = settings_manager.get_new_version_check_include_prerelease()
     new_version_checker = NewVersionChecker(notifier_manager, include_prerelease)
@@ -236,6 +264,8 @@ def main():
     except KeyboardInterrupt:
         print('Stopping engine')
         engine_runner.stop()
+        print('Stopping clients outbox')
+        outbox.stop()
         print('Stopping new_version_checker')
         new_version_checker.stop()
         server.stop()
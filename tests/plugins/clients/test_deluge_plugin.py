@@ -10,6 +10,7 @@ import pytz.reference
 from tests import DbTestCase
 from monitorrent.plugins.clients import TopicSettings
 from monitorrent.plugins.clients.deluge import DelugeClientPlugin
+from monitorrent.utils.bittorrent_ex import Torrent
 
 
 @ddt
@@ -40,6 +41,27 @@ class DelugePluginTest(DbTestCase):
         connect_mock = rpc_client.connect
         connect_mock.assert_called_once_with()
 
+    @patch('monitorrent.plugins.clients.deluge.DelugeRPCClient')
+    def test_check_connection_requests_daemon(self, deluge_client):
+        rpc_client = deluge_client.return_value
+        rpc_client.connected = True
+
+        plugin = DelugeClientPlugin()
+        settings = {'host': 'localhost', 'username': 'monitorrent', 'password': 'monitorrent'}
+        plugin.set_settings(settings)
+
+        self.assertTrue(plugin.check_connection())
+        rpc_client.call.side_effect = Exception("Connection refused")
+        with pytest.raises(Exception):
+            plugin.check_connection()
+
+        rpc_client.call.assert_called_with('daemon.info')
+
+        rpc_client.call.side_effect = None
+        self.assertTrue(plugin.check_connection())
+        # failed connection was dropped
+        self.assertEqual(2, deluge_client.call_count)
+
     @patch('monitorrent.plugins.clients.deluge.DelugeRPCClient')
     def test_check_connection_failed(self, deluge_client):
         rpc_client = deluge_client.return_value
@@ -91,6 +113,47 @@ class DelugePluginTest(DbTestCase):
         rpc_client.call.assert_called_once_with('core.get_torrent_status', torrent_hash.lower(),
                                                 ['time_added', 'name'])
 
+
+    @patch('monitorrent.plugins.clients.deluge.DelugeRPCClient')
+    def test_get_torrents(self, deluge_client):
+        rpc_client = deluge_client.return_value
+        rpc_client.connected = True
+
+        plugin = DelugeClientPlugin()
+        settings = {'host': 'localhost', 'username': 'monitorrent', 'password': 'monitorrent'}
+        plugin.set_settings(settings)
+
+        date_added = datetime(2015, 10, 9, 12, 3, 55, tzinfo=pytz.reference.LocalTimezone())
+        rpc_client.call.return_value = {
+            b'hash1': {b'name': b'Torrent 1', b'time_added': time.mktime(date_added.timetuple())}
+        }
+
+        torrents = plugin.get_torrents()
+
+        self.assertEqual({'hash1': {'name': 'Torrent 1', 'date_added': date_added.astimezone(pytz.utc)}}, torrents)
+        rpc_client.call.assert_called_once_with('core.get_torrents_status', {}, ['time_added', 'name'])
+
+
+    @patch('monitorrent.plugins.clients.deluge.DelugeRPCClient')
+    def test_find_torrents(self, deluge_client):
+        rpc_client = deluge_client.return_value
+        rpc_client.connected = True
+
+        plugin = DelugeClientPlugin()
+        settings = {'host': 'localhost', 'username': 'monitorrent', 'password': 'monitorrent'}
+        plugin.set_settings(settings)
+
+        date_added = datetime(2015, 10, 9, 12, 3, 55, tzinfo=pytz.reference.LocalTimezone())
+        rpc_client.call.return_value = {
+            b'hash1': {b'name': b'Torrent 1', b'time_added': time.mktime(date_added.timetuple())}
+        }
+
+        torrents = plugin.find_torrents(['HASH1', 'HASH2'])
+
+        self.assertEqual({'hash1': {'name': 'Torrent 1', 'date_added': date_added.astimezone(pytz.utc)}}, torrents)
+        rpc_client.call.assert_called_once_with('core.get_torrents_status', {'id': ['hash1', 'hash2']},
+                                                ['time_added', 'name'])
+
     @patch('monitorrent.plugins.clients.deluge.DelugeRPCClient')
     def test_find_torrent_without_credentials(self, deluge_client):
         rpc_client = deluge_client.return_value
@@ -145,10 +208,10 @@ class DelugePluginTest(DbTestCase):
 
         rpc_client.call.return_value = True
 
-        torrent = b'!torrent.content'
+        torrent = Torrent(b'd4:infod6:lengthi1e4:name4:fileee')
         self.assertTrue(plugin.add_torrent(torrent, None))
 
-        rpc_client.call.assert_called_once_with('core.add_torrent_file', None, base64.b64encode(torrent), None)
+        rpc_client.call.assert_called_once_with('core.add_torrent_file', None, base64.b64encode(torrent.raw_content), None)
 
     @patch('monitorrent.plugins.clients.deluge.DelugeRPCClient')
     def test_add_torrent_with_settings(self, deluge_client):
@@ -161,14 +224,14 @@ class DelugePluginTest(DbTestCase):
 
         rpc_client.call.return_value = True
 
-        torrent = b'!torrent.content'
+        torrent = Torrent(b'd4:infod6:lengthi1e4:name4:fileee')
         self.assertTrue(plugin.add_torrent(torrent, TopicSettings('/path/to/download')))
 
         options = {
             'download_location': '/path/to/download'
         }
 
-        rpc_client.call.assert_called_once_with('core.add_torrent_file', None, base64.b64encode(torrent), options)
+        rpc_client.call.assert_called_once_with('core.add_torrent_file', None, base64.b64encode(torrent.raw_content), options)
 
     @patch('monitorrent.plugins.clients.deluge.DelugeRPCClient')
     def test_add_torrent_without_credentials(self, deluge_client):
@@ -179,7 +242,7 @@ class DelugePluginTest(DbTestCase):
 
         rpc_client.call.return_value = True
 
-        torrent = b'!torrent.content'
+        torrent = Torrent(b'd4:infod6:lengthi1e4:name4:fileee')
         self.assertFalse(plugin.add_torrent(torrent, None))
 
         rpc_client.call.assert_not_called()
@@ -194,11 +257,52 @@ class DelugePluginTest(DbTestCase):
         settings = {'host': 'localhost', 'username': 'monitorrent', 'password': 'monitorrent'}
         plugin.set_settings(settings)
 
-        torrent = b'!torrent.content'
+        torrent = Torrent(b'd4:infod6:lengthi1e4:name4:fileee')
         with pytest.raises(Exception) as e:
             plugin.add_torrent(torrent, None)
 
-        rpc_client.call.assert_called_once_with('core.add_torrent_file', None, base64.b64encode(torrent), None)
+        rpc_client.call.assert_called_once_with('core.add_torrent_file', None, base64.b64encode(torrent.raw_content), None)
+
+    @patch('monitorrent.plugins.clients.deluge.DelugeRPCClient')
+    def test_reuse_connection(self, deluge_client):
+        rpc_client = deluge_client.return_value
+        rpc_client.connected = True
+        rpc_client.call.return_value = {}
+
+        plugin = DelugeClientPlugin()
+        settings = {'host': 'localhost', 'username': 'monitorrent', 'password': 'monitorrent'}
+        plugin.set_settings(settings)
+
+        self.assertTrue(plugin.check_connection())
+        self.assertEqual({}, plugin.get_torrents())
+        self.assertEqual({}, plugin.find_torrents(['HASH']))
+
+        deluge_client.assert_called_once_with('localhost', DelugeClientPlugin.DEFAULT_PORT, 'monitorrent', 'monitorrent')
+        rpc_client.connect.assert_called_once_with()
+
+        settings['password'] = 'new_password'
+        plugin.set_settings(settings)
+        self.assertEqual({}, plugin.get_torrents())
+
+        deluge_client.assert_called_with('localhost', DelugeClientPlugin.DEFAULT_PORT, 'monitorrent', 'new_password')
+        self.assertEqual(2, rpc_client.connect.call_count)
+
+    @patch('monitorrent.plugins.clients.deluge.DelugeRPCClient')
+    def test_reconnect_after_failure(self, deluge_client):
+        rpc_client = deluge_client.return_value
+        rpc_client.connected = True
+        rpc_client.call.side_effect = [Exception, {}]
+
+        plugin = DelugeClientPlugin()
+        settings = {'host': 'localhost', 'username': 'monitorrent', 'password': 'monitorrent'}
+        plugin.set_settings(settings)
+
+        with pytest.raises(Exception):
+            plugin.get_torrents()
+        self.assertEqual({}, plugin.get_torrents())
+
+        self.assertEqual(2, deluge_client.call_count)
+        self.assertEqual(2, rpc_client.connect.call_count)
 
     @patch('monitorrent.plugins.clients.deluge.DelugeRPCClient')
     def test_remove_torrent(self, deluge_client):
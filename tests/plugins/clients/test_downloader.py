@@ -5,7 +5,7 @@ from datetime import datetime
 from mock import patch, mock_open, MagicMock, Mock
 from tests import DbTestCase, ReadContentMixin, tests_dir
 from monitorrent.plugins.clients.downloader import DownloaderPlugin
-from monitorrent.utils.bittorrent_ex import Torrent
+from monitorrent.utils.bittorrent_ex import Torrent, TorrentMeta
 from pytz import reference, utc
 
 
@@ -35,6 +35,17 @@ class DownloaderTest(ReadContentMixin, DbTestCase):
 
         self.assertEqual(self.downloader_dir, plugin.check_connection())
 
+    def test_get_free_space(self):
+        plugin = DownloaderPlugin()
+        self.assertIsNone(plugin.get_free_space())
+
+        plugin.set_settings({'path': self.downloader_dir})
+
+        with patch('monitorrent.plugins.clients.downloader.shutil.disk_usage') as disk_usage:
+            disk_usage.return_value = Mock(free=1024)
+            self.assertEqual(1024, plugin.get_free_space())
+            disk_usage.assert_called_once_with(self.downloader_dir)
+
     def test_check_connection_failed(self):
         plugin = DownloaderPlugin()
         settings = {'path': ('C:/torrents' if sys.platform == 'win32' else '/dev/somedevice')}
@@ -125,7 +136,7 @@ class DownloaderTest(ReadContentMixin, DbTestCase):
             self.assertFalse(plugin.find_torrent(torrent.info_hash))
 
     def test_add_torrent_success(self):
-        torrent = self.read_httpretty_content('Hell.On.Wheels.S05E02.720p.WEB.rus.LostFilm.TV.mp4.torrent', 'rb')
+        torrent = Torrent(self.read_httpretty_content('Hell.On.Wheels.S05E02.720p.WEB.rus.LostFilm.TV.mp4.torrent', 'rb'))
 
         plugin = DownloaderPlugin()
         settings = {'path': self.downloader_dir}
@@ -136,15 +147,8 @@ class DownloaderTest(ReadContentMixin, DbTestCase):
         created_file = os.path.join(self.downloader_dir, "A7BF281BE37BAF50E5725584DAF93AEFB3DD484A.torrent")
         self.assertTrue(os.path.exists(created_file))
 
-    def test_add_torrent_failed_1(self):
-        plugin = DownloaderPlugin()
-        settings = {'path': self.downloader_dir}
-        plugin.set_settings(settings)
-
-        self.assertFalse(plugin.add_torrent("FAKE TORRENT", None))
-
-    def test_add_torrent_failed_2(self):
-        torrent = self.read_httpretty_content('Hell.On.Wheels.S05E02.720p.WEB.rus.LostFilm.TV.mp4.torrent', 'rb')
+    def test_add_torrent_failed(self):
+        torrent = Torrent(self.read_httpretty_content('Hell.On.Wheels.S05E02.720p.WEB.rus.LostFilm.TV.mp4.torrent', 'rb'))
 
         plugin = DownloaderPlugin()
         settings = {'path': self.downloader_dir}
@@ -199,3 +203,73 @@ class DownloaderTest(ReadContentMixin, DbTestCase):
             remove.side_effect = OSError
             self.assertFalse(plugin.remove_torrent(torrent.info_hash))
         self.assertTrue(os.path.exists(downloaded_filepath))
+
+    SECOND_TORRENT = b'd4:infod6:lengthi1e4:name4:file12:piece lengthi1e6:pieces20:01234567890123456789ee'
+
+    def _write_torrent(self, name, content=None):
+        if not os.path.exists(self.downloader_dir):
+            os.makedirs(self.downloader_dir)
+        if content is None:
+            content = self.read_httpretty_content('Hell.On.Wheels.S05E02.720p.WEB.rus.LostFilm.TV.mp4.torrent', 'rb')
+        with open(os.path.join(self.downloader_dir, name), 'wb') as f:
+            f.write(content)
+        return Torrent(content)
+
+    def test_find_torrent_parse_files_once(self):
+        plugin = DownloaderPlugin()
+        plugin.set_settings({'path': self.downloader_dir})
+        torrent1 = self._write_torrent('1.torrent')
+        torrent2 = self._write_torrent('2.torrent', self.SECOND_TORRENT)
+
+        with patch.object(TorrentMeta, 'from_file', wraps=TorrentMeta.from_file) as from_file:
+            self.assertEqual(plugin.find_torrent(torrent1.info_hash)['name'], '1.torrent')
+            self.assertEqual(plugin.find_torrent(torrent2.info_hash)['name'], '2.torrent')
+            self.assertFalse(plugin.find_torrent('TORRENT_HASH'))
+
+            self.assertEqual(from_file.call_count, 2)
+
+        # index is stored in db and reused by new plugin instance
+        with patch.object(TorrentMeta, 'from_file', wraps=TorrentMeta.from_file) as from_file:
+            self.assertNotEqual(False, DownloaderPlugin().find_torrent(torrent1.info_hash))
+
+            from_file.assert_not_called()
+
+    def test_find_torrent_reparse_changed_files(self):
+        plugin = DownloaderPlugin()
+        plugin.set_settings({'path': self.downloader_dir})
+        torrent1 = self._write_torrent('1.torrent')
+        self.assertNotEqual(False, plugin.find_torrent(torrent1.info_hash))
+
+        torrent2 = self._write_torrent('1.torrent', self.SECOND_TORRENT)
+
+        self.assertFalse(plugin.find_torrent(torrent1.info_hash))
+        self.assertEqual(plugin.find_torrent(torrent2.info_hash)['name'], '1.torrent')
+
+        os.remove(os.path.join(self.downloader_dir, '1.torrent'))
+
+        self.assertFalse(plugin.find_torrent(torrent2.info_hash))
+
+    def test_find_torrent_skip_scan_of_unchanged_directory(self):
+        plugin = DownloaderPlugin()
+        plugin.set_settings({'path': self.downloader_dir})
+        plugin.index.dir_mtime_granularity = -1
+        torrent = self._write_torrent('1.torrent')
+        self.assertNotEqual(False, plugin.find_torrent(torrent.info_hash))
+
+        with patch('monitorrent.plugins.clients.downloader.os.scandir') as scandir:
+            self.assertNotEqual(False, plugin.find_torrent(torrent.info_hash))
+            self.assertFalse(plugin.find_torrent('TORRENT_HASH'))
+
+            scandir.assert_not_called()
+
+    def test_add_and_remove_torrent_update_index(self):
+        torrent = Torrent(self.read_httpretty_content('Hell.On.Wheels.S05E02.720p.WEB.rus.LostFilm.TV.mp4.torrent', 'rb'))
+        plugin = DownloaderPlugin()
+        plugin.set_settings({'path': self.downloader_dir})
+
+        self.assertTrue(plugin.add_torrent(torrent, None))
+        self.assertEqual(plugin.index.find(self.downloader_dir, torrent.info_hash),
+                         'A7BF281BE37BAF50E5725584DAF93AEFB3DD484A.torrent')
+
+        self.assertTrue(plugin.remove_torrent(torrent.info_hash))
+        self.assertIsNone(plugin.index.find(self.downloader_dir, torrent.info_hash))
@@ -3,6 +3,7 @@ from datetime import datetime
 import pytest
 import pytz
 import json
+import re
 from ddt import ddt
 from pytz import reference
 from requests import Response
@@ -12,12 +13,74 @@ import qbittorrentapi
 import monitorrent.plugins.trackers
 from monitorrent.plugins.clients import TopicSettings
 from monitorrent.plugins.clients.qbittorrent import QBittorrentClientPlugin
+from monitorrent.utils.bittorrent_ex import Torrent
 from tests import DbTestCase, ReadContentMixin, use_vcr
-from mock import patch, Mock
+from mock import patch, Mock, call
 
 def new(name, data):
     return type(name, (object,), data)
 
+
+class FakeQBittorrentWebUI(object):
+    """
+    Local fake of qBittorrent WebUI API v2, added torrents show up only after a few sync/maindata requests
+    """
+    url = 'http://localhost:8080'
+
+    def __init__(self, mocker, add_delay=2):
+        self.add_delay = add_delay
+        self.torrents = {}
+        self.sync_requests = 0
+        self._pending = []
+        self._changes = {}
+        self._rid = 0
+        self.logged_in = False
+        mocker.head(self.url + '/', text='')
+        mocker.post(self.url + '/api/v2/auth/login', text=self._login)
+        mocker.get(self.url + '/api/v2/app/version', text=self._auth(lambda request: 'v4.5.2'))
+        mocker.get(self.url + '/api/v2/app/webapiVersion', text=self._auth(lambda request: '2.8.19'))
+        mocker.post(self.url + '/api/v2/torrents/add', text=self._auth(self._add))
+        mocker.post(self.url + '/api/v2/sync/maindata', text=self._auth(self._maindata))
+        mocker.post(self.url + '/api/v2/torrents/info', text=self._auth(self._info))
+
+    def _login(self, request, context):
+        self.logged_in = True
+        return 'Ok.'
+
+    def _auth(self, handler):
+        def wrapper(request, context):
+            if not self.logged_in:
+                context.status_code = 403
+                return 'Forbidden'
+            return handler(request)
+        return wrapper
+
+    def _add(self, request):
+        for torrent_hash in re.findall(br'filename="(\w+)\.torrent"', request.body):
+            self._pending.append((self.sync_requests + self.add_delay, torrent_hash.decode('ascii').lower()))
+        return 'Ok.'
+
+    def _maindata(self, request):
+        self.sync_requests += 1
+        for _, torrent_hash in [p for p in self._pending if p[0] <= self.sync_requests]:
+            self.torrents[torrent_hash] = {'name': torrent_hash, 'added_on': 1616424630}
+            self._changes[torrent_hash] = self.torrents[torrent_hash]
+        self._pending = [p for p in self._pending if p[0] > self.sync_requests]
+
+        rid = int(dict(item.split('=') for item in request.text.split('&')).get('rid', 0))
+        self._rid += 1
+        if rid == 0:
+            result = {'rid': self._rid, 'full_update': True, 'torrents': dict(self.torrents)}
+        else:
+            result = {'rid': self._rid, 'torrents': self._changes}
+        self._changes = {}
+        return json.dumps(result)
+
+    def _info(self, request):
+        hashes = dict(item.split('=') for item in request.text.split('&')).get('hashes', '').split('%7C')
+        return json.dumps([dict(t, hash=h) for h, t in self.torrents.items() if h in hashes])
+
+
 @ddt
 class QBittorrentPluginTest(ReadContentMixin, DbTestCase):
     DEFAULT_SETTINGS = {'host': 'localhost', 'username': 'monitorrent', 'password': 'monitorrent'}
@@ -77,6 +140,147 @@ class QBittorrentPluginTest(ReadContentMixin, DbTestCase):
 
         client.torrents_info.assert_called_once_with(hashes=[torrent_hash.lower()])
 
+
+    @patch('monitorrent.plugins.clients.qbittorrent.Client')
+    def test_get_torrents(self, qbittorrent_client):
+        client = qbittorrent_client.return_value
+        date_added = datetime(2015, 10, 9, 12, 3, 55, tzinfo=pytz.reference.LocalTimezone())
+
+        plugin = QBittorrentClientPlugin()
+        plugin.set_settings(self.DEFAULT_SETTINGS)
+
+        client.torrents_info.return_value = [
+            new('torrent', {'hash': 'hash1', 'name': 'Torrent 1', 'added_on': date_added.timestamp()})
+        ]
+
+        torrents = plugin.get_torrents()
+
+        self.assertEqual({'hash1': {'name': 'Torrent 1', 'date_added': date_added.astimezone(pytz.utc)}}, torrents)
+        client.torrents_info.assert_called_once_with()
+
+
+    @patch('monitorrent.plugins.clients.qbittorrent.Client')
+    def test_find_torrents(self, qbittorrent_client):
+        client = qbittorrent_client.return_value
+        date_added = datetime(2015, 10, 9, 12, 3, 55, tzinfo=pytz.reference.LocalTimezone())
+
+        plugin = QBittorrentClientPlugin()
+        plugin.set_settings(self.DEFAULT_SETTINGS)
+
+        client.torrents_info.return_value = [
+            new('torrent', {'hash': 'hash1', 'name': 'Torrent 1', 'added_on': date_added.timestamp()})
+        ]
+
+        torrents = plugin.find_torrents(['HASH1', 'HASH2'])
+
+        self.assertEqual({'hash1': {'name': 'Torrent 1', 'date_added': date_added.astimezone(pytz.utc)}}, torrents)
+        client.torrents_info.assert_called_once_with(hashes=['hash1', 'hash2'])
+
+    @patch('monitorrent.plugins.clients.qbittorrent.time.sleep')
+    @patch('monitorrent.plugins.clients.qbittorrent.Client')
+    def test_add_torrents(self, qbittorrent_client, sleep_mock):
+        client = qbittorrent_client.return_value
+        client.torrents_add.side_effect = ['Ok.', 'Fails.']
+        client.sync_maindata.side_effect = [{'rid': 1, 'full_update': True, 'torrents': {'hash1': {}, 'other': {}}},
+                                            {'rid': 2},
+                                            {'rid': 3, 'torrents': {'hash2': {}}}]
+        torrent1 = Mock(info_hash='HASH1', raw_content=b'torrent1')
+        torrent2 = Mock(info_hash='HASH2', raw_content=b'torrent2')
+        torrent3 = Mock(info_hash='HASH3', raw_content=b'torrent3')
+
+        plugin = QBittorrentClientPlugin()
+        plugin.set_settings(self.DEFAULT_SETTINGS)
+
+        result = plugin.add_torrents([(torrent1, None), (torrent2, TopicSettings(None)),
+                                      (torrent3, TopicSettings('/path/to/download'))])
+
+        self.assertEqual([True, True, False], result)
+        client.torrents_add.assert_any_call(save_path=None, use_auto_torrent_management=None,
+                                            torrent_contents=[('HASH1.torrent', b'torrent1'),
+                                                              ('HASH2.torrent', b'torrent2')])
+        client.torrents_add.assert_any_call(save_path='/path/to/download', use_auto_torrent_management=False,
+                                            torrent_contents=[('HASH3.torrent', b'torrent3')])
+        self.assertEqual([call(rid=0), call(rid=1), call(rid=2)], client.sync_maindata.call_args_list)
+        self.assertEqual([call(0.05), call(0.1)], sleep_mock.call_args_list)
+        client.torrents_info.assert_not_called()
+        self.assertEqual(3, plugin._sync_rid)
+
+    @patch('monitorrent.plugins.clients.qbittorrent.time.sleep')
+    @patch('monitorrent.plugins.clients.qbittorrent.Client')
+    def test_add_torrents_timeout(self, qbittorrent_client, sleep_mock):
+        client = qbittorrent_client.return_value
+        client.torrents_add.return_value = 'Ok.'
+        client.sync_maindata.return_value = {'rid': 1}
+        # already added torrent is not reported in incremental updates
+        client.torrents_info.return_value = [new('torrent', {'hash': 'hash1'})]
+        torrent1 = Mock(info_hash='HASH1', raw_content=b'torrent1')
+        torrent2 = Mock(info_hash='HASH2', raw_content=b'torrent2')
+
+        plugin = QBittorrentClientPlugin()
+        plugin.set_settings(self.DEFAULT_SETTINGS)
+        plugin.add_timeout = 0
+
+        result = plugin.add_torrents([(torrent1, None), (torrent2, None)])
+
+        self.assertEqual([True, False], result)
+        client.sync_maindata.assert_called_once_with(rid=0)
+        sleep_mock.assert_not_called()
+        self.assertEqual(['hash1', 'hash2'], sorted(client.torrents_info.call_args[1]['hashes']))
+
+    @patch('monitorrent.plugins.clients.qbittorrent.time.sleep')
+    def test_add_torrents_fake_webui(self, sleep_mock):
+        torrent1 = Torrent(b'd4:infod6:lengthi1e4:name5:file1ee')
+        torrent2 = Torrent(b'd4:infod6:lengthi2e4:name5:file2ee')
+        torrent3 = Torrent(b'd4:infod6:lengthi3e4:name5:file3ee')
+
+        with Mocker() as mocker:
+            webui = FakeQBittorrentWebUI(mocker)
+
+            plugin = QBittorrentClientPlugin()
+            plugin.set_settings(self.DEFAULT_SETTINGS)
+
+            self.assertTrue(plugin.add_torrent(torrent1, None))
+            self.assertEqual(2, webui.sync_requests)
+
+            result = plugin.add_torrents([(torrent2, None), (torrent3, TopicSettings('/path/to/download'))])
+
+        self.assertEqual([True, True], result)
+        self.assertEqual({torrent1.info_hash.lower(), torrent2.info_hash.lower(), torrent3.info_hash.lower()},
+                         set(webui.torrents.keys()))
+        # both torrents are confirmed by the same incremental updates
+        self.assertEqual(4, webui.sync_requests)
+        self.assertEqual(4, plugin._sync_rid)
+        self.assertEqual(2, sleep_mock.call_count)
+
+    def test_set_settings_resets_sync_rid(self):
+        plugin = QBittorrentClientPlugin()
+        plugin._sync_rid = 10
+
+        plugin.set_settings(self.DEFAULT_SETTINGS)
+
+        self.assertEqual(0, plugin._sync_rid)
+
+    @patch('monitorrent.plugins.clients.qbittorrent.Client')
+    def test_get_free_space(self, qbittorrent_client):
+        client = qbittorrent_client.return_value
+        client.sync_maindata.return_value = {'rid': 1, 'server_state': {'free_space_on_disk': 1024}}
+
+        plugin = QBittorrentClientPlugin()
+        plugin.set_settings(self.DEFAULT_SETTINGS)
+
+        self.assertEqual(1024, plugin.get_free_space())
+        client.sync_maindata.assert_called_once_with()
+
+    @patch('monitorrent.plugins.clients.qbittorrent.Client')
+    def test_remove_torrents(self, qbittorrent_client):
+        client = qbittorrent_client.return_value
+
+        plugin = QBittorrentClientPlugin()
+        plugin.set_settings(self.DEFAULT_SETTINGS)
+
+        self.assertTrue(plugin.remove_torrents(['HASH1', 'HASH2']))
+        client.torrents_delete.assert_called_once_with(hashes=['hash1', 'hash2'])
+
     @patch('monitorrent.plugins.clients.qbittorrent.Client')
     def test_find_torrent_failed(self, qbittorrent_client):
         client = qbittorrent_client.return_value
@@ -106,7 +310,7 @@ class QBittorrentPluginTest(ReadContentMixin, DbTestCase):
 
     @patch('monitorrent.plugins.clients.qbittorrent.Client')
     def test_add_torrent_success(self, qbittorrent_client):
-        torrent = self.read_httpretty_content('Hell.On.Wheels.S05E02.720p.WEB.rus.LostFilm.TV.mp4.torrent', 'rb')
+        torrent = Torrent(self.read_httpretty_content('Hell.On.Wheels.S05E02.720p.WEB.rus.LostFilm.TV.mp4.torrent', 'rb'))
         client = qbittorrent_client.return_value
         client.torrents_add.return_value = 'Ok.'
         torrent_info = [
@@ -118,6 +322,7 @@ class QBittorrentPluginTest(ReadContentMixin, DbTestCase):
             })
         ]
         client.torrents_info.return_value = torrent_info
+        client.sync_maindata.return_value = {'rid': 1, 'torrents': {torrent.info_hash.lower(): {}}}
 
         plugin = QBittorrentClientPlugin()
         settings = self.DEFAULT_SETTINGS
@@ -127,7 +332,7 @@ class QBittorrentPluginTest(ReadContentMixin, DbTestCase):
 
     @patch('monitorrent.plugins.clients.qbittorrent.Client')
     def test_add_torrent_with_settings_success(self, qbittorrent_client):
-        torrent = self.read_httpretty_content('Hell.On.Wheels.S05E02.720p.WEB.rus.LostFilm.TV.mp4.torrent', 'rb')
+        torrent = Torrent(self.read_httpretty_content('Hell.On.Wheels.S05E02.720p.WEB.rus.LostFilm.TV.mp4.torrent', 'rb'))
         client = qbittorrent_client.return_value
         client.torrents_add.return_value = 'Ok.'
         torrent_info = [
@@ -139,6 +344,7 @@ class QBittorrentPluginTest(ReadContentMixin, DbTestCase):
             })
         ]
         client.torrents_info.return_value = torrent_info
+        client.sync_maindata.return_value = {'rid': 1, 'torrents': {torrent.info_hash.lower(): {}}}
 
         plugin = QBittorrentClientPlugin()
         settings = self.DEFAULT_SETTINGS
@@ -10,6 +10,7 @@ import transmissionrpc
 from tests import DbTestCase
 from monitorrent.plugins.clients import TopicSettings
 from monitorrent.plugins.clients.transmission import TransmissionClientPlugin
+from monitorrent.utils.bittorrent_ex import Torrent
 import pytz
 import pytz.reference
 
@@ -61,6 +62,26 @@ class TransmissionPluginTest(DbTestCase):
         transmission_client.assert_called_with(address='localhost', port=TransmissionClientPlugin.DEFAULT_PORT,
                                                user='monitorrent', password='monitorrent')
 
+    @patch('monitorrent.plugins.clients.transmission.transmissionrpc.Client')
+    def test_check_connection_requests_daemon(self, transmission_client):
+        rpc_client = transmission_client.return_value
+
+        plugin = TransmissionClientPlugin()
+        settings = {'host': 'localhost', 'username': 'monitorrent', 'password': 'monitorrent'}
+        plugin.set_settings(settings)
+
+        self.assertTrue(plugin.check_connection())
+        rpc_client.get_session.side_effect = transmissionrpc.TransmissionError
+        with pytest.raises(transmissionrpc.TransmissionError):
+            plugin.check_connection()
+
+        self.assertEqual(2, rpc_client.get_session.call_count)
+
+        rpc_client.get_session.side_effect = None
+        self.assertTrue(plugin.check_connection())
+        # failed connection was dropped
+        self.assertEqual(2, transmission_client.call_count)
+
     @patch('monitorrent.plugins.clients.transmission.transmissionrpc.Client')
     def test_find_torrent(self, transmission_client):
         rpc_client = transmission_client.return_value
@@ -83,6 +104,48 @@ class TransmissionPluginTest(DbTestCase):
         rpc_client.get_torrent.assert_called_once_with(torrent_hash.lower(),
                                                        ['id', 'hashString', 'addedDate', 'name'])
 
+
+    @patch('monitorrent.plugins.clients.transmission.transmissionrpc.Client')
+    def test_get_torrents(self, transmission_client):
+        rpc_client = transmission_client.return_value
+
+        plugin = TransmissionClientPlugin()
+        settings = {'host': 'localhost', 'username': 'monitorrent', 'password': 'monitorrent'}
+        plugin.set_settings(settings)
+
+        date_added = datetime(2015, 10, 9, 12, 3, 55, tzinfo=pytz.reference.LocalTimezone())
+        torrent_class = namedtuple('Torrent', ['hashString', 'name', 'date_added'])
+        rpc_client.get_torrents.return_value = [torrent_class(hashString='hash1', name='Torrent 1',
+                                                              date_added=date_added)]
+
+        torrents = plugin.get_torrents()
+
+        self.assertEqual({'hash1': {'name': 'Torrent 1', 'date_added': date_added.astimezone(pytz.utc)}}, torrents)
+        rpc_client.get_torrents.assert_called_once_with(arguments=['id', 'hashString', 'addedDate', 'name'])
+
+
+    @patch('monitorrent.plugins.clients.transmission.transmissionrpc.Client')
+    def test_find_and_remove_torrents(self, transmission_client):
+        rpc_client = transmission_client.return_value
+
+        plugin = TransmissionClientPlugin()
+        settings = {'host': 'localhost', 'username': 'monitorrent', 'password': 'monitorrent'}
+        plugin.set_settings(settings)
+
+        date_added = datetime(2015, 10, 9, 12, 3, 55, tzinfo=pytz.reference.LocalTimezone())
+        torrent_class = namedtuple('Torrent', ['hashString', 'name', 'date_added'])
+        rpc_client.get_torrents.return_value = [torrent_class(hashString='hash1', name='Torrent 1',
+                                                              date_added=date_added)]
+
+        torrents = plugin.find_torrents(['HASH1', 'HASH2'])
+
+        self.assertEqual({'hash1': {'name': 'Torrent 1', 'date_added': date_added.astimezone(pytz.utc)}}, torrents)
+        rpc_client.get_torrents.assert_called_once_with(['hash1', 'hash2'],
+                                                        arguments=['id', 'hashString', 'addedDate', 'name'])
+
+        self.assertTrue(plugin.remove_torrents(['HASH1', 'HASH2']))
+        rpc_client.remove_torrent.assert_called_once_with(['hash1', 'hash2'], delete_data=False)
+
     @patch('monitorrent.plugins.clients.transmission.transmissionrpc.Client')
     def test_find_torrent_without_credentials(self, transmission_client):
         rpc_client = transmission_client.return_value
@@ -117,10 +180,10 @@ class TransmissionPluginTest(DbTestCase):
         settings = {'host': 'localhost', 'username': 'monitorrent', 'password': 'monitorrent'}
         plugin.set_settings(settings)
 
-        torrent = b'!torrent.content'
+        torrent = Torrent(b'd4:infod6:lengthi1e4:name4:fileee')
         self.assertTrue(plugin.add_torrent(torrent, None))
 
-        rpc_client.add_torrent.assert_called_once_with(base64.b64encode(torrent).decode('utf-8'))
+        rpc_client.add_torrent.assert_called_once_with(base64.b64encode(torrent.raw_content).decode('utf-8'))
 
     @patch('monitorrent.plugins.clients.transmission.transmissionrpc.Client')
     def test_add_torrent_with_settings(self, transmission_client):
@@ -130,10 +193,10 @@ class TransmissionPluginTest(DbTestCase):
         settings = {'host': 'localhost', 'username': 'monitorrent', 'password': 'monitorrent'}
         plugin.set_settings(settings)
 
-        torrent = b'!torrent.content'
+        torrent = Torrent(b'd4:infod6:lengthi1e4:name4:fileee')
         self.assertTrue(plugin.add_torrent(torrent, TopicSettings('/path/to/download/dir')))
 
-        rpc_client.add_torrent.assert_called_once_with(base64.b64encode(torrent).decode('utf-8'), download_dir='/path/to/download/dir')
+        rpc_client.add_torrent.assert_called_once_with(base64.b64encode(torrent.raw_content).decode('utf-8'), download_dir='/path/to/download/dir')
 
     @patch('monitorrent.plugins.clients.transmission.transmissionrpc.Client')
     def test_add_torrent_without_credentials(self, transmission_client):
@@ -143,7 +206,7 @@ class TransmissionPluginTest(DbTestCase):
 
         rpc_client.call.return_value = True
 
-        torrent = b'!torrent.content'
+        torrent = Torrent(b'd4:infod6:lengthi1e4:name4:fileee')
         self.assertFalse(plugin.add_torrent(torrent, None))
 
         rpc_client.add_torrent.assert_not_called()
@@ -157,11 +220,50 @@ class TransmissionPluginTest(DbTestCase):
         settings = {'host': 'localhost', 'username': 'monitorrent', 'password': 'monitorrent'}
         plugin.set_settings(settings)
 
-        torrent = b'!torrent.content'
+        torrent = Torrent(b'd4:infod6:lengthi1e4:name4:fileee')
         with pytest.raises(transmissionrpc.TransmissionError) as e:
             plugin.add_torrent(torrent, None)
 
-        rpc_client.add_torrent.assert_called_once_with(base64.b64encode(torrent).decode('utf-8'))
+        rpc_client.add_torrent.assert_called_once_with(base64.b64encode(torrent.raw_content).decode('utf-8'))
+
+    @patch('monitorrent.plugins.clients.transmission.transmissionrpc.Client')
+    def test_reuse_connection(self, transmission_client):
+        rpc_client = transmission_client.return_value
+        rpc_client.get_torrents.return_value = []
+
+        plugin = TransmissionClientPlugin()
+        settings = {'host': 'localhost', 'username': 'monitorrent', 'password': 'monitorrent'}
+        plugin.set_settings(settings)
+
+        self.assertTrue(plugin.check_connection())
+        self.assertEqual({}, plugin.get_torrents())
+        self.assertTrue(plugin.remove_torrent('HASH'))
+
+        transmission_client.assert_called_once_with(address='localhost', port=TransmissionClientPlugin.DEFAULT_PORT,
+                                                    user='monitorrent', password='monitorrent')
+
+        settings['password'] = 'new_password'
+        plugin.set_settings(settings)
+        self.assertEqual({}, plugin.get_torrents())
+
+        self.assertEqual(2, transmission_client.call_count)
+        transmission_client.assert_called_with(address='localhost', port=TransmissionClientPlugin.DEFAULT_PORT,
+                                               user='monitorrent', password='new_password')
+
+    @patch('monitorrent.plugins.clients.transmission.transmissionrpc.Client')
+    def test_reconnect_after_failure(self, transmission_client):
+        rpc_client = transmission_client.return_value
+        rpc_client.get_torrents.side_effect = [transmissionrpc.TransmissionError, []]
+
+        plugin = TransmissionClientPlugin()
+        settings = {'host': 'localhost', 'username': 'monitorrent', 'password': 'monitorrent'}
+        plugin.set_settings(settings)
+
+        with pytest.raises(transmissionrpc.TransmissionError):
+            plugin.get_torrents()
+        self.assertEqual({}, plugin.get_torrents())
+
+        self.assertEqual(2, transmission_client.call_count)
 
     @patch('monitorrent.plugins.clients.transmission.transmissionrpc.Client')
     def test_remove_torrent(self, transmission_client):
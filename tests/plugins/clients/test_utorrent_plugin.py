@@ -2,8 +2,10 @@ import pytest
 from ddt import ddt
 from mock import patch, Mock, MagicMock
 from requests import Response
+from requests_mock import Mocker
 
 from monitorrent.plugins.clients.utorrent import UTorrentClientPlugin
+from monitorrent.utils.bittorrent_ex import Torrent
 from tests import DbTestCase, use_vcr
 
 
@@ -81,6 +83,24 @@ class UTorrentPluginTest(DbTestCase):
         with pytest.raises(Exception) as e:
             plugin.find_torrent(torrent_hash)
 
+
+    @patch('requests.Session.get')
+    def test_get_torrents(self, get_mock):
+        token_response = Response()
+        token_response._content = b"<html><div id=''token'' style=''display:none;''>FKWBGjUDYXGNX7I-UBo5-UiWK1MUOaDmjjrorxOTzmEq3b0lWpr4no8v-FYAAAAA</div></html>"
+        list_response = Response()
+        list_response._content = b'{"torrents": [["8347DD6415598A7409DFC3D1AB95078F959BFB93", 201, "Torrent 1"]]}'
+        get_mock.side_effect = [token_response, list_response]
+        plugin = UTorrentClientPlugin()
+        settings = {'host': self.real_host, 'port': self.real_port, 'username': self.real_login,
+                    'password': self.real_password}
+        plugin.set_settings(settings)
+
+        torrents = plugin.get_torrents()
+
+        self.assertEqual({"8347DD6415598A7409DFC3D1AB95078F959BFB93": {'name': 'Torrent 1', 'date_added': None}},
+                         torrents)
+
     @patch('requests.Session.get')
     def test_add_torrent_bad_settings(self, get_mock):
         plugin = UTorrentClientPlugin()
@@ -102,7 +122,7 @@ class UTorrentPluginTest(DbTestCase):
                     'password': self.real_password}
         plugin.set_settings(settings)
 
-        torrent = b'torrent'
+        torrent = Torrent(b'd4:infod6:lengthi1e4:name4:fileee')
         with pytest.raises(Exception) as e:
             plugin.add_torrent(torrent, None)
 
@@ -122,7 +142,7 @@ class UTorrentPluginTest(DbTestCase):
                     'password': self.real_password}
         plugin.set_settings(settings)
 
-        torrent = b'torrent'
+        torrent = Torrent(b'd4:infod6:lengthi1e4:name4:fileee')
         self.assertTrue(plugin.add_torrent(torrent, None))
 
     @patch('requests.Session.get')
@@ -164,3 +184,109 @@ class UTorrentPluginTest(DbTestCase):
 
         torrent = b'torrent'
         self.assertTrue(plugin.remove_torrent(torrent))
+
+    TOKEN_RESPONSE = "<html><div id='token' style='display:none;'>{0}</div></html>"
+
+    def _set_real_settings(self, plugin):
+        settings = {'host': self.real_host, 'port': self.real_port, 'username': self.real_login,
+                    'password': self.real_password}
+        plugin.set_settings(settings)
+
+    def test_incremental_torrent_list(self):
+        target = "{0}:{1}/gui/".format(self.real_host, self.real_port)
+        with Mocker() as mocker:
+            mocker.get(target + "token.html", text=self.TOKEN_RESPONSE.format('token1'))
+            mocker.get(target + "?list=1", [
+                {'json': {'torrents': [["HASH1", 201, "Torrent 1"], ["HASH2", 201, "Torrent 2"]],
+                          'torrentc': "100"}},
+                {'json': {'torrentp': [["HASH3", 201, "Torrent 3"]], 'torrentm': ["HASH1"], 'torrentc': "101"}},
+                {'json': {'torrentp': [], 'torrentm': [], 'torrentc': "102"}},
+            ])
+
+            plugin = UTorrentClientPlugin()
+            self._set_real_settings(plugin)
+
+            self.assertEqual({'name': "Torrent 1", 'date_added': None}, plugin.find_torrent("hash1"))
+            self.assertFalse(plugin.find_torrent("HASH1"))
+            self.assertEqual({"HASH2": {'name': "Torrent 2", 'date_added': None},
+                              "HASH3": {'name': "Torrent 3", 'date_added': None}},
+                             plugin.find_torrents(["HASH2", "HASH3", "HASH4"]))
+
+            requests = mocker.request_history
+            self.assertEqual(1, len([r for r in requests if r.path.endswith('token.html')]))
+            list_requests = [r.qs for r in requests if not r.path.endswith('token.html')]
+            self.assertEqual([{'list': ['1'], 'token': ['token1']},
+                              {'list': ['1'], 'token': ['token1'], 'cid': ['100']},
+                              {'list': ['1'], 'token': ['token1'], 'cid': ['101']}], list_requests)
+
+    def test_refresh_expired_token(self):
+        target = "{0}:{1}/gui/".format(self.real_host, self.real_port)
+        with Mocker() as mocker:
+            mocker.get(target + "token.html", [{'text': self.TOKEN_RESPONSE.format('token1')},
+                                               {'text': self.TOKEN_RESPONSE.format('token2')}])
+            mocker.get(target + "?list=1", [
+                {'json': {'torrents': [["HASH1", 201, "Torrent 1"]], 'torrentc': "100"}},
+                {'status_code': 400, 'text': 'invalid request'},
+                {'json': {'torrents': [["HASH2", 201, "Torrent 2"]], 'torrentc': "200"}},
+            ])
+
+            plugin = UTorrentClientPlugin()
+            self._set_real_settings(plugin)
+
+            self.assertTrue(plugin.find_torrent("HASH1"))
+            self.assertEqual({"HASH2": {'name': "Torrent 2", 'date_added': None}}, plugin.get_torrents())
+
+            list_requests = [r.qs for r in mocker.request_history if not r.path.endswith('token.html')]
+            self.assertEqual([{'list': ['1'], 'token': ['token1']},
+                              {'list': ['1'], 'token': ['token1'], 'cid': ['100']},
+                              {'list': ['1'], 'token': ['token2']}], list_requests)
+
+    def test_changes_without_torrent_list(self):
+        target = "{0}:{1}/gui/".format(self.real_host, self.real_port)
+        with Mocker() as mocker:
+            mocker.get(target + "token.html", text=self.TOKEN_RESPONSE.format('token1'))
+            mocker.get(target + "?list=1", [
+                {'json': {'torrentp': [], 'torrentm': [], 'torrentc': "100"}},
+                {'json': {'torrents': [["HASH1", 201, "Torrent 1"]], 'torrentc': "101"}},
+            ])
+
+            plugin = UTorrentClientPlugin()
+            self._set_real_settings(plugin)
+            plugin._cid = "99"
+
+            self.assertEqual({"HASH1": {'name': "Torrent 1", 'date_added': None}}, plugin.get_torrents())
+
+            list_requests = [r.qs for r in mocker.request_history if not r.path.endswith('token.html')]
+            self.assertEqual([{'list': ['1'], 'token': ['token1'], 'cid': ['99']},
+                              {'list': ['1'], 'token': ['token1']}], list_requests)
+
+    def test_check_connection_requests_token(self):
+        target = "{0}:{1}/gui/".format(self.real_host, self.real_port)
+        with Mocker() as mocker:
+            mocker.get(target + "token.html", [{'text': self.TOKEN_RESPONSE.format('token1')},
+                                               {'status_code': 503, 'text': 'Service Unavailable'}])
+
+            plugin = UTorrentClientPlugin()
+            self._set_real_settings(plugin)
+
+            self.assertTrue(plugin.check_connection())
+            self.assertFalse(plugin.check_connection())
+
+            self.assertEqual(2, len(mocker.request_history))
+
+    def test_add_torrent_refresh_expired_token(self):
+        target = "{0}:{1}/gui/".format(self.real_host, self.real_port)
+        with Mocker() as mocker:
+            mocker.get(target + "token.html", [{'text': self.TOKEN_RESPONSE.format('token1')},
+                                               {'text': self.TOKEN_RESPONSE.format('token2')}])
+            mocker.post(target, [{'status_code': 401}, {'status_code': 200}])
+
+            plugin = UTorrentClientPlugin()
+            self._set_real_settings(plugin)
+
+            torrent = Torrent(b'd4:infod6:lengthi1e4:name4:fileee')
+            self.assertTrue(plugin.add_torrent(torrent, None))
+
+            posts = [r for r in mocker.request_history if r.method == 'POST']
+            self.assertEqual([['token1'], ['token2']], [r.qs['token'] for r in posts])
+            self.assertTrue(all(torrent.raw_content in r.body for r in posts))
@@ -1,9 +1,19 @@
 # coding=utf-8
 from unittest import TestCase
+import requests_mock
 from monitorrent.plugins.trackers import TrackerSettings, CloudflareChallengeSolverSettings
 from monitorrent.plugins.trackers.anilibria import AnilibriaTvTracker
 from tests import use_vcr
 
+RELEASE_PAGE = u"""<html><head><title>Инуяшики / Inuyashiki</title></head><body>
+<table id="publicTorrentTable">
+<tr><td class="torrentcol1">Серия 1-11 [HDTV-Rip 720p]</td>
+<td><a class="torrent-download-link" href="/upload/torrents/4045.torrent">Скачать</a></td></tr>
+<tr><td class="torrentcol1">Серия 1-11 [HDTV-Rip 1080p]</td>
+<td><a class="torrent-download-link" href="/upload/torrents/4046.torrent">Скачать</a></td></tr>
+</table></body></html>"""
+
+
 class AnilibriaTrackerTest(TestCase):
     def setUp(self):
         cloudflare_challenge_solver_settings = CloudflareChallengeSolverSettings(False, 10000, False, False, 0)
@@ -59,3 +69,47 @@ class AnilibriaTrackerTest(TestCase):
     def test_get_download_url_error(self):
         for url in self.urls_parse_failed:
             self.assertIsNone(self.tracker.get_download_url(url, None))
+
+    @requests_mock.Mocker()
+    def test_parse_url_and_get_download_url_fetch_release_once(self, mocker):
+        url = "https://www.anilibria.tv/release/inuyashiki.html"
+        release_mock = mocker.get(url, text=RELEASE_PAGE)
+
+        result = self.tracker.parse_url(url)
+        self.assertEqual(result["format_list"], ['HDTV-Rip 1080p', 'HDTV-Rip 720p'])
+        self.assertEqual(self.tracker.get_download_url(url, 'HDTV-Rip 720p'),
+                         "https://www.anilibria.tv/upload/torrents/4045.torrent")
+        self.assertEqual(self.tracker.get_download_url(url, None),
+                         "https://www.anilibria.tv/upload/torrents/4046.torrent")
+
+        self.assertEqual(release_mock.call_count, 1)
+
+    @requests_mock.Mocker()
+    def test_get_release_after_cache_expired_or_cleared(self, mocker):
+        url = "https://www.anilibria.tv/release/inuyashiki.html"
+        release_mock = mocker.get(url, text=RELEASE_PAGE)
+
+        self.tracker.get_release(url)
+        self.tracker.clear_cache()
+        self.tracker.get_release(url)
+
+        self.tracker.clear_cache()
+        self.tracker.release_cache_ttl = -1
+        self.tracker.get_release(url)
+        self.tracker.get_release(url)
+
+        self.assertEqual(release_mock.call_count, 4)
+
+    @requests_mock.Mocker()
+    def test_get_release_failed_page_is_not_cached(self, mocker):
+        url = "https://www.anilibria.tv/release/inuyashiki.html"
+        release_mock = mocker.get(url, [{'status_code': 403, 'text': u"<html><title>Just a moment...</title></html>"},
+                                        {'status_code': 200, 'text': u"<html><title>Maintenance</title></html>"},
+                                        {'status_code': 200, 'text': RELEASE_PAGE}])
+
+        self.assertEqual(self.tracker.get_release(url).format_list, [])
+        self.assertEqual(self.tracker.get_release(url).format_list, [])
+        self.assertEqual(self.tracker.get_release(url).format_list, ['HDTV-Rip 720p', 'HDTV-Rip 1080p'])
+        self.tracker.get_release(url)
+
+        self.assertEqual(release_mock.call_count, 3)
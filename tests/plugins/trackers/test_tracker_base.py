@@ -6,6 +6,7 @@ from sqlalchemy import Column, Integer, String, ForeignKey
 from ddt import ddt, data, unpack
 from mock import patch, Mock, MagicMock, ANY
 from monitorrent.db import DBSession, Base
+from monitorrent.engine import EnqueueResult
 from monitorrent.plugins import Topic
 from monitorrent.plugins.status import Status
 from monitorrent.plugins.trackers import TrackerPluginBase, WithCredentialsMixin, ExecuteWithHashChangeMixin, \
@@ -33,6 +34,7 @@ class CreateEngineMixin(object):
         engine_downloads = MagicMock()
         engine_downloads.__enter__ = Mock(return_value=engine_downloads)
         engine_downloads.__exit__ = Mock(return_value=True)
+        engine_downloads.enqueue_torrent = Mock(return_value=EnqueueResult.DISABLED)
 
         engine_topic = MagicMock()
         engine_topic.__enter__ = Mock(return_value=engine_topic)
@@ -150,6 +152,70 @@ class ExecuteWithHashChangeMixinTest(DbTestCase, CreateEngineMixin):
             self.assertEqual(topic.status, Status.Ok)
 
 
+@ddt
+class ExecuteWithHashChangeMixinEnqueueTest(DbTestCase, CreateEngineMixin):
+    class EnqueueMockTopic(Topic):
+        __tablename__ = "mocktopic_enqueue_series"
+
+        id = Column(Integer, ForeignKey('topics.id'), primary_key=True)
+        additional_attribute = Column(String, nullable=False)
+        hash = Column(String, nullable=True)
+
+        __mapper_args__ = {
+            'polymorphic_identity': 'enqueue.mocktracker.com'
+        }
+
+    def setUp(self):
+        super(ExecuteWithHashChangeMixinEnqueueTest, self).setUp()
+
+        Topic.metadata.create_all(self.engine)
+
+    @data((EnqueueResult.QUEUED, 1), (EnqueueResult.ALREADY_QUEUED, 0))
+    @unpack
+    @patch('monitorrent.plugins.trackers.is_torrent_content')
+    @patch('monitorrent.plugins.trackers.Torrent')
+    @patch('monitorrent.plugins.trackers.download')
+    def test_execute_enqueue_torrent(self, enqueued, downloaded_count, download, torrent_mock, is_torrent_content):
+        response = Response()
+        response._content = br"d9:"
+        response.status_code = 200
+        download.return_value = response, 'file.torrent'
+        is_torrent_content.return_value = True
+
+        engine_tracker, _, _, engine_downloads = self.create_engine_tracker()
+        engine_downloads.enqueue_torrent.return_value = enqueued
+
+        torrent = Mock(info_hash='HASH2')
+        torrent_mock.return_value = torrent
+
+        with DBSession() as db:
+            topic = self.EnqueueMockTopic(display_name='Russian / English',
+                                          url='http://mocktracker.com/1',
+                                          additional_attribute='English',
+                                          hash='HASH1',
+                                          status=Status.Error)
+            db.add(topic)
+            db.commit()
+            topic_id = topic.id
+
+        cloudflare_challenge_solver_settings = CloudflareChallengeSolverSettings(False, 10000, False, False, 0)
+        plugin = MockTrackerPlugin()
+        plugin.topic_class = self.EnqueueMockTopic
+        plugin.init(TrackerSettings(12, None, cloudflare_challenge_solver_settings))
+        plugin.execute(plugin.get_topics(None), engine_tracker)
+
+        engine_downloads.enqueue_torrent.assert_called_once_with(0, 'file.torrent', torrent, topic_id)
+        engine_downloads.add_torrent.assert_not_called()
+        # change is reported only once, when torrent is queued first time
+        self.assertEqual(downloaded_count, engine_tracker.downloaded.call_count)
+        with DBSession() as db:
+            # hash is saved by outbox only after torrent is added to client
+            topic = db.query(self.EnqueueMockTopic).filter(self.EnqueueMockTopic.id == topic_id).first()
+            self.assertEqual(topic.hash, 'HASH1')
+            self.assertIsNone(topic.last_update)
+            self.assertEqual(topic.status, Status.Ok)
+
+
 class ExecuteWithHashChangeMixinStatusTest(DbTestCase, CreateEngineMixin):
     class ExecuteMockTopic(Topic):
         __tablename__ = "mocktopic2_series"
@@ -1,10 +1,12 @@
 # coding=utf-8
+import re
 import pytest
 import six
 import json
 import requests_mock
 from monitorrent.plugins.trackers import TrackerSettings, CloudflareChallengeSolverSettings
-from monitorrent.plugins.trackers.lostfilm import LostFilmQuality, LostFilmTVTracker, LostFilmTVLoginFailedException
+from monitorrent.plugins.trackers.lostfilm import LostFilmQuality, LostFilmTVTracker, LostFilmTVLoginFailedException, \
+    LostFilmTVException
 from monitorrent.plugins.trackers.lostfilm import SpecialSeasons, LostFilmEpisode, LostFilmSeason, LostFilmShow
 from tests import use_vcr, ReadContentMixin
 from tests.plugins.trackers.tests_lostfilm.lostfilmtracker_helper import LostFilmTrackerHelper
@@ -100,6 +102,38 @@ class TestLosfFilmSeason(object):
         assert list(season) == [episode1]
         assert list(reversed(season)) == [episode1]
 
+    def test_add_episodes_success(self):
+        episode1 = LostFilmEpisode(1, 1)
+        episode2 = LostFilmEpisode(1, 2)
+        episode3 = LostFilmEpisode(1, 3)
+
+        season = LostFilmSeason(1)
+
+        season.add_episode(episode2)
+        season.add_episodes([episode3, episode1])
+
+        assert len(season) == 3
+
+        assert season[1] == episode1
+        assert season[3] == episode3
+        assert season.last_episode == episode3
+
+        assert list(season) == [episode1, episode2, episode3]
+
+    def test_add_episodes_failed(self):
+        episode1 = LostFilmEpisode(2, 1)
+        episode2 = LostFilmEpisode(2, 2)
+
+        season = LostFilmSeason(2)
+
+        season.add_episode(episode1)
+        with pytest.raises(Exception) as e:
+            season.add_episodes([episode2, episode1])
+        assert 'already' in six.text_type(e.value)
+
+        assert len(season) == 1
+        assert list(season) == [episode1]
+
 
 class TestLosfFilmShow(object):
     def test_add_season_success(self):
@@ -346,6 +380,33 @@ class TestLostFilmTracker(ReadContentMixin):
         # assert len(parsed_url['special_episodes']) == 1
         # assert parsed_url['special_episodes'][0]['season_info']) == (4, 5, 2)
 
+    @pytest.mark.parametrize("last_episode,expected", [
+        ((2, 10), {2: [11, 12]}),
+        ((1, 9), {2: list(range(1, 13)), 1: [10]}),
+        ((2, 12), {}),
+        ((3, 1), {}),
+    ])
+    def test_parse_series_since_last_episode(self, last_episode, expected):
+        with requests_mock.Mocker() as mocker:
+            mocker.get('https://www.lostfilm.tv/series/Mr_Robot/seasons',
+                       text=self.read_httpretty_content('Series_Mr_Robot.html', encoding='utf-8'))
+
+            show = self.tracker.parse_url('https://www.lostfilm.tv/series/Mr_Robot/seasons', True, last_episode)
+
+        assert show.cat == 245
+        assert {season.number: [e.number for e in season] for season in show} == expected
+
+    def test_parse_series_full_mr_robot(self):
+        with requests_mock.Mocker() as mocker:
+            mocker.get('https://www.lostfilm.tv/series/Mr_Robot/seasons',
+                       text=self.read_httpretty_content('Series_Mr_Robot.html', encoding='utf-8'))
+
+            show = self.tracker.parse_url('https://www.lostfilm.tv/series/Mr_Robot/seasons', True)
+
+        assert len(show) == 2
+        assert len(show[2]) == 12
+        assert len(show[1]) == 10
+
     @pytest.mark.parametrize("info,result", [
         (u"Unknown", SpecialSeasons.Unknown),
         (u"Дополнительные материалы", SpecialSeasons.Additional),
@@ -389,6 +450,93 @@ class TestLostFilmTracker(ReadContentMixin):
         tracker.tracker_settings = self.tracker_settings
         assert tracker.get_download_info(url, 2, 4, 9) is None
 
+    def _mock_mr_robot_download_pages(self, mocker):
+        mocker.get('https://www.lostfilm.tv/series/Mr_Robot/seasons', text='<h1>LostFilm.TV</h1>')
+        search_11 = mocker.get('https://www.lostfilm.tv/v_search.php?a=245002011',
+                               text=self.read_httpretty_content('v_search.php_c=245&s=2&e=11.html', encoding='utf-8'))
+        search_12 = mocker.get('https://www.lostfilm.tv/v_search.php?a=245002012',
+                               text=self.read_httpretty_content('v_search.php_c=245&s=2&e=12.html', encoding='utf-8'))
+        mocker.get(re.compile(r'https://retre.org/v3/(index\.php)?\?c=245&s=2&e=11&u=\d+&h=[a-z0-9]+&n=\d+'),
+                   text=self.read_httpretty_content('reTre.org_v3_c=245&s=2&e=11.html', encoding='utf-8'))
+        mocker.get(re.compile(r'https://retre.org/v3/(index\.php)?\?c=245&s=2&e=12&u=\d+&h=[a-z0-9]+&n=\d+'),
+                   text=self.read_httpretty_content('reTre.org_v3_c=245&s=2&e=12.html', encoding='utf-8'))
+        return search_11, search_12
+
+    def test_download_infos(self):
+        url = 'https://www.lostfilm.tv/series/Mr_Robot/seasons'
+        with requests_mock.Mocker() as mocker:
+            self._mock_mr_robot_download_pages(mocker)
+
+            downloads = self.tracker.get_download_infos(url, 245, [(2, 11), (2, 12)])
+
+        assert len(downloads) == 2
+        assert len(downloads[0]) > 0
+        assert all('c245s2e11' in d.download_url for d in downloads[0])
+        assert len(downloads[1]) > 0
+        assert all('c245s2e12' in d.download_url for d in downloads[1])
+        assert LostFilmQuality.HD in [d.quality for d in downloads[1]]
+
+    def test_download_infos_wrong_url(self):
+        url = 'https://www.lostfilm.tv/path/WrongShow/seasons'
+        assert self.tracker.get_download_infos(url, 245, [(2, 11)]) is None
+
+    def test_download_infos_reuse_cached_download_page_url(self):
+        url = 'https://www.lostfilm.tv/series/Mr_Robot/seasons'
+        with requests_mock.Mocker() as mocker:
+            search_11, search_12 = self._mock_mr_robot_download_pages(mocker)
+
+            first = self.tracker.get_download_infos(url, 245, [(2, 11), (2, 12)])
+            second = self.tracker.get_download_infos(url, 245, [(2, 11), (2, 12)])
+
+        assert search_11.call_count == 1
+        assert search_12.call_count == 1
+        assert [[d.download_url for d in i] for i in first] == [[d.download_url for d in i] for i in second]
+
+    def test_download_infos_expired_download_page_url(self):
+        url = 'https://www.lostfilm.tv/series/Mr_Robot/seasons'
+        self.tracker.download_page_url_ttl = -1
+        with requests_mock.Mocker() as mocker:
+            search_11, _ = self._mock_mr_robot_download_pages(mocker)
+
+            self.tracker.get_download_infos(url, 245, [(2, 11)])
+            self.tracker.get_download_infos(url, 245, [(2, 11)])
+
+        assert search_11.call_count == 2
+
+    def test_download_infos_purge_expired_download_page_urls(self):
+        url = 'https://www.lostfilm.tv/series/Mr_Robot/seasons'
+        with requests_mock.Mocker() as mocker:
+            self._mock_mr_robot_download_pages(mocker)
+
+            self.tracker.get_download_infos(url, 245, [(2, 11)])
+            self.tracker._download_page_urls[('www.lostfilm.tv', 245, 2, 11)] = ('https://expired', 0)
+            self.tracker.get_download_infos(url, 245, [(2, 12)])
+
+        assert list(self.tracker._download_page_urls.keys()) == [('www.lostfilm.tv', 245, 2, 12)]
+
+        self.tracker.clear_download_page_urls()
+
+        assert self.tracker._download_page_urls == {}
+
+    def test_get_new_episodes(self):
+        with requests_mock.Mocker() as mocker:
+            mocker.get('https://www.lostfilm.tv/rss.xml', content=self.read_httpretty_content('lostfilm_rss.xml', 'rb'))
+
+            entries = self.tracker.get_new_episodes()
+
+        assert [(e.url_name, e.cat, e.season, e.episode) for e in entries] == [
+            ('Mr_Robot', 245, 2, 12),
+            ('Mr_Robot', 245, 2, 11),
+            ('Scream', None, 2, 12),
+        ]
+
+    def test_get_new_episodes_failed(self):
+        with requests_mock.Mocker() as mocker:
+            mocker.get('https://www.lostfilm.tv/rss.xml', status_code=500, text='<error>Backend Error</error>')
+
+            with pytest.raises(LostFilmTVException):
+                self.tracker.get_new_episodes()
+
     def test_httpretty_login_success(self):
         with requests_mock.Mocker() as mocker:
             session = u'e76e71e0f32e65c2470e42016dbb785e'
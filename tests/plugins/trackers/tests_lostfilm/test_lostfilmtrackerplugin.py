@@ -10,6 +10,7 @@ from monitorrent.plugins.status import Status
 from monitorrent.plugins.trackers import LoginResult, TrackerSettings, CloudflareChallengeSolverSettings
 from monitorrent.plugins.trackers.lostfilm import LostFilmShow, LostFilmPlugin, LostFilmTVTracker, \
     LostFilmTVLoginFailedException, LostFilmTVSeries
+from monitorrent.utils.bittorrent_ex import Torrent
 from tests import use_vcr, DbTestCase, ReadContentMixin
 from tests.plugins.trackers.tests_lostfilm.lostfilmtracker_helper import LostFilmTrackerHelper
 import datetime
@@ -33,6 +34,9 @@ class EngineMock(object):
     def start(self, *args, **kwargs):
         return self
 
+    def update_progress(self, index):
+        pass
+
     def __enter__(self):
         return self
 
@@ -42,6 +46,9 @@ class EngineMock(object):
     def add_torrent(self, index, filename, torrent, old_hash, topic_settings):
         return datetime.datetime.now(pytz.utc)
 
+    def add_torrents(self, torrents):
+        return [datetime.datetime.now(pytz.utc) for _ in torrents]
+
 
 @ddt
 class TestLostFilmTrackerPlugin(ReadContentMixin, DbTestCase):
@@ -231,6 +238,8 @@ class TestLostFilmTrackerPlugin(ReadContentMixin, DbTestCase):
 
         # noinspection PyTypeChecker
         self.plugin.execute(self.plugin.get_topics(None), EngineMock())
+        # download page urls are kept during execute only
+        assert self.plugin.tracker._download_page_urls == {}
 
         topic1 = self.plugin.get_topic(1)
         topic2 = self.plugin.get_topic(2)
@@ -302,6 +311,98 @@ class TestLostFilmTrackerPlugin(ReadContentMixin, DbTestCase):
         assert topic2['season'] == 2
         assert topic2['episode'] == 13
 
+    def _mock_mr_robot_episodes(self, mocker):
+        """
+        :type mocker: requests_mock.Mocker
+        """
+        file_name = 'Hell.On.Wheels.S05E02.720p.WEB.rus.LostFilm.TV.mp4.torrent'
+        mocker.get('https://www.lostfilm.tv/series/Mr_Robot/seasons',
+                   text=self.read_httpretty_content('Series_Mr_Robot.html', encoding='utf-8'))
+        for episode in [11, 12]:
+            mocker.get('https://www.lostfilm.tv/v_search.php?a=2450020{0}'.format(episode),
+                       text=self.read_httpretty_content('v_search.php_c=245&s=2&e={0}.html'.format(episode),
+                                                        encoding='utf-8'))
+            mocker.get(re.compile(u'https://retre.org/v3/(index\.php)?\?c=245&s=2&e={0}&u=\d+&h=[a-z0-9]+&n=\d+'
+                                  .format(episode)),
+                       text=self.read_httpretty_content('reTre.org_v3_c=245&s=2&e={0}.html'.format(episode),
+                                                        encoding='utf-8'))
+        mocker.get(re.compile('https://tracktor.in/td.php(\?s=.*)?'),
+                   content=self.read_httpretty_content(file_name, 'rb'),
+                   headers={'content-disposition': 'attachment; filename=' + file_name})
+
+        self.plugin.tracker.setup(helper.real_session)
+        self.plugin._execute_login = Mock(return_value=True)
+
+        self._add_topic("https://www.lostfilm.tv/series/Mr_Robot/seasons", u'Мистер Робот / Mr. Robot',
+                        'Mr. Robot', 245, '720p', 2, 10)
+
+    @requests_mock.Mocker()
+    def test_execute_add_episodes_one_by_one_when_batch_failed(self, mocker):
+        """
+        :type mocker: requests_mock.Mocker
+        """
+        self._mock_mr_robot_episodes(mocker)
+
+        engine = EngineMock()
+        engine.add_torrents = Mock(side_effect=Exception("Connection reset"))
+        engine.add_torrent = Mock(side_effect=[datetime.datetime.now(pytz.utc), datetime.datetime.now(pytz.utc)])
+        engine.update_progress = Mock()
+
+        # noinspection PyTypeChecker
+        self.plugin.execute(self.plugin.get_topics(None), engine)
+
+        assert engine.add_torrent.call_count == 2
+        assert engine.update_progress.call_count > 0
+
+        topic1 = self.plugin.get_topic(1)
+        assert topic1['season'] == 2
+        assert topic1['episode'] == 12
+
+    @requests_mock.Mocker()
+    def test_execute_save_downloaded_episodes_on_error(self, mocker):
+        """
+        :type mocker: requests_mock.Mocker
+        """
+        self._mock_mr_robot_episodes(mocker)
+
+        with patch('monitorrent.plugins.trackers.lostfilm.Torrent',
+                   side_effect=[Torrent(self.read_httpretty_content(
+                       'Hell.On.Wheels.S05E02.720p.WEB.rus.LostFilm.TV.mp4.torrent', 'rb')), Exception("Broken")]):
+            with self.assertRaises(Exception):
+                # noinspection PyTypeChecker
+                self.plugin.execute(self.plugin.get_topics(None), EngineMock())
+
+        topic1 = self.plugin.get_topic(1)
+        assert topic1['season'] == 2
+        assert topic1['episode'] == 11
+
+    @requests_mock.Mocker()
+    def test_execute_keeps_original_error_when_add_failed(self, mocker):
+        """
+        :type mocker: requests_mock.Mocker
+        """
+        self._mock_mr_robot_episodes(mocker)
+
+        engine = EngineMock()
+        engine.add_torrents = Mock(side_effect=Exception("Connection reset"))
+        engine.add_torrent = Mock(side_effect=Exception("Connection reset"))
+        engine.failed = Mock()
+
+        with patch('monitorrent.plugins.trackers.lostfilm.Torrent',
+                   side_effect=[Torrent(self.read_httpretty_content(
+                       'Hell.On.Wheels.S05E02.720p.WEB.rus.LostFilm.TV.mp4.torrent', 'rb')), Exception("Broken")]):
+            with self.assertRaises(Exception) as context:
+                # noinspection PyTypeChecker
+                self.plugin.execute(self.plugin.get_topics(None), engine)
+
+        assert str(context.exception) == "Broken"
+        engine.failed.assert_called_once()
+        assert "Connection reset" in engine.failed.call_args[0][0]
+
+        topic1 = self.plugin.get_topic(1)
+        assert topic1['season'] == 2
+        assert topic1['episode'] == 10
+
     @requests_mock.Mocker()
     def test_execute_nothing_changed(self, mocker):
         """
@@ -472,6 +573,121 @@ class TestLostFilmTrackerPlugin(ReadContentMixin, DbTestCase):
         assert topic1['season'] == 2
         assert topic1['episode'] == 12
 
+    @requests_mock.Mocker()
+    def test_execute_check_only_series_from_feed(self, mocker):
+        """
+        :type mocker: requests_mock.Mocker
+        """
+        file_name = 'Hell.On.Wheels.S05E02.720p.WEB.rus.LostFilm.TV.mp4.torrent'
+        torrent_body = self.read_httpretty_content(file_name, 'rb')
+
+        mocker.get('https://www.lostfilm.tv/rss.xml',
+                   content=self.read_httpretty_content('lostfilm_rss.xml', 'rb'))
+        mr_robot = mocker.get('https://www.lostfilm.tv/series/Mr_Robot/seasons',
+                              text=self.read_httpretty_content('Series_Mr_Robot.html', encoding='utf-8'))
+        scream = mocker.get('https://www.lostfilm.tv/series/Scream/seasons',
+                            text=self.read_httpretty_content('Series_Scream.html', encoding='utf-8'))
+        mocker.get('https://www.lostfilm.tv/v_search.php?a=245002012',
+                   text=self.read_httpretty_content('v_search.php_c=245&s=2&e=12.html', encoding='utf-8'))
+        mocker.get(re.compile(u'https://retre.org/v3/(index\.php)?\?c=245&s=2&e=12&u=\d+&h=[a-z0-9]+&n=\d+'),
+                   text=self.read_httpretty_content('reTre.org_v3_c=245&s=2&e=12.html', encoding='utf-8'))
+        mocker.get(re.compile('https://tracktor.in/td.php(\?s=.*)?'), content=torrent_body,
+                   headers={'content-disposition': 'attachment; filename=' + file_name})
+
+        self.plugin.tracker.setup(helper.real_session)
+        self.plugin._execute_login = Mock(return_value=True)
+        self.plugin._last_full_sweep = datetime.datetime.now()
+
+        self._add_topic("https://www.lostfilm.tv/series/Mr_Robot/seasons", u'Мистер Робот / Mr. Robot',
+                        'Mr. Robot', 245, '720p', 2, 11)
+        self._add_topic("https://www.lostfilm.tv/series/Scream/seasons", u'Крик / Scream',
+                        'Scream', 251, '720p', 2, 13)
+
+        # noinspection PyTypeChecker
+        self.plugin.execute(self.plugin.get_topics(None), EngineMock())
+
+        assert mr_robot.call_count > 0
+        assert scream.call_count == 0
+
+        topic1 = self.plugin.get_topic(1)
+        assert topic1['season'] == 2
+        assert topic1['episode'] == 12
+
+    @requests_mock.Mocker()
+    def test_execute_series_by_id_ignores_feed(self, mocker):
+        """
+        :type mocker: requests_mock.Mocker
+        """
+        feed = mocker.get('https://www.lostfilm.tv/rss.xml',
+                          content=self.read_httpretty_content('lostfilm_rss.xml', 'rb'))
+        scream = mocker.get('https://www.lostfilm.tv/series/Scream/seasons',
+                            text=self.read_httpretty_content('Series_Scream.html', encoding='utf-8'))
+
+        self.plugin.tracker.setup(helper.real_session)
+        self.plugin._execute_login = Mock(return_value=True)
+        last_full_sweep = datetime.datetime.now()
+        self.plugin._last_full_sweep = last_full_sweep
+
+        self._add_topic("https://www.lostfilm.tv/series/Scream/seasons", u'Крик / Scream',
+                        'Scream', 251, '720p', 2, 13)
+
+        # noinspection PyTypeChecker
+        self.plugin.execute(self.plugin.get_topics([1]), EngineMock())
+
+        assert feed.call_count == 0
+        assert scream.call_count > 0
+        # check of one series doesn't replace full sweep
+        assert self.plugin._last_full_sweep == last_full_sweep
+
+    @requests_mock.Mocker()
+    def test_execute_check_all_series_on_full_sweep(self, mocker):
+        """
+        :type mocker: requests_mock.Mocker
+        """
+        feed = mocker.get('https://www.lostfilm.tv/rss.xml',
+                          content=self.read_httpretty_content('lostfilm_rss.xml', 'rb'))
+        mr_robot = mocker.get('https://www.lostfilm.tv/series/Mr_Robot/seasons',
+                              text=self.read_httpretty_content('Series_Mr_Robot.html', encoding='utf-8'))
+        scream = mocker.get('https://www.lostfilm.tv/series/Scream/seasons',
+                            text=self.read_httpretty_content('Series_Scream.html', encoding='utf-8'))
+
+        self.plugin.tracker.setup(helper.real_session)
+        self.plugin._execute_login = Mock(return_value=True)
+        self.plugin._last_full_sweep = datetime.datetime.now() - self.plugin.full_sweep_interval
+
+        self._add_topic("https://www.lostfilm.tv/series/Mr_Robot/seasons", u'Мистер Робот / Mr. Robot',
+                        'Mr. Robot', 245, '720p', 2, 12)
+        self._add_topic("https://www.lostfilm.tv/series/Scream/seasons", u'Крик / Scream',
+                        'Scream', 251, '720p', 2, 13)
+
+        # noinspection PyTypeChecker
+        self.plugin.execute(self.plugin.get_topics(None), EngineMock())
+
+        assert feed.call_count == 0
+        assert mr_robot.call_count > 0
+        assert scream.call_count > 0
+
+    @requests_mock.Mocker()
+    def test_execute_check_all_series_when_feed_failed(self, mocker):
+        """
+        :type mocker: requests_mock.Mocker
+        """
+        mocker.get('https://www.lostfilm.tv/rss.xml', status_code=500, text='<error>Backend Error</error>')
+        mr_robot = mocker.get('https://www.lostfilm.tv/series/Mr_Robot/seasons',
+                              text=self.read_httpretty_content('Series_Mr_Robot.html', encoding='utf-8'))
+
+        self.plugin.tracker.setup(helper.real_session)
+        self.plugin._execute_login = Mock(return_value=True)
+        self.plugin._last_full_sweep = datetime.datetime.now()
+
+        self._add_topic("https://www.lostfilm.tv/series/Mr_Robot/seasons", u'Мистер Робот / Mr. Robot',
+                        'Mr. Robot', 245, '720p', 2, 12)
+
+        # noinspection PyTypeChecker
+        self.plugin.execute(self.plugin.get_topics(None), EngineMock())
+
+        assert mr_robot.call_count > 0
+
     def test_execute_login_failed(self):
         execute_login_mock = Mock(return_value=False)
         self.plugin._execute_login = execute_login_mock
@@ -4,8 +4,9 @@ import falcon
 from mock import MagicMock
 from ddt import ddt, data
 from tests import RestTestBase
-from monitorrent.rest.clients import ClientCollection, Client, ClientCheck, DefaultClient, ClientDefault
-from monitorrent.plugin_managers import ClientsManager
+from monitorrent.rest.clients import ClientCollection, Client, ClientCheck, DefaultClient, ClientDefault, \
+    ClientsBalancing, ClientsFailover, ClientsMetrics, ClientMetricsResource
+from monitorrent.plugin_managers import ClientsManager, BalancingPolicy
 
 
 @ddt
@@ -249,3 +250,125 @@ class ClientDefaultTest(RestTestBase):
 
         self.simulate_request('/api/clients/{0}/default'.format('random.org'), method='PUT')
         self.assertEqual(self.srmock.status, falcon.HTTP_NOT_FOUND)
+
+
+@ddt
+class ClientsBalancingTest(RestTestBase):
+    def setUp(self):
+        super(ClientsBalancingTest, self).setUp()
+        self.clients_manager = ClientsManager({'client1': ClientCollectionTest.TestClient(),
+                                               'client2': ClientCollectionTest.TestClient()})
+
+        clients_balancing = ClientsBalancing(self.clients_manager)
+        clients_balancing.__no_auth__ = True
+        self.api.add_route('/api/clients_balancing', clients_balancing)
+
+    def test_set_and_get(self):
+        balancing = {'policy': BalancingPolicy.LEAST_TORRENTS, 'clients': ['client1', 'client2'],
+                     'trackers': {'lostfilm.tv': 'client2'}, 'download_dirs': {}}
+        self.simulate_request('/api/clients_balancing', method='PUT', body=json.dumps(balancing))
+        self.assertEqual(self.srmock.status, falcon.HTTP_NO_CONTENT)
+
+        body = self.simulate_request('/api/clients_balancing', decode="utf-8")
+        self.assertEqual(self.srmock.status, falcon.HTTP_OK)
+        self.assertEqual(balancing, json.loads(body))
+
+    def test_disable(self):
+        self.clients_manager.set_balancing({'policy': BalancingPolicy.ROUND_ROBIN, 'clients': ['client1']})
+
+        self.simulate_request('/api/clients_balancing', method='PUT', body=json.dumps(None))
+        self.assertEqual(self.srmock.status, falcon.HTTP_NO_CONTENT)
+
+        self.assertIsNone(self.clients_manager.get_balancing())
+
+    def test_set_unknown_client(self):
+        balancing = {'policy': BalancingPolicy.ROUND_ROBIN, 'clients': ['client1', 'random']}
+        self.simulate_request('/api/clients_balancing', method='PUT', body=json.dumps(balancing))
+        self.assertEqual(self.srmock.status, falcon.HTTP_NOT_FOUND)
+
+    @data([], 'round_robin', 1)
+    def test_set_not_object(self, balancing):
+        self.simulate_request('/api/clients_balancing', method='PUT', body=json.dumps(balancing))
+        self.assertEqual(self.srmock.status, falcon.HTTP_BAD_REQUEST)
+
+    def test_set_unknown_policy(self):
+        balancing = {'policy': 'random', 'clients': ['client1']}
+        self.simulate_request('/api/clients_balancing', method='PUT', body=json.dumps(balancing))
+        self.assertEqual(self.srmock.status, falcon.HTTP_BAD_REQUEST)
+
+
+@ddt
+class ClientsFailoverTest(RestTestBase):
+    def setUp(self):
+        super(ClientsFailoverTest, self).setUp()
+        self.clients_manager = ClientsManager({'client1': ClientCollectionTest.TestClient(),
+                                               'client2': ClientCollectionTest.TestClient()})
+
+        clients_failover = ClientsFailover(self.clients_manager)
+        clients_failover.__no_auth__ = True
+        self.api.add_route('/api/clients_failover', clients_failover)
+
+    def test_set_and_get(self):
+        failover = {'client': 'client2', 'error_rate': 0.3, 'min_calls': 10}
+        self.simulate_request('/api/clients_failover', method='PUT', body=json.dumps(failover))
+        self.assertEqual(self.srmock.status, falcon.HTTP_NO_CONTENT)
+
+        body = self.simulate_request('/api/clients_failover', decode="utf-8")
+        self.assertEqual(self.srmock.status, falcon.HTTP_OK)
+        self.assertEqual(failover, json.loads(body))
+
+    def test_set_unknown_client(self):
+        self.simulate_request('/api/clients_failover', method='PUT', body=json.dumps({'client': 'random'}))
+        self.assertEqual(self.srmock.status, falcon.HTTP_NOT_FOUND)
+
+    @data([], 'client2', 1)
+    def test_set_not_object(self, failover):
+        self.simulate_request('/api/clients_failover', method='PUT', body=json.dumps(failover))
+        self.assertEqual(self.srmock.status, falcon.HTTP_BAD_REQUEST)
+
+    def test_set_default_client(self):
+        self.clients_manager.set_default('client1')
+        self.simulate_request('/api/clients_failover', method='PUT', body=json.dumps({'client': 'client1'}))
+        self.assertEqual(self.srmock.status, falcon.HTTP_BAD_REQUEST)
+
+    def test_set_wrong_error_rate(self):
+        failover = {'client': 'client2', 'error_rate': 'high'}
+        self.simulate_request('/api/clients_failover', method='PUT', body=json.dumps(failover))
+        self.assertEqual(self.srmock.status, falcon.HTTP_BAD_REQUEST)
+
+
+class ClientsMetricsTest(RestTestBase):
+    def setUp(self):
+        super(ClientsMetricsTest, self).setUp()
+        self.clients_manager = ClientsManager({'client1': ClientCollectionTest.TestClient(),
+                                               'client2': ClientCollectionTest.TestClient()})
+        self.clients_manager.metrics.record('client1', 'find_torrent', 0.5, 'Timeout')
+
+        clients_metrics = ClientsMetrics(self.clients_manager)
+        clients_metrics.__no_auth__ = True
+        self.api.add_route('/api/clients_metrics', clients_metrics)
+        client_metrics = ClientMetricsResource(self.clients_manager)
+        client_metrics.__no_auth__ = True
+        self.api.add_route('/api/clients/{client}/metrics', client_metrics)
+
+    def test_get_all(self):
+        body = self.simulate_request('/api/clients_metrics', decode="utf-8")
+        self.assertEqual(self.srmock.status, falcon.HTTP_OK)
+
+        result = json.loads(body)
+        self.assertEqual({'client1', 'client2'}, set(result))
+        self.assertEqual(1, result['client1']['errors'])
+        self.assertEqual(0, result['client2']['calls'])
+
+    def test_get(self):
+        body = self.simulate_request('/api/clients/client1/metrics', decode="utf-8")
+        self.assertEqual(self.srmock.status, falcon.HTTP_OK)
+
+        result = json.loads(body)
+        self.assertEqual(1, result['calls'])
+        self.assertEqual(0.5, result['max_latency'])
+        self.assertEqual('Timeout', result['last_error']['error'])
+
+    def test_get_unknown_client(self):
+        self.simulate_request('/api/clients/random/metrics')
+        self.assertEqual(self.srmock.status, falcon.HTTP_NOT_FOUND)
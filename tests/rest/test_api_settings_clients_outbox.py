@@ -0,0 +1,50 @@
+import json
+import falcon
+from mock import MagicMock, PropertyMock, patch
+from ddt import ddt, data
+from tests import RestTestBase
+from monitorrent.rest.settings_clients_outbox import SettingsClientsOutbox
+from monitorrent.settings_manager import SettingsManager
+
+
+@ddt
+class SettingsClientsOutboxTest(RestTestBase):
+    @data(True, False)
+    def test_get(self, value):
+        outbox = MagicMock()
+        outbox.get_items.return_value = [{'id': 1, 'topic_id': 2, 'attempts': 3}]
+        with patch.object(SettingsManager, 'clients_outbox_enabled', new_callable=PropertyMock) as enabled_mock:
+            enabled_mock.return_value = value
+            self.api.add_route('/api/settings/clients-outbox', SettingsClientsOutbox(SettingsManager(), outbox))
+
+            body = self.simulate_request("/api/settings/clients-outbox", decode='utf-8')
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_OK)
+        self.assertTrue('application/json' in self.srmock.headers_dict['Content-Type'])
+
+        result = json.loads(body)
+
+        self.assertEqual(result, {'is_enabled': value, 'items': [{'id': 1, 'topic_id': 2, 'attempts': 3}]})
+
+    @data(True, False)
+    def test_set(self, value):
+        with patch.object(SettingsManager, 'clients_outbox_enabled', new_callable=PropertyMock) as enabled_mock:
+            self.api.add_route('/api/settings/clients-outbox', SettingsClientsOutbox(SettingsManager(), MagicMock()))
+
+            request = {'is_enabled': value}
+            self.simulate_request("/api/settings/clients-outbox", method="PUT", body=json.dumps(request))
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_NO_CONTENT)
+
+        enabled_mock.assert_called_once_with(value)
+
+    @data({'is_enabled': 'random_text'},
+          {'is_enabled': 'True'},
+          {'wrong_param': 'Value'},
+          None)
+    def test_bad_request(self, body):
+        self.api.add_route('/api/settings/clients-outbox', SettingsClientsOutbox(SettingsManager(), MagicMock()))
+
+        self.simulate_request("/api/settings/clients-outbox", method="PUT", body=json.dumps(body) if body else None)
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_BAD_REQUEST)
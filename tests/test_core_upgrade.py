@@ -1,5 +1,5 @@
 from mock import Mock, patch, call
-from sqlalchemy import Column, String, Integer, Table, MetaData
+from sqlalchemy import Column, String, Integer, Table, MetaData, DateTime, inspect
 from monitorrent.db import DBSession
 from monitorrent.upgrade_manager import core_upgrade, upgrade, _operation_factory
 from tests import UpgradeTestCase
@@ -42,6 +42,25 @@ class CoreUpgradeTest(UpgradeTestCase):
 
         self._upgrade()
 
+    def test_execute_log_index_core_upgrade(self):
+        m = MetaData()
+        Table('execute_log', m,
+              Column('id', Integer, primary_key=True),
+              Column('execute_id', Integer),
+              Column('time', DateTime, nullable=False),
+              Column('message', String, nullable=False),
+              Column('level', String, nullable=False))
+
+        m.create_all(self.engine)
+
+        self._upgrade()
+        # second upgrade doesn't create existing index again
+        self._upgrade()
+
+        indexes = inspect(self.engine).get_indexes('execute_log')
+        self.assertEqual([('ix_execute_log_execute_id_level', ['execute_id', 'level'])],
+                         [(index['name'], index['column_names']) for index in indexes])
+
 
 class UpgradeTest(UpgradeTestCase):
     def upgrade_func(self, engine, operation_factory):
@@ -1,8 +1,13 @@
+import os
+import shutil
+import tempfile
 from mock import Mock
 from sqlalchemy import MetaData, Table, Column, String, Integer
-from monitorrent.db import DBSession, MigrationContext, MonitorrentOperations, UTCDateTime
+from monitorrent.db import DBSession, DBReadSession, MigrationContext, MonitorrentOperations, UTCDateTime, \
+    init_db_engine, create_db, close_db, get_engine, DEFAULT_STORAGE_PROFILE
+from monitorrent.settings_manager import Settings
 from monitorrent.upgrade_manager import call_ugprades
-from tests import DbTestCase
+from tests import TestCase, DbTestCase
 
 
 class DbTest(DbTestCase):
@@ -43,3 +48,69 @@ class DbTest(DbTestCase):
                                                 Column('new_column', Integer))
 
             db.rollback()
+
+
+class StorageProfileTest(TestCase):
+    def setUp(self):
+        super(StorageProfileTest, self).setUp()
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'monitorrent.db')
+
+    def tearDown(self):
+        close_db()
+        shutil.rmtree(self.temp_dir)
+        super(StorageProfileTest, self).tearDown()
+
+    @staticmethod
+    def _pragma(db, name):
+        return db.execute('PRAGMA {0}'.format(name)).scalar()
+
+    def test_wal_profile(self):
+        init_db_engine('sqlite:///' + self.db_path, storage_profile='wal')
+        create_db()
+
+        with DBSession() as db:
+            self.assertEqual('wal', self._pragma(db, 'journal_mode'))
+            # NORMAL
+            self.assertEqual(1, self._pragma(db, 'synchronous'))
+            self.assertEqual(5000, self._pragma(db, 'busy_timeout'))
+            self.assertEqual(-16000, self._pragma(db, 'cache_size'))
+            db.add(Settings(name='name', value='value'))
+
+        with DBReadSession() as db:
+            self.assertIsNot(get_engine(), db.bind)
+            self.assertEqual(1, self._pragma(db, 'query_only'))
+            self.assertEqual('value', db.query(Settings.value).filter(Settings.name == 'name').scalar())
+
+    def test_readers_are_not_blocked_by_writer(self):
+        init_db_engine('sqlite:///' + self.db_path, storage_profile='wal')
+        create_db()
+
+        with DBSession() as db:
+            db.add(Settings(name='name', value='value'))
+            db.flush()
+
+            # uncommitted write transaction doesn't block reader and isn't visible to it
+            with DBReadSession() as read_db:
+                self.assertEqual(0, read_db.query(Settings).count())
+
+    def test_legacy_profile(self):
+        init_db_engine('sqlite:///' + self.db_path, storage_profile='legacy')
+        create_db()
+
+        with DBSession() as db:
+            self.assertEqual('delete', self._pragma(db, 'journal_mode'))
+        self.assertIs(DBSession(), DBReadSession())
+
+    def test_default_profile(self):
+        # existing databases can be on network file systems, so WAL is opt-in
+        init_db_engine('sqlite:///' + self.db_path, storage_profile=DEFAULT_STORAGE_PROFILE)
+        create_db()
+
+        with DBSession() as db:
+            self.assertEqual('delete', self._pragma(db, 'journal_mode'))
+
+    def test_memory_database_shares_readers_session(self):
+        init_db_engine('sqlite://', storage_profile='wal')
+
+        self.assertIs(DBSession(), DBReadSession())
@@ -1,6 +1,6 @@
 import sys
 from threading import Event
-from ddt import ddt, data
+from ddt import ddt, data, unpack
 from time import time, sleep
 from datetime import datetime, timedelta
 from mock import Mock, MagicMock, PropertyMock, patch, call, ANY
@@ -8,7 +8,7 @@ import pytz
 from monitorrent.utils.bittorrent_ex import Torrent
 from tests import TestCase, DbTestCase, DBSession
 from monitorrent.engine import Engine, Logger, EngineRunner, DBEngineRunner, DbLoggerWrapper, Execute, ExecuteLog,\
-    ExecuteLogManager, ExecuteSettings
+    ExecuteLogManager, ExecuteSettings, EnqueueResult
 from monitorrent.plugins import Topic
 from monitorrent.plugin_managers import ClientsManager, TrackersManager, NotifierManager
 from monitorrent.plugins.trackers import TrackerSettings, CloudflareChallengeSolverSettings
@@ -93,6 +93,7 @@ class EngineAddTorrentTest(EngineTest):
         result = self.engine.add_torrent('movie.torrent', self.TORRENT_MOCK, self.HASH2, None)
 
         self.assertEqual(result, self.FIND_TORRENTS3['date_added'])
+        self.clients_manager.add_torrent.assert_called_once_with(self.TORRENT_MOCK, None)
 
     def test_engine_add_torrent_new_added_not_existing_old(self):
         self.clients_manager.find_torrent = Mock(side_effect=self.find_torrents_side_effect)
@@ -124,6 +125,70 @@ class EngineAddTorrentTest(EngineTest):
             self.engine.add_torrent('movie.torrent', self.TORRENT_MOCK, self.HASH2, None)
 
 
+    def test_engine_add_torrents(self):
+        torrent_existing = self.TorrentMock('content1', self.HASH1)
+        torrent_updated = self.TorrentMock('content2', self.NEW_HASH)
+        torrent_failed = self.TorrentMock('content3', 'hash4')
+        date_added = datetime(2015, 8, 27, 10, 10, 10)
+        client = Mock()
+        client.find_torrents = Mock(side_effect=[
+            {self.HASH1: self.FIND_TORRENTS1},
+            {self.HASH2: self.FIND_TORRENTS2},
+            {self.NEW_HASH: {'name': 'new', 'date_added': date_added}},
+        ])
+        client.add_torrents = Mock(return_value=[True, False])
+        client.remove_torrents = Mock(return_value=True)
+        self.engine.clients_manager = ClientsManager({'mock': client})
+        self.engine.info = Mock()
+        self.engine.failed = Mock()
+
+        result = self.engine.add_torrents([('1.torrent', torrent_existing, None, None),
+                                           ('2.torrent', torrent_updated, self.HASH2, None),
+                                           ('3.torrent', torrent_failed, None, None)])
+
+        self.assertEqual(result, [self.FIND_TORRENTS1['date_added'], date_added, None])
+        client.add_torrents.assert_called_once_with([(torrent_updated, None), (torrent_failed, None)])
+        client.remove_torrents.assert_called_once_with([self.HASH2])
+        client.find_torrent.assert_not_called()
+        client.add_torrent.assert_not_called()
+        self.engine.failed.assert_not_called()
+        self.assertEqual(self.engine.info.call_count, 3)
+
+    def test_engine_add_torrents_without_bulk_support(self):
+        class Client(object):
+            def find_torrent(self, torrent_hash):
+                return self.added.get(torrent_hash, False)
+
+            def add_torrent(self, torrent, topic_settings):
+                self.added[torrent.info_hash] = {'name': 'name', 'date_added': datetime(2015, 8, 27)}
+                return True
+
+            added = {}
+
+        self.engine.clients_manager = ClientsManager({'mock': Client()})
+        torrents = [self.TorrentMock('content1', self.HASH1), self.TorrentMock('content2', self.HASH2)]
+
+        result = self.engine.add_torrents([('1.torrent', torrents[0], None, None),
+                                           ('2.torrent', torrents[1], None, None)])
+
+        self.assertEqual(result, [datetime(2015, 8, 27), datetime(2015, 8, 27)])
+
+    def test_engine_enqueue_torrent_without_outbox(self):
+        self.assertEqual(EnqueueResult.DISABLED, self.engine.enqueue_torrent('movie.torrent', self.TORRENT_MOCK, 1))
+
+    @data((True, EnqueueResult.QUEUED), (False, EnqueueResult.ALREADY_QUEUED))
+    @unpack
+    def test_engine_enqueue_torrent(self, enqueued, expected):
+        outbox = Mock()
+        outbox.enqueue.return_value = enqueued
+        self.engine.outbox = outbox
+
+        self.assertEqual(expected, self.engine.enqueue_torrent('movie.torrent', self.TORRENT_MOCK, 1))
+
+        outbox.enqueue.assert_called_once_with(1, 'movie.torrent', self.TORRENT_MOCK)
+        self.log_info_mock.assert_called_once_with(ANY)
+
+
 class WithEngineRunnerTest(object):
     def create_trackers_manager(self):
         execute_mock = Mock()
@@ -1267,3 +1332,81 @@ class ExecuteLogManagerTest(DbTestCase):
 
         self.assertEqual(details[0]['level'], 'info')
         self.assertEqual(details[0]['message'], message11 + ' 1')
+
+    def _get_written_messages(self):
+        with DBSession() as db:
+            return [message for message, in db.query(ExecuteLog.message).order_by(ExecuteLog.id)]
+
+    def test_log_entries_are_written_in_batches(self):
+        # noinspection PyTypeChecker
+        log_manager = ExecuteLogManager()
+        log_manager.flush_size = 3
+        log_manager.flush_interval = 60
+
+        log_manager.started(datetime.now(pytz.utc))
+        log_manager.log_entry(u'Message 1', 'info')
+        log_manager.log_entry(u'Message 2', 'info')
+
+        self.assertEqual([], self._get_written_messages())
+        # not written entries are available for live view
+        result = log_manager.get_current_execute_log_details()
+        self.assertEqual([u'Message 1', u'Message 2'], [e['message'] for e in result])
+
+        log_manager.log_entry(u'Message 3', 'info')
+        log_manager.log_entry(u'Message 4', 'info')
+
+        self.assertEqual([u'Message 1', u'Message 2', u'Message 3'], self._get_written_messages())
+        result = log_manager.get_current_execute_log_details(after=result[1]['id'])
+        self.assertEqual([u'Message 3', u'Message 4'], [e['message'] for e in result])
+
+        log_manager.finished(datetime.now(pytz.utc), None)
+
+        self.assertEqual([u'Message 1', u'Message 2', u'Message 3', u'Message 4'], self._get_written_messages())
+
+    def test_log_entries_are_written_by_timer(self):
+        # noinspection PyTypeChecker
+        log_manager = ExecuteLogManager()
+        log_manager.flush_interval = 0.01
+
+        log_manager.started(datetime.now(pytz.utc))
+        log_manager.log_entry(u'Message 1', 'info')
+
+        # tests share one sqlite connection, so wait for flush before reading database
+        for _ in range(100):
+            if len(log_manager._pending) == 0 and len(log_manager._writing) == 0:
+                break
+            sleep(0.01)
+
+        self.assertEqual([u'Message 1'], self._get_written_messages())
+        log_manager.finished(datetime.now(pytz.utc), None)
+
+    def test_log_entries_are_kept_when_write_failed(self):
+        # noinspection PyTypeChecker
+        log_manager = ExecuteLogManager()
+        log_manager.flush_interval = 60
+
+        log_manager.started(datetime.now(pytz.utc))
+        log_manager.log_entry(u'Message 1', 'info')
+        log_manager.log_entry(u'Message 2', 'info')
+
+        with patch('monitorrent.engine.DBSession', side_effect=Exception('database is locked')):
+            log_manager.flush()
+
+        log_manager.log_entry(u'Message 3', 'info')
+        result = log_manager.get_current_execute_log_details()
+        self.assertEqual([u'Message 1', u'Message 2', u'Message 3'], [e['message'] for e in result])
+
+        log_manager.finished(datetime.now(pytz.utc), None)
+
+        self.assertEqual([u'Message 1', u'Message 2', u'Message 3'], self._get_written_messages())
+        with DBSession() as db:
+            ids = [log_id for log_id, in db.query(ExecuteLog.id).order_by(ExecuteLog.id)]
+        self.assertEqual([e['id'] for e in result], ids)
+
+    def test_log_entry_before_started(self):
+        # noinspection PyTypeChecker
+        log_manager = ExecuteLogManager()
+
+        with self.assertRaises(Exception) as e:
+            log_manager._log_entry(u'Message 1', 'info')
+        self.assertEqual('Execute is not started', str(e.exception))
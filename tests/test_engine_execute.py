@@ -349,8 +349,7 @@ class MockClient(object):
             return {'date_added': datetime.datetime.utcnow(), 'name': 'file'}
         return None
 
-    def add_torrent(self, torrent_content, torrent_settings):
-        torrent = Torrent(torrent_content)
+    def add_torrent(self, torrent, torrent_settings):
         self.added_hash = torrent.info_hash
         return True
 
@@ -410,6 +409,30 @@ class EngineExecuteFullTest(EngineTest):
         self.engine.failed.assert_not_called()
         self.engine.downloaded.assert_called_once_with(u'<b>Show / Шоу</b> was changed', ANY)
 
+    def test_execute_finds_torrents_in_client_snapshot(self):
+        topics = [Topic(id=1, url='http://mocktracker.com/topic/id123', display_name=u'Show / Шоу')]
+
+        tracker = MockTracker()
+        tracker.get_topics = Mock(return_value=topics)
+
+        self.trackers_manager.trackers = {'mocktracker.com': tracker}
+
+        client = self.clients_manager.get_client('mock')
+        client.get_torrents = Mock(return_value={})
+        client.find_torrent = Mock(side_effect=client.find_torrent)
+        client.add_torrent = Mock(side_effect=client.add_torrent)
+        self.engine.failed = Mock(side_effect=self.engine.failed)
+
+        self.engine.execute(None)
+
+        self.engine.failed.assert_not_called()
+        client.get_torrents.assert_called_once_with()
+        client.add_torrent.assert_called_once_with(tracker.torrent, ANY)
+        client.find_torrent.assert_not_called()
+        # snapshot is used only during execute
+        self.assertTrue(self.clients_manager.find_torrent(tracker.torrent.info_hash))
+        client.find_torrent.assert_called_once_with(tracker.torrent.info_hash)
+
     def test_exception_during_engine_execute_should_be_handled_and_logged(self):
         topics = [Topic(id=1, url='http://mocktracker.com/topic/id123', display_name=u'Show / Шоу')]
 
@@ -0,0 +1,187 @@
+from datetime import datetime, timedelta
+from threading import Event
+
+import pytz
+from mock import Mock
+from sqlalchemy import Column, Integer, String, ForeignKey
+
+from monitorrent.db import DBSession
+from monitorrent.outbox import ClientsOutbox, ClientOutboxItem
+from monitorrent.plugins import Topic
+from monitorrent.plugins.status import Status
+from monitorrent.utils.bittorrent_ex import Torrent
+from tests import DbTestCase, ReadContentMixin
+
+
+class OutboxMockTopic(Topic):
+    __tablename__ = "outbox_mocktopic"
+
+    id = Column(Integer, ForeignKey('topics.id'), primary_key=True)
+    hash = Column(String, nullable=True)
+
+    __mapper_args__ = {
+        'polymorphic_identity': 'outbox.mocktracker.com'
+    }
+
+
+class OtherTorrent(object):
+    def __init__(self, raw_content, info_hash):
+        self.raw_content = raw_content
+        self.info_hash = info_hash
+
+
+class ClientsOutboxTest(DbTestCase, ReadContentMixin):
+    DATE_ADDED = datetime(2017, 5, 13, 10, 20, 30, tzinfo=pytz.utc)
+
+    def setUp(self):
+        super(ClientsOutboxTest, self).setUp()
+        Topic.metadata.create_all(self.engine)
+
+        self.torrent = Torrent(self.read_httpretty_content(
+            'Hell.On.Wheels.S05E02.720p.WEB.rus.LostFilm.TV.mp4.torrent', 'rb'))
+        with DBSession() as db:
+            topic = OutboxMockTopic(display_name='Hell on Wheels', url='http://outbox.mocktracker.com/1',
+                                    hash='OLD_HASH')
+            db.add(topic)
+            db.commit()
+            self.topic_id = topic.id
+
+        self.added = {}
+        self.clients_manager = Mock()
+        self.clients_manager.find_torrent.side_effect = lambda torrent_hash: self.added.get(torrent_hash, False)
+        self.clients_manager.add_torrent.side_effect = self.add_torrent
+        self.outbox = ClientsOutbox(self.clients_manager)
+
+    def add_torrent(self, torrent, topic_settings):
+        self.added[torrent.info_hash] = {'name': 'name', 'date_added': self.DATE_ADDED}
+        return True
+
+    def get_topic(self):
+        with DBSession() as db:
+            topic = db.query(OutboxMockTopic).filter(OutboxMockTopic.id == self.topic_id).first()
+            db.expunge(topic)
+            return topic
+
+    def test_enqueue(self):
+        self.assertTrue(self.outbox.enqueue(self.topic_id, 'file.torrent', self.torrent))
+        self.assertFalse(self.outbox.enqueue(self.topic_id, 'file.torrent', self.torrent))
+
+        items = self.outbox.get_items()
+        self.assertEqual(len(items), 1)
+        self.assertEqual(items[0]['topic_id'], self.topic_id)
+        self.assertEqual(items[0]['info_hash'], self.torrent.info_hash)
+        self.assertEqual(items[0]['attempts'], 0)
+
+    def test_process(self):
+        self.outbox.enqueue(self.topic_id, 'file.torrent', self.torrent)
+
+        self.assertIsNone(self.outbox.process())
+
+        self.assertEqual(self.outbox.get_items(), [])
+        self.clients_manager.add_torrent.assert_called_once()
+        topic = self.get_topic()
+        self.assertEqual(topic.hash, self.torrent.info_hash)
+        self.assertEqual(topic.last_update, self.DATE_ADDED)
+        self.assertEqual(self.clients_manager.add_torrent.call_args[0][1].topic_id, self.topic_id)
+
+    def test_process_removes_old_torrent(self):
+        self.added['OLD_HASH'] = {'name': 'old', 'date_added': self.DATE_ADDED}
+        self.outbox.enqueue(self.topic_id, 'file.torrent', self.torrent)
+
+        self.outbox.process()
+
+        self.clients_manager.remove_torrent.assert_called_once_with('OLD_HASH')
+
+    def test_process_failed(self):
+        self.clients_manager.add_torrent.side_effect = None
+        self.clients_manager.add_torrent.return_value = False
+        self.outbox.enqueue(self.topic_id, 'file.torrent', self.torrent)
+
+        timeout = self.outbox.process()
+
+        self.assertTrue(0 < timeout <= ClientsOutbox.retry_interval)
+        items = self.outbox.get_items()
+        self.assertEqual(len(items), 1)
+        self.assertEqual(items[0]['attempts'], 1)
+        self.assertIsNotNone(items[0]['last_error'])
+        self.assertEqual(self.get_topic().hash, 'OLD_HASH')
+
+        # retry interval is doubled after each failed attempt
+        self.outbox._process_item(items[0]['id'])
+        items = self.outbox.get_items()
+        self.assertEqual(items[0]['attempts'], 2)
+        retry_interval = items[0]['next_attempt'] - datetime.now(pytz.utc)
+        self.assertTrue(timedelta(seconds=ClientsOutbox.retry_interval) < retry_interval <=
+                        timedelta(seconds=2 * ClientsOutbox.retry_interval))
+
+    def test_process_keeps_topic_order(self):
+        self.clients_manager.add_torrent.side_effect = Exception("Client is not available")
+        self.outbox.enqueue(self.topic_id, 'file.torrent', self.torrent)
+        self.outbox.enqueue(self.topic_id, 'file2.torrent', OtherTorrent(self.torrent.raw_content, 'HASH2'))
+
+        self.outbox.process()
+
+        # next torrent of topic waits for failed one
+        self.clients_manager.add_torrent.assert_called_once()
+        self.assertEqual([item['attempts'] for item in self.outbox.get_items()], [1, 0])
+
+    def test_process_gives_up_after_max_attempts(self):
+        self.clients_manager.add_torrent.side_effect = [Exception("Torrent is rejected")] * ClientsOutbox.max_attempts
+        notifier_manager_execute = Mock()
+        notifier_manager = Mock()
+        notifier_manager.execute.return_value.__enter__ = Mock(return_value=notifier_manager_execute)
+        notifier_manager.execute.return_value.__exit__ = Mock(return_value=False)
+        self.outbox = ClientsOutbox(self.clients_manager, notifier_manager)
+        self.outbox.enqueue(self.topic_id, 'file.torrent', self.torrent)
+        self.outbox.enqueue(self.topic_id, 'file2.torrent', OtherTorrent(self.torrent.raw_content, 'HASH2'))
+        item_id = self.outbox.get_items()[0]['id']
+
+        for _ in range(ClientsOutbox.max_attempts - 1):
+            self.outbox._process_item(item_id)
+        notifier_manager_execute.notify_failed.assert_not_called()
+        self.assertEqual(self.get_topic().status, Status.Ok)
+
+        self.outbox._process_item(item_id)
+
+        # failed torrent doesn't block next torrent of topic anymore
+        items = self.outbox.get_items()
+        self.assertEqual([item['filename'] for item in items], ['file2.torrent'])
+        topic = self.get_topic()
+        self.assertEqual(topic.status, Status.Error)
+        self.assertEqual(topic.hash, 'OLD_HASH')
+        notifier_manager_execute.notify_failed.assert_called_once()
+        self.assertIn("Torrent is rejected", notifier_manager_execute.notify_failed.call_args[0][0])
+
+    def test_process_removed_topic(self):
+        self.outbox.enqueue(self.topic_id, 'file.torrent', self.torrent)
+        with DBSession() as db:
+            db.query(OutboxMockTopic).filter(OutboxMockTopic.id == self.topic_id).delete()
+            db.query(Topic).filter(Topic.id == self.topic_id).delete()
+
+        self.assertIsNone(self.outbox.process())
+
+        self.clients_manager.add_torrent.assert_not_called()
+        with DBSession() as db:
+            self.assertEqual(db.query(ClientOutboxItem).count(), 0)
+
+    def test_run(self):
+        added = Event()
+
+        def add_torrent(torrent, topic_settings):
+            result = self.add_torrent(torrent, topic_settings)
+            added.set()
+            return result
+
+        self.clients_manager.add_torrent.side_effect = add_torrent
+        # tests share one sqlite connection, so database isn't accessed while thread is running
+        self.outbox.enqueue(self.topic_id, 'file.torrent', self.torrent)
+        self.outbox.start()
+        try:
+            self.assertTrue(added.wait(5))
+        finally:
+            self.outbox.stop()
+            self.outbox.join(5)
+
+        self.assertFalse(self.outbox.is_alive())
+        self.assertEqual(self.outbox.get_items(), [])
+        self.assertEqual(self.get_topic().hash, self.torrent.info_hash)
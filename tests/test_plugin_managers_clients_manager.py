@@ -1,7 +1,10 @@
+from threading import Event, Thread
+from time import sleep
 from ddt import ddt, data
-from mock import Mock, MagicMock, patch
+from mock import Mock, MagicMock, patch, call
 from tests import TestCase, DbTestCase
-from monitorrent.plugin_managers import ClientsManager, DbClientsManager
+from monitorrent.plugin_managers import ClientsManager, DbClientsManager, BalancingPolicy, ClientMetrics
+from monitorrent.plugins.clients import TopicSettings
 from monitorrent.settings_manager import SettingsManager
 
 
@@ -136,6 +139,159 @@ class ClientsManagerTest(TestCase):
         add_torrent_mock1.assert_called_once_with(torrent, None)
         add_torrent_mock2.assert_not_called()
 
+    def test_find_torrent_from_snapshot(self):
+        self.client1.get_torrents = MagicMock(return_value={'hash1': {'name': 'Torrent 1', 'date_added': None}})
+        self.client1.find_torrent = MagicMock(return_value=False)
+
+        self.assertTrue(self.clients_manager.take_snapshot())
+
+        self.assertEqual({'name': 'Torrent 1', 'date_added': None}, self.clients_manager.find_torrent('HASH1'))
+        self.assertFalse(self.clients_manager.find_torrent('hash2'))
+        self.client1.get_torrents.assert_called_once_with()
+        self.client1.find_torrent.assert_not_called()
+
+        self.clients_manager.clear_snapshot()
+
+        self.assertFalse(self.clients_manager.find_torrent('hash1'))
+        self.client1.find_torrent.assert_called_once_with('hash1')
+
+    def test_snapshot_updated_on_add_and_remove(self):
+        self.client1.get_torrents = MagicMock(return_value={'HASH1': {'name': 'Torrent 1', 'date_added': None}})
+        self.client1.add_torrent = MagicMock(return_value=True)
+        self.client1.remove_torrent = MagicMock(return_value=True)
+        self.client1.find_torrent = MagicMock(return_value=False)
+        torrent = Mock(info_hash='HASH2', content={'info': {'name': 'Torrent 2'}})
+
+        self.clients_manager.take_snapshot()
+
+        self.assertTrue(self.clients_manager.add_torrent(torrent, None))
+        self.assertEqual('Torrent 2', self.clients_manager.find_torrent('hash2')['name'])
+        self.assertIsNotNone(self.clients_manager.find_torrent('hash2')['date_added'])
+
+        self.assertTrue(self.clients_manager.remove_torrent('hash1'))
+        self.assertFalse(self.clients_manager.find_torrent('hash1'))
+        self.client1.find_torrent.assert_not_called()
+
+    def test_snapshot_not_supported_or_failed(self):
+        del self.client1.get_torrents
+        self.client2.get_torrents = MagicMock(side_effect=Exception('boom'))
+
+        self.assertFalse(self.clients_manager.take_snapshot())
+
+        self.clients_manager.set_default(self.CLIENT2_NAME)
+
+        self.assertFalse(self.clients_manager.take_snapshot())
+        self.client2.find_torrent = MagicMock(return_value=False)
+        self.assertFalse(self.clients_manager.find_torrent('hash1'))
+        self.client2.find_torrent.assert_called_once_with('hash1')
+
+    def test_snapshot_of_other_thread_is_not_used(self):
+        self.client1.get_torrents = MagicMock(return_value={'HASH1': {'name': 'Torrent 1', 'date_added': None}})
+        self.client1.find_torrent = MagicMock(return_value=False)
+
+        self.assertTrue(self.clients_manager.take_snapshot())
+
+        found = []
+
+        def find_and_clear():
+            found.append(self.clients_manager.find_torrent('HASH1'))
+            self.clients_manager.clear_snapshot()
+
+        thread = Thread(target=find_and_clear)
+        thread.start()
+        thread.join()
+
+        self.assertEqual([False], found)
+        self.client1.find_torrent.assert_called_once_with('HASH1')
+        self.assertEqual('Torrent 1', self.clients_manager.find_torrent('HASH1')['name'])
+
+    def test_client_calls_are_serialized(self):
+        calls = []
+        running = []
+
+        def find_torrent(torrent_hash):
+            running.append(torrent_hash)
+            calls.append(len(running))
+            sleep(0.01)
+            running.remove(torrent_hash)
+            return False
+
+        self.client1.find_torrent = find_torrent
+
+        threads = [Thread(target=self.clients_manager.find_torrent, args=('hash{0}'.format(i),)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([1, 1, 1, 1], calls)
+
+    def test_calls_to_other_client_are_not_blocked(self):
+        started = Event()
+        release = Event()
+
+        def add_torrent(torrent, topic_settings):
+            started.set()
+            release.wait(5)
+            return True
+
+        self.client1.add_torrent = add_torrent
+        self.client2.check_connection = MagicMock(return_value=True)
+
+        thread = Thread(target=self.clients_manager.add_torrent, args=(Mock(info_hash='HASH1'), None))
+        thread.start()
+        try:
+            self.assertTrue(started.wait(5))
+            # slow add to the first client doesn't block the second one
+            self.assertTrue(self.clients_manager.check_connection(self.CLIENT2_NAME))
+        finally:
+            release.set()
+            thread.join()
+
+    def test_find_torrents_bulk(self):
+        self.client1.find_torrents = MagicMock(return_value={'hash1': {'name': 'Torrent 1'}})
+
+        self.assertEqual({'HASH1': {'name': 'Torrent 1'}, 'HASH2': False},
+                         self.clients_manager.find_torrents(['HASH1', 'HASH2']))
+        self.client1.find_torrents.assert_called_once_with(['HASH1', 'HASH2'])
+        self.client1.find_torrent.assert_not_called()
+
+    def test_bulk_methods_fallback(self):
+        del self.client1.find_torrents
+        del self.client1.add_torrents
+        del self.client1.remove_torrents
+        self.client1.find_torrent = MagicMock(side_effect=[{'name': 'Torrent 1'}, None])
+        self.client1.add_torrent = MagicMock(side_effect=[True, False])
+        self.client1.remove_torrent = MagicMock(return_value=True)
+        torrent1 = Mock(info_hash='HASH1')
+        torrent2 = Mock(info_hash='HASH2')
+
+        self.assertEqual({'hash1': {'name': 'Torrent 1'}, 'hash2': False},
+                         self.clients_manager.find_torrents(['hash1', 'hash2']))
+        self.assertEqual([True, False], self.clients_manager.add_torrents([(torrent1, None), (torrent2, None)]))
+        self.assertEqual({'hash1': True}, self.clients_manager.remove_torrents(['hash1']))
+
+        self.client1.add_torrent.assert_has_calls([call(torrent1, None), call(torrent2, None)])
+        self.client1.remove_torrent.assert_called_once_with('hash1')
+
+    def test_bulk_methods_update_snapshot(self):
+        self.client1.get_torrents = MagicMock(return_value={'HASH1': {'name': 'Torrent 1', 'date_added': None}})
+        self.client1.add_torrents = MagicMock(return_value=[True, False])
+        self.client1.remove_torrents = MagicMock(return_value=True)
+        torrent2 = Mock(info_hash='HASH2', content={'info': {'name': 'Torrent 2'}})
+        torrent3 = Mock(info_hash='HASH3', content={'info': {'name': 'Torrent 3'}})
+
+        self.clients_manager.take_snapshot()
+
+        self.assertEqual([True, False], self.clients_manager.add_torrents([(torrent2, None), (torrent3, None)]))
+        self.assertEqual({'HASH1': True}, self.clients_manager.remove_torrents(['HASH1']))
+
+        found = self.clients_manager.find_torrents(['HASH1', 'HASH2', 'HASH3'])
+        self.assertEqual(False, found['HASH1'])
+        self.assertEqual('Torrent 2', found['HASH2']['name'])
+        self.assertEqual(False, found['HASH3'])
+        self.client1.find_torrents.assert_not_called()
+
     def test_remove_torrent_true(self):
         remove_torrent_mock1 = MagicMock(return_value=False)
         remove_torrent_mock2 = MagicMock(return_value=True)
@@ -229,3 +385,300 @@ class DbClientsManagerTest(DbTestCase):
                                                 {self.CLIENT1_NAME: self.client1, self.CLIENT2_NAME: self.client2})
 
         self.assertEqual(self.client2, self.clients_manager.get_default())
+
+    def test_set_balancing_persisted(self):
+        balancing = {'policy': BalancingPolicy.ROUND_ROBIN, 'clients': [self.CLIENT1_NAME, self.CLIENT2_NAME]}
+        self.clients_manager.set_balancing(balancing)
+
+        # recreated client manager will read balancing from DB
+        self.clients_manager = DbClientsManager(self.settings_manager,
+                                                {self.CLIENT1_NAME: self.client1, self.CLIENT2_NAME: self.client2})
+
+        expected = dict(balancing, trackers={}, download_dirs={})
+        self.assertEqual(expected, self.clients_manager.get_balancing())
+
+    def test_invalid_balancing_ignored(self):
+        self.settings_manager.clients_balancing = {'policy': BalancingPolicy.ROUND_ROBIN, 'clients': ['removed']}
+
+        self.clients_manager = DbClientsManager(self.settings_manager,
+                                                {self.CLIENT1_NAME: self.client1, self.CLIENT2_NAME: self.client2})
+
+        self.assertIsNone(self.clients_manager.get_balancing())
+
+    def test_set_failover_persisted(self):
+        self.clients_manager.set_failover({'client': self.CLIENT2_NAME})
+
+        self.clients_manager = DbClientsManager(self.settings_manager,
+                                                {self.CLIENT1_NAME: self.client1, self.CLIENT2_NAME: self.client2})
+
+        self.assertEqual({'client': self.CLIENT2_NAME, 'error_rate': 0.5, 'min_calls': 5},
+                         self.clients_manager.get_failover())
+
+
+class FakeClient(object):
+    def __init__(self, name, free_space=None, torrents=None):
+        self.name = name
+        self.free_space = free_space
+        self.torrents = dict(torrents or {})
+        self.added = []
+
+    def get_torrents(self):
+        return dict(self.torrents)
+
+    def get_free_space(self):
+        return self.free_space
+
+    def find_torrent(self, torrent_hash):
+        return self.torrents.get(torrent_hash, False)
+
+    def add_torrent(self, torrent, topic_settings):
+        self.added.append(torrent.info_hash)
+        self.torrents[torrent.info_hash] = {'name': torrent.info_hash, 'date_added': None}
+        return True
+
+    def remove_torrent(self, torrent_hash):
+        return self.torrents.pop(torrent_hash, None) is not None
+
+
+class ClientsManagerBalancingTest(DbTestCase):
+    def setUp(self):
+        super(ClientsManagerBalancingTest, self).setUp()
+
+        self.client1 = FakeClient('client1', free_space=100, torrents={'HASH1': {'name': 'Torrent 1'}})
+        self.client2 = FakeClient('client2', free_space=50)
+        self.client3 = FakeClient('client3', free_space=10)
+        self.clients_manager = ClientsManager({'client1': self.client1, 'client2': self.client2,
+                                               'client3': self.client3}, 'client1')
+
+    @staticmethod
+    def _torrent(torrent_hash, size=1):
+        return Mock(info_hash=torrent_hash, size=size, content={'info': {'name': torrent_hash}})
+
+    def _set_policy(self, policy, clients=('client1', 'client2'), **kwargs):
+        self.clients_manager.set_balancing(dict(policy=policy, clients=list(clients), **kwargs))
+
+    def test_round_robin(self):
+        self._set_policy(BalancingPolicy.ROUND_ROBIN)
+
+        results = self.clients_manager.add_torrents([(self._torrent('A'), None), (self._torrent('B'), None),
+                                                     (self._torrent('C'), None)])
+
+        self.assertEqual([True, True, True], results)
+        self.assertEqual(['A', 'C'], self.client1.added)
+        self.assertEqual(['B'], self.client2.added)
+        self.assertEqual([], self.client3.added)
+
+    def test_least_torrents(self):
+        self._set_policy(BalancingPolicy.LEAST_TORRENTS)
+
+        self.clients_manager.add_torrents([(self._torrent('A'), None), (self._torrent('B'), None),
+                                           (self._torrent('C'), None)])
+
+        self.assertEqual(['B'], self.client1.added)
+        self.assertEqual(['A', 'C'], self.client2.added)
+
+    def test_most_free_space(self):
+        self._set_policy(BalancingPolicy.MOST_FREE_SPACE, clients=('client1', 'client2', 'client3'))
+
+        self.clients_manager.add_torrents([(self._torrent('A', 70), None), (self._torrent('B', 10), None),
+                                           (self._torrent('C', 10), None)])
+
+        self.assertEqual(['A'], self.client1.added)
+        self.assertEqual(['B', 'C'], self.client2.added)
+        self.assertEqual([], self.client3.added)
+
+    def test_pinned_tracker_and_download_dir(self):
+        self._set_policy(BalancingPolicy.ROUND_ROBIN, clients=('client1', 'client2', 'client3'),
+                         trackers={'lostfilm.tv': 'client3'},
+                         download_dirs={'/mnt/disk2': 'client2', '/mnt/disk2/series': 'client1'})
+
+        self.clients_manager.add_torrent(self._torrent('A'), TopicSettings(None, tracker='lostfilm.tv'))
+        self.clients_manager.add_torrent(self._torrent('B'), TopicSettings('/mnt/disk2/movies'))
+        self.clients_manager.add_torrent(self._torrent('C'), TopicSettings('/mnt/disk2/series/show'))
+
+        self.assertEqual(['C'], self.client1.added)
+        self.assertEqual(['B'], self.client2.added)
+        self.assertEqual(['A'], self.client3.added)
+
+    def test_topic_placement_remembered(self):
+        self._set_policy(BalancingPolicy.ROUND_ROBIN)
+        self.clients_manager.add_torrent(self._torrent('OTHER'), None)
+
+        self.assertTrue(self.clients_manager.add_torrent(self._torrent('A'), TopicSettings(None, 1)))
+        self.assertEqual(['A'], self.client2.added)
+
+        # recreated manager reads placement from db, update is added and old torrent removed on the same client
+        self.clients_manager = ClientsManager({'client1': self.client1, 'client2': self.client2}, 'client1',
+                                              {'policy': BalancingPolicy.ROUND_ROBIN,
+                                               'clients': ['client1', 'client2']})
+        self.assertTrue(self.clients_manager.add_torrent(self._torrent('A2'), TopicSettings(None, 1)))
+        self.assertTrue(self.clients_manager.remove_torrent('A'))
+
+        self.assertEqual(['A', 'A2'], self.client2.added)
+        self.assertEqual({'A2'}, set(self.client2.torrents.keys()))
+
+    def test_find_and_remove_on_all_clients(self):
+        self._set_policy(BalancingPolicy.ROUND_ROBIN)
+        self.client2.torrents['HASH2'] = {'name': 'Torrent 2'}
+
+        self.assertEqual({'name': 'Torrent 2'}, self.clients_manager.find_torrent('HASH2'))
+        self.assertEqual({'HASH1': {'name': 'Torrent 1'}, 'HASH2': {'name': 'Torrent 2'}, 'HASH3': False},
+                         self.clients_manager.find_torrents(['HASH1', 'HASH2', 'HASH3']))
+        self.assertEqual({'HASH1': True, 'HASH2': True, 'HASH3': False},
+                         self.clients_manager.remove_torrents(['HASH1', 'HASH2', 'HASH3']))
+
+        self.assertEqual({}, self.client1.torrents)
+        self.assertEqual({}, self.client2.torrents)
+
+    def test_snapshot_of_all_clients(self):
+        self._set_policy(BalancingPolicy.ROUND_ROBIN)
+        self.client2.torrents['HASH2'] = {'name': 'Torrent 2'}
+
+        self.assertTrue(self.clients_manager.take_snapshot())
+        self.client1.torrents.clear()
+        self.client2.torrents.clear()
+
+        self.assertEqual({'name': 'Torrent 1'}, self.clients_manager.find_torrent('hash1'))
+        self.assertEqual({'name': 'Torrent 2'}, self.clients_manager.find_torrent('HASH2'))
+
+    def test_snapshot_replaces_locations(self):
+        self._set_policy(BalancingPolicy.ROUND_ROBIN)
+        self.client2.torrents['HASH2'] = {'name': 'Torrent 2'}
+        self.assertTrue(self.clients_manager.take_snapshot())
+        self.clients_manager.clear_snapshot()
+        del self.client2.torrents['HASH2']
+
+        self.assertTrue(self.clients_manager.take_snapshot())
+
+        # locations of removed torrents are not kept
+        self.assertEqual({'HASH1': self.client1}, self.clients_manager._locations)
+
+    def test_snapshot_without_balancing_has_no_locations(self):
+        self.assertTrue(self.clients_manager.take_snapshot())
+
+        self.assertEqual({}, self.clients_manager._locations)
+
+    def test_topic_placement_uses_registered_name(self):
+        self.client2.name = 'renamed'
+        self._set_policy(BalancingPolicy.ROUND_ROBIN)
+        self.clients_manager.add_torrent(self._torrent('OTHER'), None)
+
+        self.assertTrue(self.clients_manager.add_torrent(self._torrent('A'), TopicSettings(None, 1)))
+        self.assertTrue(self.clients_manager.add_torrent(self._torrent('A2'), TopicSettings(None, 1)))
+
+        self.assertEqual(['A', 'A2'], self.client2.added)
+
+    def test_invalid_balancing(self):
+        with self.assertRaises(ValueError):
+            self._set_policy('random')
+        with self.assertRaises(ValueError):
+            self._set_policy(BalancingPolicy.ROUND_ROBIN, clients=())
+        with self.assertRaises(KeyError):
+            self._set_policy(BalancingPolicy.ROUND_ROBIN, clients=('client1', 'unknown'))
+        with self.assertRaises(ValueError):
+            self._set_policy(BalancingPolicy.ROUND_ROBIN, trackers={'lostfilm.tv': 'client3'})
+
+        self.assertIsNone(self.clients_manager.get_balancing())
+
+
+class ClientMetricsTest(TestCase):
+    @patch('monitorrent.plugin_managers.monotonic')
+    def test_rolling_window(self, monotonic):
+        metrics = ClientMetrics(window=60)
+        monotonic.return_value = 100
+        metrics.record('client1', 'find_torrent', 0.1)
+        metrics.record('client1', 'add_torrent', 0.3, 'Connection refused')
+        monotonic.return_value = 130
+        metrics.record('client1', 'find_torrent', 0.2)
+
+        stats = metrics.get_stats('client1')
+        self.assertEqual(3, stats['calls'])
+        self.assertEqual(1, stats['errors'])
+        self.assertAlmostEqual(0.2, stats['avg_latency'])
+        self.assertEqual(0.3, stats['max_latency'])
+        self.assertEqual(2, stats['methods']['find_torrent']['calls'])
+        self.assertEqual('Connection refused', stats['last_error']['error'])
+        self.assertEqual((3, 1.0 / 3), metrics.get_error_rate('client1'))
+
+        # first two calls are out of window
+        monotonic.return_value = 170
+        self.assertEqual((1, 0.0), metrics.get_error_rate('client1'))
+        self.assertEqual(0.2, metrics.get_stats('client1')['max_latency'])
+
+    def test_unknown_client(self):
+        stats = ClientMetrics().get_stats('client1')
+
+        self.assertEqual(0, stats['calls'])
+        self.assertIsNone(stats['avg_latency'])
+        self.assertEqual({}, stats['methods'])
+
+
+class ClientsManagerFailoverTest(TestCase):
+    def setUp(self):
+        super(ClientsManagerFailoverTest, self).setUp()
+
+        self.client1 = FakeClient('client1')
+        self.client2 = FakeClient('client2')
+        self.clients_manager = ClientsManager({'client1': self.client1, 'client2': self.client2}, 'client1')
+        self.clients_manager.set_failover({'client': 'client2', 'error_rate': 0.5, 'min_calls': 2})
+
+    @staticmethod
+    def _torrent(torrent_hash):
+        return Mock(info_hash=torrent_hash, size=1, content={'info': {'name': torrent_hash}})
+
+    def test_calls_are_measured(self):
+        self.clients_manager.add_torrent(self._torrent('A'), None)
+        self.clients_manager.find_torrent('A')
+
+        metrics = self.clients_manager.get_metrics('client1')
+        self.assertEqual(2, metrics['calls'])
+        self.assertEqual(0, metrics['errors'])
+        self.assertEqual({'add_torrent', 'find_torrent'}, set(metrics['methods']))
+        self.assertEqual(0, self.clients_manager.get_metrics()['client2']['calls'])
+        with self.assertRaises(KeyError):
+            self.clients_manager.get_metrics('unknown')
+
+    def test_fail_over_to_secondary(self):
+        self.client1.add_torrent = Mock(side_effect=Exception("Connection refused"))
+        self.client1.find_torrent = Mock(side_effect=Exception("Connection refused"))
+        for torrent_hash in ['A', 'B']:
+            with self.assertRaises(Exception):
+                self.clients_manager.add_torrent(self._torrent(torrent_hash), None)
+
+        self.assertTrue(self.clients_manager.add_torrent(self._torrent('C'), None))
+
+        self.assertEqual(['C'], self.client2.added)
+        # failing client doesn't prevent finding torrent on secondary one
+        self.assertEqual({'name': 'C', 'date_added': None}, self.clients_manager.find_torrent('C'))
+        self.assertTrue(self.clients_manager.remove_torrent('C'))
+        self.assertEqual({}, self.client2.torrents)
+
+    def test_not_added_torrents_are_errors(self):
+        self.client1.add_torrent = Mock(return_value=False)
+        self.clients_manager.add_torrent(self._torrent('A'), None)
+        self.clients_manager.add_torrent(self._torrent('B'), None)
+
+        self.assertEqual(1.0, self.clients_manager.get_metrics('client1')['error_rate'])
+        self.assertEqual([True], self.clients_manager.add_torrents([(self._torrent('C'), None)]))
+        self.assertEqual(['C'], self.client2.added)
+
+    def test_no_fail_over_without_enough_calls(self):
+        self.client1.add_torrent = Mock(return_value=False)
+        self.clients_manager.add_torrent(self._torrent('A'), None)
+        self.clients_manager.add_torrent(self._torrent('B'), None)
+        self.clients_manager.set_failover({'client': 'client2', 'min_calls': 5})
+
+        self.assertFalse(self.clients_manager.add_torrent(self._torrent('C'), None))
+        self.assertEqual([], self.client2.added)
+
+    def test_invalid_failover(self):
+        with self.assertRaises(KeyError):
+            self.clients_manager.set_failover({'client': 'unknown'})
+        with self.assertRaises(ValueError):
+            self.clients_manager.set_failover({'client': 'client2', 'error_rate': 2})
+        with self.assertRaises(ValueError):
+            self.clients_manager.set_failover({'client': 'client2', 'min_calls': 0})
+        with self.assertRaises(ValueError):
+            self.clients_manager.set_failover({'client': 'client1'})
+
+        self.assertEqual({'client': 'client2', 'error_rate': 0.5, 'min_calls': 2}, self.clients_manager.get_failover())
@@ -1,6 +1,8 @@
 from ddt import ddt, data
+from mock import patch
 from tests import DbTestCase
-from monitorrent.settings_manager import SettingsManager
+from monitorrent.db import DBSession
+from monitorrent.settings_manager import SettingsManager, Settings, settings_cache
 
 
 @ddt
@@ -101,6 +103,15 @@ class SettingsManagerTest(DbTestCase):
 
         self.assertEqual(20, self.settings_manager.remove_logs_interval)
 
+    def test_get_clients_outbox_enabled(self):
+        self.assertFalse(self.settings_manager.clients_outbox_enabled)
+
+    @data(True, False)
+    def test_set_clients_outbox_enabled(self, value):
+        self.settings_manager.clients_outbox_enabled = value
+
+        self.assertEqual(value, self.settings_manager.clients_outbox_enabled)
+
     def test_get_is_proxy_enabled(self):
         self.assertFalse(self.settings_manager.get_is_proxy_enabled())
 
@@ -218,3 +229,66 @@ class SettingsManagerTest(DbTestCase):
     def test_get_existing_external_notifications_levels_success(self):
         self.assertEqual(self.settings_manager.get_existing_external_notifications_levels(),
                          ['DOWNLOAD', 'ERROR', 'STATUS_CHANGED'])
+
+
+class SettingsCacheTest(DbTestCase):
+    def setUp(self):
+        super(SettingsCacheTest, self).setUp()
+        self.settings_manager = SettingsManager()
+
+    def _set_in_db(self, name, value):
+        # other process changes database
+        with DBSession() as db:
+            db.add(Settings(name=name, value=value))
+
+    def test_settings_are_loaded_once(self):
+        with patch('monitorrent.settings_manager.DBSession', wraps=DBSession) as db_session:
+            self.settings_manager.get_password()
+            self.settings_manager.get_is_authentication_enabled()
+            self.settings_manager.get_proxies()
+            self.settings_manager.tracker_settings
+
+        db_session.assert_called_once_with()
+
+    def test_write_through(self):
+        self.settings_manager.get_password()
+
+        self.settings_manager.set_password('secret')
+        self.settings_manager.set_proxy('http', 'http://1.1.1.1:8888')
+
+        with patch('monitorrent.settings_manager.DBSession') as db_session:
+            self.assertEqual('secret', self.settings_manager.get_password())
+            self.assertEqual('http://1.1.1.1:8888', self.settings_manager.get_proxy('http'))
+        db_session.assert_not_called()
+
+        # values are written to database as well
+        settings_cache.invalidate()
+        self.assertEqual('secret', self.settings_manager.get_password())
+        self.assertEqual({'http': 'http://1.1.1.1:8888'}, self.settings_manager.get_proxies())
+
+    @patch('monitorrent.settings_manager.monotonic')
+    def test_ttl(self, monotonic):
+        monotonic.return_value = 100
+        self.settings_manager.get_password()
+        self._set_in_db('monitorrent.password', 'secret')
+
+        with patch.object(settings_cache, 'ttl', 10):
+            monotonic.return_value = 105
+            self.assertEqual('monitorrent', self.settings_manager.get_password())
+            monotonic.return_value = 111
+            self.assertEqual('secret', self.settings_manager.get_password())
+
+    def test_without_ttl(self):
+        self.settings_manager.get_password()
+        self._set_in_db('monitorrent.password', 'secret')
+
+        self.assertEqual('monitorrent', self.settings_manager.get_password())
+
+    def test_reloaded_for_new_database(self):
+        self.settings_manager.set_password('secret')
+
+        # DbTestCase creates new database for each test
+        self.tearDown()
+        self.setUp()
+
+        self.assertEqual('monitorrent', self.settings_manager.get_password())
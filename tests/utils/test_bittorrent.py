@@ -0,0 +1,266 @@
+# coding=utf-8
+import base64
+import hashlib
+import io
+import pytest
+from monitorrent.utils.bittorrent import bdecode, bencode, bencode_to, FileTable, Torrent, TorrentMeta
+from monitorrent.utils import bittorrent_ex
+
+
+class TestBDecode(object):
+    @pytest.mark.parametrize('value', [
+        0,
+        -42,
+        u'',
+        u'string',
+        u'строка',
+        b'\xff\xfe\x00',
+        [],
+        [1, u'2', [3, {}]],
+        {},
+        {u'a': 1, u'b': [u'c', {u'd': b'\xff'}], u'info': {u'name': u'имя', u'pieces': b'\x00\xff' * 1000}},
+    ])
+    def test_roundtrip(self, value):
+        assert bdecode(bencode(value)) == value
+
+    def test_decode_memoryview(self):
+        assert bdecode(memoryview(b'd1:ai1e1:bl1:cee')) == {u'a': 1, u'b': [u'c']}
+
+    def test_decode_long_binary_string(self):
+        pieces = bytes(bytearray(range(256))) * 8192
+        assert bdecode(b'd6:pieces' + str(len(pieces)).encode() + b':' + pieces + b'e') == {u'pieces': pieces}
+
+    def test_decode_deep_nesting(self):
+        depth = 100000
+        result = bdecode(b'l' * depth + b'e' * depth)
+        for _ in range(depth - 1):
+            assert len(result) == 1
+            result = result[0]
+        assert result == []
+
+    def test_decode_spans(self):
+        text = b'd8:announce3:url4:infod4:name4:filee5:otherli1eee'
+        spans = {}
+
+        bdecode(text, spans=spans)
+
+        assert {k: text[start:end] for k, (start, end) in spans.items()} == {
+            u'announce': b'3:url',
+            u'info': b'd4:name4:filee',
+            u'other': b'li1ee',
+        }
+
+    def test_decode_unsorted_keys(self):
+        assert bdecode(b'd1:bi1e1:ai2ee') == {u'b': 1, u'a': 2}
+        with pytest.raises(SyntaxError):
+            bdecode(b'd1:bi1e1:ai2ee', strict=True)
+
+    @pytest.mark.parametrize('text,strict', [
+        (b'd1:ai1e1:ai2ee', False),
+        (b'd1:ai1e1:ai2ee', True),
+        (b'd1:bi1e1:ai2e1:bi3ee', False),
+    ])
+    def test_decode_duplicate_keys(self, text, strict):
+        with pytest.raises(SyntaxError) as e:
+            bdecode(text, strict=strict)
+        assert 'duplicate' in str(e.value)
+
+    @pytest.mark.parametrize('text', [
+        b'',
+        b'i1',
+        b'ie',
+        b'i1.5e',
+        b'5:abc',
+        b'l',
+        b'd1:ae',
+        b'di1ei2ee',
+        b'dli1ee1:ae',
+        b'e',
+        b'x',
+        b'1x:a',
+        b'i1ei2e',
+        b'le ',
+    ])
+    def test_decode_failed(self, text):
+        with pytest.raises(SyntaxError):
+            bdecode(text)
+
+
+class TestBEncode(object):
+    def test_encode(self):
+        data = {u'b': [1, -2, u'строка', b'\x00\xff'], u'a': {b'z': [], u'y': {}}, u'c': 0}
+
+        assert bencode(data) == b'd1:ad1:yde1:zlee1:bli1ei-2e12:\xd1\x81\xd1\x82\xd1\x80\xd0\xbe\xd0\xba\xd0\xb0' \
+                                b'2:\x00\xffe1:ci0ee'
+
+    def test_keys_sorted_as_raw_strings(self):
+        assert bencode({u'b': 1, b'a': 2, u'\u0430': 3, u'B': 4}) == b'd1:Bi4e1:ai2e1:bi1e2:\xd0\xb0i3ee'
+
+    def test_encode_to_file(self):
+        data = {u'info': {u'name': u'file', u'pieces': memoryview(b'0123456789' * 2)}}
+        stream = io.BytesIO()
+
+        bencode_to(data, stream)
+
+        assert stream.getvalue() == bencode(data) == b'd4:infod4:name4:file6:pieces20:' + b'0123456789' * 2 + b'ee'
+
+    def test_encode_to_bytearray_appends(self):
+        buf = bytearray(b'prefix')
+
+        bencode_to([1, u'a'], buf)
+
+        assert buf == bytearray(b'prefixli1e1:ae')
+
+    def test_deep_nesting(self):
+        content = b'l' * 100000 + b'e' * 100000
+
+        assert bencode(bdecode(content)) == content
+
+    def test_unsupported_type(self):
+        with pytest.raises(TypeError):
+            bencode({u'a': 1.5})
+
+
+class TestTorrent(object):
+    def test_info_hash(self):
+        info = {u'name': u'file.mkv', u'length': 12345, u'piece length': 262144, u'pieces': b'\x00\xff' * 10}
+        content = bencode({u'announce': u'http://tracker/announce', u'info': info})
+
+        torrent = Torrent(content)
+
+        assert torrent.info_hash == hashlib.sha1(bencode(info)).hexdigest().upper()
+        assert torrent.info_hash is torrent.info_hash
+
+    def test_info_hash_of_unsorted_info(self):
+        raw_info = b'd4:name4:file6:lengthi1e12:piece lengthi16384e6:pieces2:\x00\xffe'
+        content = b'd8:announce23:http://tracker/announce4:info' + raw_info + b'e'
+
+        torrent = Torrent(content)
+
+        assert torrent.info_hash == hashlib.sha1(raw_info).hexdigest().upper()
+        assert torrent.info_hash != hashlib.sha1(bencode(torrent.content[u'info'])).hexdigest().upper()
+
+    def test_info_hash_with_surrounding_whitespaces(self):
+        raw_info = b'd6:lengthi1e4:name4:filee'
+        content = b'\r\nd4:info' + raw_info + b'e\r\n'
+
+        assert Torrent(content).info_hash == hashlib.sha1(raw_info).hexdigest().upper()
+
+
+    def test_base64_content_calculated_once(self):
+        content = b'd4:infod6:lengthi1e4:name4:fileee'
+        torrent = bittorrent_ex.Torrent(content)
+
+        assert torrent.base64_content == base64.b64encode(content)
+        assert torrent.base64_content is torrent.base64_content
+
+
+
+class TestFileTable(object):
+    info = {
+        u'name': u'pack',
+        u'piece length': 16384,
+        u'pieces': b'0' * 20,
+        u'files': [
+            {u'length': 10, u'path': [u'Season 1', u'Episode 1.mkv']},
+            {u'length': 20, u'path': [u'Season 1', u'Episode 2.mkv']},
+            {u'length': 5, u'path': [u'Season 1', u'Subs', u'Episode 1.srt']},
+            {u'length': 1, u'path': [u'readme.txt']},
+            {u'length': 3, u'path': [u'Season 2', b'Episode 1 \xe9.mkv']},
+        ]
+    }
+
+    def test_from_info(self):
+        table = FileTable.from_info(self.info)
+
+        assert len(table) == 5
+        assert list(table.lengths) == [10, 20, 5, 1, 3]
+        assert table.path(4) == (u'Season 2', u'Episode 1 \xe9.mkv')
+        assert table.path(0)[0] is table.path(2)[0]
+        assert table.directories == [(u'Season 1',), (u'Season 1', u'Subs'), (), (u'Season 2',)]
+        assert list(table.directory_ids) == [0, 0, 1, 2, 3]
+        assert table.total_size == 39
+
+    def test_single_file(self):
+        table = FileTable.from_info({u'name': u'file.mkv', u'length': 100})
+
+        assert table.path(0) == (u'file.mkv',)
+        assert table.total_size == 100
+        assert list(table.iter_files()) == [(u'', u'file.mkv', 100)]
+        assert table.group_by_directory() == {u'': (1, 100)}
+
+    def test_group_by_directory(self):
+        table = FileTable.from_info(self.info)
+
+        assert table.group_by_directory() == {u'Season 1': (3, 35), u'': (1, 1), u'Season 2': (1, 3)}
+        assert table.group_by_directory(2) == {u'Season 1': (2, 30), u'Season 1/Subs': (1, 5), u'': (1, 1),
+                                               u'Season 2': (1, 3)}
+
+    def test_torrent_file_list(self):
+        torrent = Torrent(bencode({u'info': self.info}))
+
+        assert torrent.size == 39
+        assert torrent.get_filelist()[2] == {'path': u'Season 1/Subs', 'name': u'Episode 1.srt', 'size': 5}
+        assert torrent.get_filelist()[3] == {'path': u'', 'name': u'readme.txt', 'size': 1}
+        assert torrent.file_table is torrent.file_table
+        assert TorrentMeta(torrent.raw_content).size == 39
+
+
+class TestTorrentMeta(object):
+    info = {u'name': u'pack', u'piece length': 262144, u'pieces': b'\x00\xff' * 10,
+            u'files': [{u'length': 10, u'path': [u'dir', u'file1.mkv']},
+                       {u'length': 20, u'path': [u'file2.mkv']}]}
+    meta = {u'announce': u'http://tracker/announce', u'announce-list': [[u'http://backup/announce']],
+            u'comment': u'comment', u'info': info}
+
+    def test_same_as_torrent(self):
+        content = bencode(self.meta)
+
+        torrent = Torrent(content)
+        torrent_meta = TorrentMeta(content)
+
+        assert torrent_meta.info_hash == torrent.info_hash
+        assert torrent_meta.name == u'pack'
+        assert torrent_meta.size == torrent.size == 30
+        assert torrent_meta.get_filelist() == torrent.get_filelist()
+        assert torrent_meta.trackers == torrent.trackers
+        assert torrent_meta.private == torrent.private
+        assert torrent_meta.encode() == torrent.encode() == content
+
+    def test_decode_on_access_only(self):
+        torrent_meta = TorrentMeta(bencode(self.meta))
+
+        assert torrent_meta.info_hash is not None
+        # noinspection PyProtectedMember
+        assert torrent_meta.content._values == {}
+
+        assert torrent_meta.name == u'pack'
+        # noinspection PyProtectedMember
+        assert list(torrent_meta.content[u'info']._values.keys()) == [u'name']
+
+    def test_modify(self):
+        torrent_meta = TorrentMeta(bencode(self.meta))
+
+        torrent_meta.comment = u'new comment'
+        torrent_meta.add_multitracker(u'http://new/announce')
+
+        assert torrent_meta.modified
+        assert bdecode(torrent_meta.encode())[u'comment'] == u'new comment'
+        assert bdecode(torrent_meta.encode())[u'announce-list'] == [[u'http://backup/announce'],
+                                                                    [u'http://new/announce']]
+
+    def test_encode_copies_not_decoded_values(self):
+        content = b'd7:comment4:text4:infod6:lengthi1e4:name4:fileee'
+        torrent_meta = TorrentMeta(content)
+
+        torrent_meta.comment = u'new'
+
+        assert torrent_meta.encode() == b'd7:comment3:new4:infod6:lengthi1e4:name4:fileee'
+        # noinspection PyProtectedMember
+        assert u'info' not in torrent_meta.content._values
+
+    @pytest.mark.parametrize('content', [b'', b'le', b'd4:infoe', b'd4:infod4:name4:filee', b'd1:ai1ee1:b',
+                                         b'di1ei1ee', b'd1:ai1e1:ai2ee', b'd1:a5:abce'])
+    def test_invalid(self, content):
+        with pytest.raises(SyntaxError):
+            TorrentMeta(content)
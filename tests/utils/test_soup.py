@@ -0,0 +1,58 @@
+# coding=utf-8
+import pytest
+from bs4 import SoupStrainer
+from monitorrent.utils.soup import get_soup, selectors_strainer
+
+PAGE = u"""<html><head><title>Page title</title></head><body>
+<div class="menu main-menu"><a href="/">Main</a></div>
+<h1>Heading</h1>
+<div id="content" class="series-block"><div class="serie-block"><h2>1 сезон</h2></div></div>
+<div class="series-block-footer"><a href="/footer">Footer</a></div>
+</body></html>"""
+
+
+class TestGetSoup(object):
+    def test_parse_all(self):
+        soup = get_soup(PAGE)
+
+        assert soup.title.string == 'Page title'
+        assert soup.h1.text == 'Heading'
+
+    def test_parse_only_tag(self):
+        soup = get_soup(PAGE, parse_only=['h1'])
+
+        assert soup.title is None
+        assert soup.h1.text == 'Heading'
+        assert len(soup.find_all('div')) == 0
+
+    def test_parse_only_class_with_children(self):
+        soup = get_soup(PAGE, parse_only=['div.series-block'])
+
+        series_block = soup.find('div', class_='series-block')
+        assert series_block is not None
+        assert series_block.find('h2').text == u'1 сезон'
+        assert [d.attrs['class'] for d in soup.find_all('div')] == [['series-block'], ['serie-block']]
+
+    def test_parse_only_multiple_selectors(self):
+        soup = get_soup(PAGE, parse_only=['title', 'div.main-menu', '#content'])
+
+        assert soup.title.string == 'Page title'
+        assert soup.h1 is None
+        assert [a.attrs['href'] for a in soup.find_all('a')] == ['/']
+        assert soup.find('div', id='content') is not None
+
+    def test_parse_only_strainer(self):
+        soup = get_soup(PAGE, parse_only=SoupStrainer('a', href='/footer'))
+
+        assert [a.text for a in soup.find_all('a')] == ['Footer']
+
+    def test_parse_only_with_html5lib(self):
+        soup = get_soup(PAGE, 'html5lib', parse_only=['h1'])
+
+        assert soup.title is None
+        assert soup.h1.text == 'Heading'
+
+    @pytest.mark.parametrize('selector', ['', 'div > a', 'div.a.b', 'a[href]'])
+    def test_unsupported_selector(self, selector):
+        with pytest.raises(ValueError):
+            selectors_strainer([selector])
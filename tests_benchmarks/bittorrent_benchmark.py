@@ -0,0 +1,201 @@
+"""
+Micro-benchmarks for monitorrent.utils.bittorrent
+
+Run from repository root:
+
+    python -m tests_benchmarks.bittorrent_benchmark --output before.json
+    python -m tests_benchmarks.bittorrent_benchmark --output after.json --compare before.json
+
+Results are written as JSON with sorted keys and results sorted by benchmark and case name,
+so files from different runs can be compared directly.
+
+Common benchmarks use only bdecode, bencode and Torrent, so the script can be run against older
+decoder too. Benchmarks for TorrentMeta and FileTable are skipped when they are not available.
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import sys
+import timeit
+
+from monitorrent.utils import bittorrent
+from monitorrent.utils.bittorrent import bdecode, bencode, Torrent
+from monitorrent.utils.bittorrent_ex import is_torrent_content
+
+FORMAT_VERSION = 1
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tests', 'httprety')
+KB = 1024
+MB = 1024 * KB
+SYNTHETIC_FILES = [1, 1000, 50000]
+SYNTHETIC_PIECES = [1 * KB, 1 * MB, 20 * MB]
+QUICK_FILES = [1, 1000]
+QUICK_PIECES = [1 * KB, 1 * MB]
+TorrentMeta = getattr(bittorrent, 'TorrentMeta', None)
+FileTable = getattr(bittorrent, 'FileTable', None)
+
+
+def make_torrent(files_count, pieces_size, seed=0):
+    """
+    Build deterministic torrent content with files_count files and pieces_size bytes of piece hashes
+
+    :rtype: bytes
+    """
+    rnd = random.Random(seed)
+    # pieces are always multiple of sha1 length
+    pieces = bytes(bytearray(rnd.getrandbits(8) for _ in range(20))) * (pieces_size // 20)
+    info = {
+        u'name': u'Synthetic torrent',
+        u'piece length': 256 * KB,
+        u'pieces': pieces,
+    }
+    if files_count == 1:
+        info[u'length'] = rnd.randint(1, 10 ** 10)
+    else:
+        info[u'files'] = [{u'length': rnd.randint(1, 10 ** 9),
+                           u'path': [u'Season {0}'.format(i % 50), u'Episode {0}.mkv'.format(i)]}
+                          for i in range(files_count)]
+    return bencode({
+        u'announce': u'http://tracker.local/announce',
+        u'announce-list': [[u'http://tracker.local/announce'], [u'http://backup.local/announce']],
+        u'comment': u'synthetic',
+        u'creation date': 1500000000,
+        u'info': info,
+    })
+
+
+def get_cases(quick=False):
+    """
+    :rtype: list[(str, bytes)]
+    """
+    cases = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.torrent'))):
+        with open(path, 'rb') as f:
+            cases.append(('fixture:' + os.path.basename(path), f.read()))
+    for files_count in (QUICK_FILES if quick else SYNTHETIC_FILES):
+        for pieces_size in (QUICK_PIECES if quick else SYNTHETIC_PIECES):
+            name = 'synthetic:files={0},pieces={1}KB'.format(files_count, pieces_size // KB)
+            cases.append((name, make_torrent(files_count, pieces_size)))
+    return cases
+
+
+def _info_hash(torrent):
+    torrent._info_hash = None
+    return torrent.info_hash
+
+
+def get_benchmarks(content):
+    """
+    :rtype: dict[str, callable]
+    """
+    decoded = bdecode(content)
+    torrent = Torrent(content)
+    benchmarks = {
+        'bdecode': lambda: bdecode(content),
+        'bencode': lambda: bencode(decoded),
+        'info_hash': lambda: _info_hash(torrent),
+        # new torrent every time, otherwise cached file table lookup is measured
+        'get_filelist': lambda: Torrent(content).get_filelist(),
+        'is_torrent_content': lambda: is_torrent_content(content),
+    }
+    if TorrentMeta is not None:
+        benchmarks['torrent_meta_info_hash'] = lambda: TorrentMeta(content).info_hash
+    if FileTable is not None:
+        file_table = FileTable.from_info(decoded['info'])
+        benchmarks['file_table'] = lambda: FileTable.from_info(decoded['info'])
+        benchmarks['group_by_directory'] = lambda: file_table.group_by_directory()
+    return benchmarks
+
+
+def measure(func, repeat, min_time):
+    """
+    Measure best and median time of one call
+
+    :rtype: dict
+    """
+    timer = timeit.Timer(func)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time:
+            break
+        number *= 10
+    times = sorted([elapsed] + timer.repeat(repeat - 1, number))
+    return {
+        'number': number,
+        'repeat': repeat,
+        'best': times[0] / number,
+        'median': times[len(times) // 2] / number,
+    }
+
+
+def run(quick=False, repeat=5, min_time=0.05, only=None, log=None):
+    results = []
+    for case, content in get_cases(quick):
+        benchmarks = get_benchmarks(content)
+        for name in sorted(benchmarks):
+            if only and name not in only:
+                continue
+            result = measure(benchmarks[name], repeat, min_time)
+            result.update({'benchmark': name, 'case': case, 'size': len(content)})
+            results.append(result)
+            if log:
+                log('{0:<24} {1:<48} {2:.6f}s'.format(name, case, result['best']))
+    results.sort(key=lambda r: (r['benchmark'], r['case']))
+    return {
+        'format': FORMAT_VERSION,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'quick': quick,
+        'results': results,
+    }
+
+
+def compare(report, baseline):
+    """
+    :return: lines with best time ratio to baseline for each benchmark and case present in both reports
+    :rtype: list[str]
+    """
+    baseline_results = {(r['benchmark'], r['case']): r for r in baseline['results']}
+    lines = []
+    for result in report['results']:
+        base = baseline_results.get((result['benchmark'], result['case']), None)
+        if base is None:
+            continue
+        lines.append('{0:<24} {1:<48} {2:.6f}s -> {3:.6f}s x{4:.2f}'.format(
+            result['benchmark'], result['case'], base['best'], result['best'], base['best'] / result['best']))
+    return lines
+
+
+def dump(report, stream):
+    json.dump(report, stream, indent=2, sort_keys=True)
+    stream.write('\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run bencode and torrent micro-benchmarks')
+    parser.add_argument('--quick', action='store_true', help='skip the largest synthetic torrents')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.05, help='minimal time of one measurement')
+    parser.add_argument('--benchmark', action='append', dest='only', help='run only specified benchmarks')
+    parser.add_argument('--output', help='write JSON report to file instead of stdout')
+    parser.add_argument('--compare', help='JSON report to compare results with')
+    args = parser.parse_args(argv)
+
+    report = run(args.quick, args.repeat, args.min_time, args.only, log=lambda line: print(line, file=sys.stderr))
+    if args.output:
+        with open(args.output, 'w') as f:
+            dump(report, f)
+    else:
+        dump(report, sys.stdout)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for line in compare(report, baseline):
+            print(line, file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()